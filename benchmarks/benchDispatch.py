@@ -0,0 +1,176 @@
+"""Measure what the patched ``getTextInfoSpeech`` costs calls it does not handle.
+
+Usage::
+
+    python benchmarks/benchDispatch.py [--number N] [--runs N] [--json out.json]
+
+The plugin replaces ``speech.getTextInfoSpeech`` for the whole process, so
+every speech request passes through it: say all, focus mode, editable
+fields and other applications included. For such calls this benchmark
+compares, per call and consumed to the end as NVDA does:
+
+- ``original``: NVDA's function called directly;
+- ``generator``: a generator wrapper that checks the call and delegates
+  with ``yield from`` (how the plugin used to dispatch);
+- ``patched``: the plugin's dispatcher, which hands back the original
+  generator without wrapping it.
+
+The overhead columns are the extra time per call over ``original``.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import replay
+
+import contentFirstBrowse  # noqa: E402
+
+OutputReason = replay.controlTypes.OutputReason
+
+
+def _generatorDispatch(
+    info,
+    useCache=True,
+    formatConfig=None,
+    unit=None,
+    reason=OutputReason.QUERY,
+    _prefixSpeechCommand=None,
+    onlyInitialFields=False,
+    suppressBlanks=False,
+):
+    if (
+        reason != OutputReason.CARET
+        or not isinstance(info, replay.browseMode.BrowseModeDocumentTextInfo)
+        or not contentFirstBrowse._shouldApplyContentFirstForTextInfo(info)
+    ):
+        result = yield from contentFirstBrowse._original_getTextInfoSpeech(
+            info,
+            useCache,
+            formatConfig,
+            unit,
+            reason,
+            _prefixSpeechCommand,
+            onlyInitialFields,
+            suppressBlanks,
+        )
+        return result
+    result = yield from contentFirstBrowse._getContentFirstTextInfoSpeech(
+        info,
+        useCache,
+        formatConfig,
+        unit,
+        reason,
+        _prefixSpeechCommand,
+        onlyInitialFields,
+        suppressBlanks,
+        None,
+    )
+    return result
+
+
+FUNCTIONS = (
+    ("original", contentFirstBrowse._original_getTextInfoSpeech),
+    ("generator", _generatorDispatch),
+    ("patched", contentFirstBrowse._patched_getTextInfoSpeech),
+)
+
+
+class _EditableTextInfo(replay.textInfos.TextInfo):
+    """A text info outside browse mode, such as an edit field."""
+
+    def __init__(self, obj, textWithFields):
+        super().__init__(obj, None)
+        self._textWithFields = textWithFields
+
+    def getTextWithFields(self, formatConfig=None):
+        return self._textWithFields
+
+
+class _EditableObject:
+    pass
+
+
+def _makeCases():
+    textWithFields = ["The quick brown fox\n"]
+    doc = replay.ReplayDocument("dispatch")
+    focusModeDoc = replay.ReplayDocument("dispatch focus mode")
+    focusModeDoc.passThrough = True
+    return (
+        ("sayAll", replay.ReplayTextInfo(doc, textWithFields), OutputReason.SAYALL),
+        ("query", replay.ReplayTextInfo(doc, textWithFields), OutputReason.QUERY),
+        ("editCaret", _EditableTextInfo(_EditableObject(), textWithFields), OutputReason.CARET),
+        ("focusModeCaret", replay.ReplayTextInfo(focusModeDoc, textWithFields), OutputReason.CARET),
+    )
+
+
+def measure(info, reason, number, runs):
+    """Return the best per-call time in seconds of each function over ``runs`` runs.
+
+    The functions take turns within every run so that they see the same
+    machine noise.
+    """
+    perfCounter = time.perf_counter
+    best = {}
+    for _run in range(runs):
+        for name, func in FUNCTIONS:
+            start = perfCounter()
+            for _i in range(number):
+                for _sequence in func(info, useCache=False, unit=None, reason=reason):
+                    pass
+            elapsed = (perfCounter() - start) / number
+            if name not in best or elapsed < best[name]:
+                best[name] = elapsed
+    return best
+
+
+def formatReport(allResults):
+    header = "%-16s %12s %12s %12s %14s %14s" % (
+        "case",
+        "original ns",
+        "generator ns",
+        "patched ns",
+        "generator +ns",
+        "patched +ns",
+    )
+    lines = [header, "-" * len(header)]
+    for case, results in allResults.items():
+        lines.append(
+            "%-16s %12.0f %12.0f %12.0f %14.0f %14.0f"
+            % (
+                case,
+                results["original"],
+                results["generator"],
+                results["patched"],
+                results["generator"] - results["original"],
+                results["patched"] - results["original"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="calls per run (default 200)")
+    parser.add_argument("--runs", type=int, default=300, help="runs per function, best is kept (default 300)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        allResults = {}
+        for case, info, reason in _makeCases():
+            best = measure(info, reason, args.number, args.runs)
+            allResults[case] = {name: seconds * 1e9 for name, seconds in best.items()}
+    finally:
+        plugin.terminate()
+    print(formatReport(allResults))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(allResults, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Measure what per-role ordering policies cost the patched ``getTextInfoSpeech``.
+
+Usage::
+
+    python benchmarks/benchRolePolicies.py [corpus ...] [--runs N] [--json out.json]
+
+Every corpus (by default all files in ``benchmarks/corpus``) is replayed
+through the patched function under each of these ``rolePolicies`` settings:
+
+- ``none``: no policies, every role content first (the default);
+- ``unmatched``: policies only for roles the bundled corpora do not contain,
+  so every field is looked up but keeps the content first order;
+- ``typical``: form fields roles first and layout tables suppressed, which
+  also wraps ``getControlFieldSpeech`` to drop suppressed fields.
+
+The settings take turns within every run so that they see the same machine
+noise, and the best mean per call over ``runs`` runs is kept. The ``+ns``
+columns are the difference to ``none``; the policy table is compiled once per
+configuration change, so it should be within the noise.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+
+import benchTextInfoSpeech
+import replay
+
+import contentFirstBrowse  # noqa: E402
+
+POLICIES = (
+    ("none", ""),
+    ("unmatched", "comboBox=rolesFirst, checkBox=rolesFirst, radioButton=rolesFirst"),
+    (
+        "typical",
+        "editableText=rolesFirst, comboBox=rolesFirst, checkBox=rolesFirst, radioButton=rolesFirst,"
+        " table+layout=suppressed",
+    ),
+)
+
+
+def measure(corpus, runs):
+    """Return the best mean latency per call in seconds under each policy setting."""
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    patched = contentFirstBrowse._patched_getTextInfoSpeech
+    best = {}
+    try:
+        for _run in range(runs):
+            for name, policies in POLICIES:
+                section["rolePolicies"] = policies
+                samples, _firstSamples = benchTextInfoSpeech.measureLatency(patched, corpus, 1)
+                mean = statistics.fmean(samples)
+                if name not in best or mean < best[name]:
+                    best[name] = mean
+    finally:
+        section["rolePolicies"] = ""
+    return best
+
+
+def formatReport(allResults):
+    names = [name for name, _policies in POLICIES]
+    header = "%-18s" % "workload" + "".join(" %12s" % ("%s ns" % name) for name in names)
+    header += "".join(" %14s" % ("%s +ns" % name) for name in names[1:])
+    lines = [header, "-" * len(header)]
+    for workload, results in allResults.items():
+        line = "%-18s" % workload + "".join(" %12.0f" % results[name] for name in names)
+        line += "".join(" %14.0f" % (results[name] - results["none"]) for name in names[1:])
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="corpus files or directories")
+    parser.add_argument("--runs", type=int, default=30, help="runs per setting, best is kept (default 30)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        allResults = {}
+        for path in replay.iterCorpusPaths(args.corpus):
+            corpus = replay.loadCorpus(path)
+            # Warm up caches and code paths before measuring.
+            measure(corpus, 1)
+            best = measure(corpus, args.runs)
+            allResults[corpus.name] = {name: seconds * 1e9 for name, seconds in best.items()}
+    finally:
+        plugin.terminate()
+    print(formatReport(allResults))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(allResults, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
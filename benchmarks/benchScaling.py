@@ -0,0 +1,242 @@
+"""Measure how the patched ``getTextInfoSpeech`` scales with the structure of a line.
+
+Usage::
+
+    python benchmarks/benchScaling.py [--parameter NAME ...] [--sizes 1,2,4,...] [--repeat N]
+        [--tolerance X] [--json out.json]
+
+For every structural parameter of ``synthetic.makeCorpus`` (nesting depth,
+sibling controls, clickables, language switches, math fields, indentation
+table width and text-less controls), the parameter is swept over ``sizes`` with the others at
+their defaults. Every synthetic corpus is replayed through both functions as
+in ``benchTextInfoSpeech.py``. The report lists, per size, the mean latency
+per call of each function, their ratio and the mean peak of traced
+allocations per call of the patched function.
+
+The growth exponent of each function is estimated from the two largest
+sizes: 1 means the time grows linearly with the parameter, 2 quadratically.
+A patched exponent above ``1 + tolerance`` is flagged as superlinear.
+
+Each corpus is also checked for lost or invented speech: the words and the
+speech commands (other than language changes, whose placement follows the
+order) spoken by the patched function must be the same as those of the
+original, only reordered. The corpus is also read as a single say all with
+the plugin's content first say all on, every move being one reading chunk,
+and the same check is made over the whole reading, since fields can move to
+the next chunk. The exit status is 1 if any check fails.
+"""
+
+import argparse
+import collections
+import json
+import math
+import statistics
+import sys
+
+import benchTextInfoSpeech
+import replay
+import synthetic
+
+import contentFirstBrowse  # noqa: E402
+
+FUNCTIONS = benchTextInfoSpeech.FUNCTIONS
+DEFAULT_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def speechItems(sequences):
+    """Return the multiset of words and speech commands in ``sequences``, language changes left out."""
+    LangChangeCommand = contentFirstBrowse._getSpeechContext().LangChangeCommand
+    items = collections.Counter()
+    for sequence in sequences:
+        for item in sequence:
+            if isinstance(item, str):
+                items.update(item.split())
+            elif not isinstance(item, LangChangeCommand):
+                items[repr(item)] += 1
+    return items
+
+
+def checkSameItems(corpus):
+    """Return the moves whose patched speech differs from the original's other than in order.
+
+    Each entry is ``(move index, missing items, extra items)``.
+    """
+    spoken = {}
+    for name, func in FUNCTIONS:
+        replay.resetSpeechState()
+        spoken[name] = [
+            speechItems(benchTextInfoSpeech._call(func, move, info))
+            for move, info in replay.Replay(corpus, 1).iterCalls()
+        ]
+    mismatches = []
+    for index, (original, patched) in enumerate(zip(spoken["original"], spoken["patched"])):
+        if original != patched:
+            mismatches.append((index, dict(original - patched), dict(patched - original)))
+    return mismatches
+
+
+def checkSayAllItems(corpus):
+    """Return ``(missing items, extra items)`` if a content first say all differs from the original, else None.
+
+    Every move is read as the next chunk of one say all per document, each
+    chunk starting where the previous one ended. As in NVDA's say all, every
+    chunk is read with a copy of the reader's state, which then replaces it.
+    """
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    contentFirstSayAll = section["contentFirstSayAll"]
+    section["contentFirstSayAll"] = True
+    try:
+        spoken = {}
+        for name, func in FUNCTIONS:
+            replay.resetSpeechState()
+            items = collections.Counter()
+            sayAlls = {}
+            for move in corpus.moves:
+                sayAll = sayAlls.get(move.doc)
+                if sayAll is None:
+                    doc = replay.ReplayDocument(move.doc)
+                    sayAll = sayAlls[move.doc] = [doc, replay._speakTextInfoStateFor(doc), 0]
+                doc, readerState, offset = sayAll
+                replay.applyMoveConfig(move)
+                info = replay.ReplayTextInfo(doc, move.decodeFields(), (offset, offset + 1))
+                state = readerState.copy()
+                items.update(
+                    speechItems(
+                        func(
+                            info,
+                            useCache=state,
+                            unit=replay.textInfos.UNIT_READINGCHUNK,
+                            reason=replay.controlTypes.OutputReason.SAYALL,
+                        ),
+                    ),
+                )
+                sayAll[1:] = state.copy(), offset + 1
+            spoken[name] = items
+    finally:
+        section["contentFirstSayAll"] = contentFirstSayAll
+    original, patched = spoken["original"], spoken["patched"]
+    if original == patched:
+        return None
+    return dict(original - patched), dict(patched - original)
+
+
+def growthExponent(sizes, means):
+    """Return the log-log slope between the two largest sizes, or None with fewer than two."""
+    if len(sizes) < 2 or sizes[-2] <= 0 or means[-2] <= 0:
+        return None
+    return math.log(means[-1] / means[-2]) / math.log(sizes[-1] / sizes[-2])
+
+
+def runParameter(parameter, sizes, repeat, lines):
+    rows = []
+    for size in sizes:
+        corpus = synthetic.makeCorpus(lines, name="%s=%d" % (parameter, size), **{parameter: size})
+        row = {"size": size}
+        for name, func in FUNCTIONS:
+            benchTextInfoSpeech.measureLatency(func, corpus, 1)
+            samples, _firstSamples = benchTextInfoSpeech.measureLatency(func, corpus, repeat)
+            row[name + "Us"] = statistics.fmean(samples) * 1e6
+        allocations = benchTextInfoSpeech.measureAllocations(FUNCTIONS[1][1], corpus)
+        row["peakAllocKiB"] = statistics.fmean(allocations) / 1024
+        row["ratio"] = row["patchedUs"] / row["originalUs"]
+        row["mismatches"] = checkSameItems(corpus)
+        row["sayAllMismatch"] = checkSayAllItems(corpus)
+        rows.append(row)
+    result = {"rows": rows}
+    for name, _func in FUNCTIONS:
+        result[name + "Exponent"] = growthExponent(sizes, [row[name + "Us"] for row in rows])
+    return result
+
+
+def _formatExponent(exponent):
+    return "n/a" if exponent is None else "%.2f" % exponent
+
+
+def formatReport(allResults, tolerance):
+    header = "%-12s %6s %12s %12s %8s %11s %6s" % (
+        "parameter",
+        "size",
+        "original us",
+        "patched us",
+        "ratio",
+        "peak KiB",
+        "same",
+    )
+    lines = [header, "-" * len(header)]
+    for parameter, result in allResults.items():
+        for row in result["rows"]:
+            lines.append(
+                "%-12s %6d %12.1f %12.1f %7.2fx %11.2f %6s"
+                % (
+                    parameter,
+                    row["size"],
+                    row["originalUs"],
+                    row["patchedUs"],
+                    row["ratio"],
+                    row["peakAllocKiB"],
+                    "no" if row["mismatches"] or row["sayAllMismatch"] else "yes",
+                )
+            )
+        exponent = result["patchedExponent"]
+        flag = "  SUPERLINEAR" if exponent is not None and exponent > 1 + tolerance else ""
+        lines.append(
+            "%-12s growth exponent: original %s, patched %s%s"
+            % (parameter, _formatExponent(result["originalExponent"]), _formatExponent(exponent), flag)
+        )
+        lines.append("")
+    for parameter, result in allResults.items():
+        for row in result["rows"]:
+            for index, missing, extra in row["mismatches"]:
+                lines.append(
+                    "%s=%d move %d: missing %r, extra %r" % (parameter, row["size"], index, missing, extra)
+                )
+            if row["sayAllMismatch"]:
+                missing, extra = row["sayAllMismatch"]
+                lines.append("%s=%d say all: missing %r, extra %r" % (parameter, row["size"], missing, extra))
+    return "\n".join(lines).rstrip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--parameter",
+        action="append",
+        choices=list(synthetic.PARAMETERS),
+        help="parameter to sweep, may be repeated (default all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma separated sizes (default %(default)s)",
+    )
+    parser.add_argument("--lines", type=int, default=8, help="caret moves per corpus (default 8)")
+    parser.add_argument("--repeat", type=int, default=10, help="passes over each corpus (default 10)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="growth exponent above 1 that is flagged (default 0.25)",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        allResults = {}
+        for parameter in args.parameter or synthetic.PARAMETERS:
+            allResults[parameter] = runParameter(parameter, sizes, args.repeat, args.lines)
+    finally:
+        plugin.terminate()
+    print(formatReport(allResults, args.tolerance))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(allResults, f, indent=2)
+    failed = any(
+        row["mismatches"] or row["sayAllMismatch"] for result in allResults.values() for row in result["rows"]
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
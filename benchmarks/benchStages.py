@@ -0,0 +1,345 @@
+"""Time the per-move stages the plugin rewrote against the baseline plugin's code.
+
+Usage::
+
+    python benchmarks/benchStages.py [corpus ...] [--runs N] [--json out.json]
+
+Whole calls are dominated by field speech and the caches, so the end-to-end
+benchmarks cannot show what a single stage gains. This one runs each stage
+alone, on every corpus (by default all files in ``benchmarks/corpus``) and on
+synthetic lines with many siblings or deep nesting, and reports the best mean
+per move of the baseline's code and of the plugin's:
+
+- ``tokenize``: the baseline removes node bounds in one pass, collects the
+  initial fields in a second, counts the trailing ``controlEnd`` commands in
+  a third and deletes both ranges from the list. The plugin's
+  ``_tokenizeTextWithFields`` does all of it in one pass without deleting.
+  Both are given a fresh copy of the move's list, which both timings
+  include.
+- ``context``: the bindings and settings a move starts from. The baseline
+  looks up its names on ``speech.speech``, copies and adjusts
+  ``formatConfig`` and asks ``languageHandling`` whether to switch language
+  once per move and again at every format change (counted once each, the
+  fewest it makes). The plugin takes them from its speech context and the
+  ``formatConfig`` cached per unit, and asks once. The stub
+  ``config.conf`` copies as a plain dict; NVDA's aggregated section copies
+  more slowly, so the real difference is larger.
+- ``stackDiff``: the common prefix of the stack a move starts from and the
+  stack it ends with, for consecutive moves with every ``uniqueID`` removed,
+  as on documents that expose none. The baseline compares whole field dicts
+  level by level. The plugin's old stack holds snapshots; it compares the
+  full fields its document state keeps for the last stack, whole dict
+  first, and records the fingerprints of the fields that are the same.
+
+The two versions take turns within every run so that they see the same
+machine noise. A run times ``number`` passes over the moves, and the best
+run is kept.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import replay
+import synthetic
+
+import contentFirstBrowse  # noqa: E402
+
+textInfos = replay.textInfos
+
+# Synthetic workloads added to the corpora: long lines and deep stacks.
+SYNTHETIC = (
+    ("siblings=32", {"siblings": 32}),
+    ("depth=12", {"depth": 12}),
+    ("tableWidth=24", {"tableWidth": 24}),
+)
+
+
+def _baselineTokenize(textWithFields):
+    """The baseline plugin's preparation of ``textWithFields``, up to the stack comparison."""
+    # We don't care about node bounds, especially when comparing fields.
+    # Remove them.
+    for command in textWithFields:
+        if not isinstance(command, textInfos.FieldCommand):
+            continue
+        field = command.field
+        if not field:
+            continue
+        try:
+            del field["_startOfNode"]
+        except KeyError:
+            pass
+        try:
+            del field["_endOfNode"]
+        except KeyError:
+            pass
+
+    # Make a new controlFieldStack and formatField from the textInfo's initialFields
+    newControlFieldStack = []
+    newFormatField = textInfos.FormatField()
+    initialFields = []
+    for field in textWithFields:
+        if isinstance(field, textInfos.FieldCommand) and field.command in ("controlStart", "formatChange"):
+            initialFields.append(field.field)
+        else:
+            break
+    if len(initialFields) > 0:
+        del textWithFields[0 : len(initialFields)]
+    endFieldCount = 0
+    for field in reversed(textWithFields):
+        if isinstance(field, textInfos.FieldCommand) and field.command == "controlEnd":
+            endFieldCount += 1
+        else:
+            break
+    if endFieldCount > 0:
+        del textWithFields[0 - endFieldCount :]
+    for field in initialFields:
+        if isinstance(field, textInfos.ControlField):
+            newControlFieldStack.append(field)
+        elif isinstance(field, textInfos.FormatField):
+            newFormatField.update(field)
+        else:
+            raise ValueError("unknown field: %s" % field)
+    return newControlFieldStack, newFormatField
+
+
+def _pluginTokenize(textWithFields):
+    return contentFirstBrowse._tokenizeTextWithFields(textWithFields, textInfos)
+
+
+def _baselineContext(unit, formatChanges):
+    """The baseline plugin's per-call lookups and ``formatConfig`` derivation."""
+    speechMod = contentFirstBrowse.speechMod
+    textInfos = speechMod.textInfos
+    config = speechMod.config
+    languageHandling = speechMod.languageHandling
+    ReportLineIndentation = speechMod.ReportLineIndentation
+    # The names the baseline binds but this stage does not use.
+    bindings = (
+        speechMod.controlTypes,
+        speechMod.unicodeNormalize,
+        speechMod.LangChangeCommand,
+        speechMod.EndUtteranceCommand,
+        speechMod.isBlank,
+        speechMod.splitTextIndentation,
+        speechMod.getIndentationSpeech,
+        speechMod._extendSpeechSequence_addMathForTextInfo,
+        speechMod._getTextInfoSpeech_considerSpelling,
+        speechMod._getTextInfoSpeech_updateCache,
+        speechMod.SpeakTextInfoState,
+    )
+
+    extraDetail = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
+    formatConfig = config.conf["documentFormatting"]
+    formatConfig = formatConfig.copy()
+    if extraDetail:
+        formatConfig["extraDetail"] = True
+    reportIndentation = (
+        unit == textInfos.UNIT_LINE and formatConfig["reportLineIndentation"] != ReportLineIndentation.OFF
+    )
+    # For performance reasons, when navigating by paragraph or table cell, spelling errors will not be announced.
+    if unit in (textInfos.UNIT_PARAGRAPH, textInfos.UNIT_CELL):
+        formatConfig["reportSpellingErrors"] = False
+    makeLangChangeCommand = languageHandling.shouldMakeLangChangeCommand()
+    for _i in range(formatChanges):
+        languageHandling.shouldMakeLangChangeCommand()
+    return bindings, formatConfig, extraDetail, reportIndentation, makeLangChangeCommand
+
+
+def _pluginContext(unit, _formatChanges):
+    """What ``_getContentFirstTextInfoSpeech`` does for the same job."""
+    context = contentFirstBrowse._getSpeechContext()
+    bindings = (
+        context.textInfos,
+        context.controlTypes,
+        context.LangChangeCommand,
+        context.isBlank,
+        context._getTextInfoSpeech_updateCache,
+    )
+    makeLangChangeCommand = context.languageHandling.shouldMakeLangChangeCommand()
+    formatConfig, extraDetail, reportIndentation = context.unitSettings(unit)
+    return bindings, formatConfig, extraDetail, reportIndentation, makeLangChangeCommand
+
+
+def _contextCase(moves):
+    cases = []
+    for move in moves:
+        stream = _pluginTokenize(move.decodeFields())
+        formatChanges = sum(
+            1 for index in range(stream.bodyEnd) if stream.ops[index] == contentFirstBrowse._OP_FORMAT_CHANGE
+        )
+        cases.append((move.unit, formatChanges))
+    return cases
+
+
+def _timeContext(func, cases, number):
+    perfCounter = time.perf_counter
+    start = perfCounter()
+    for _i in range(number):
+        for unit, formatChanges in cases:
+            func(unit, formatChanges)
+    return (perfCounter() - start) / (number * len(cases))
+
+
+def _baselineStackDiff(oldStack, _docState, newStack, _stream):
+    """The baseline plugin's common prefix count."""
+    commonFieldCount = 0
+    for count in range(min(len(newStack), len(oldStack))):
+        # #2199: When comparing controlFields try using uniqueID if it exists before resorting to compairing the entire dictionary
+        oldUniqueID = oldStack[count].get("uniqueID")
+        newUniqueID = newStack[count].get("uniqueID")
+        if ((oldUniqueID is not None or newUniqueID is not None) and newUniqueID == oldUniqueID) or (
+            newStack[count] == oldStack[count]
+        ):
+            commonFieldCount += 1
+        else:
+            break
+    return commonFieldCount
+
+
+def _pluginStackDiff(_oldStack, docState, newStack, stream):
+    """The plugin's common prefix count against the snapshots of the old stack."""
+    stream.controlFingerprints = {}
+    oldSnapshots = docState.lastStack
+    commonFieldCount = 0
+    for count in range(min(len(newStack), len(oldSnapshots))):
+        oldField = oldSnapshots[count]
+        newField = newStack[count]
+        if contentFirstBrowse._sameField(docState, stream, count, oldField, newField):
+            commonFieldCount += 1
+            continue
+        oldUniqueID = oldField.get("uniqueID")
+        newUniqueID = newField.get("uniqueID")
+        if (oldUniqueID is not None or newUniqueID is not None) and newUniqueID == oldUniqueID:
+            commonFieldCount += 1
+        else:
+            break
+    return commonFieldCount
+
+
+def _stackDiffCase(moves):
+    cases = []
+    oldStack = []
+    docState = contentFirstBrowse._DocumentState()
+    for move in moves:
+        stream = _pluginTokenize(move.decodeFields())
+        newStack = [
+            textInfos.ControlField((key, value) for key, value in field.items() if key != "uniqueID")
+            for field in stream.controlStack
+        ]
+        stream.controlStack = newStack
+        cases.append((oldStack, docState, newStack, stream))
+        oldStack = newStack
+        docState = contentFirstBrowse._DocumentState()
+        docState.rememberStack(newStack, {})
+    return cases
+
+
+def _timeStackDiff(func, cases, number):
+    perfCounter = time.perf_counter
+    start = perfCounter()
+    for _i in range(number):
+        for oldStack, docState, newStack, stream in cases:
+            func(oldStack, docState, newStack, stream)
+    return (perfCounter() - start) / (number * len(cases))
+
+
+def _tokenizeCase(moves):
+    return [(move.decodeFields(),) for move in moves]
+
+
+def _timeTokenize(func, cases, number):
+    perfCounter = time.perf_counter
+    start = perfCounter()
+    for _i in range(number):
+        for (textWithFields,) in cases:
+            func(list(textWithFields))
+    return (perfCounter() - start) / (number * len(cases))
+
+
+# Stage name -> (builds the inputs from the moves, times one version, ((version, function), ...)).
+STAGES = {
+    "tokenize": (
+        _tokenizeCase,
+        _timeTokenize,
+        (("baseline", _baselineTokenize), ("plugin", _pluginTokenize)),
+    ),
+    "context": (
+        _contextCase,
+        _timeContext,
+        (("baseline", _baselineContext), ("plugin", _pluginContext)),
+    ),
+    "stackDiff": (
+        _stackDiffCase,
+        _timeStackDiff,
+        (("baseline", _baselineStackDiff), ("plugin", _pluginStackDiff)),
+    ),
+}
+
+
+def iterWorkloads(paths):
+    for path in replay.iterCorpusPaths(paths):
+        corpus = replay.loadCorpus(path)
+        yield corpus.name, corpus.moves
+    if not paths:
+        for name, parameters in SYNTHETIC:
+            yield name, synthetic.makeCorpus(name=name, **parameters).moves
+
+
+def measure(moves, number, runs):
+    """Return ``{stage: {version: best mean seconds per move}}`` for one workload."""
+    results = {}
+    for stage, (makeCases, timeVersion, versions) in STAGES.items():
+        cases = makeCases(moves)
+        best = {}
+        for _run in range(runs):
+            for version, func in versions:
+                mean = timeVersion(func, cases, number)
+                if version not in best or mean < best[version]:
+                    best[version] = mean
+        results[stage] = best
+    return results
+
+
+def formatReport(allResults):
+    columns = [(stage, version) for stage, (_make, _time, versions) in STAGES.items() for version, _func in versions]
+    header = "%-16s" % "workload" + "".join(" %20s" % ("%s %s us" % column) for column in columns)
+    lines = [header, "-" * len(header)]
+    for workload, results in allResults.items():
+        lines.append(
+            "%-16s" % workload + "".join(" %20.2f" % results[stage][version] for stage, version in columns),
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="corpus files or directories (synthetic lines are added when none)")
+    parser.add_argument("--number", type=int, default=20, help="passes over the moves per run (default 20)")
+    parser.add_argument("--runs", type=int, default=30, help="runs per version, best is kept (default 30)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        allResults = {}
+        for name, moves in iterWorkloads(args.corpus):
+            # Warm up code paths before measuring.
+            measure(moves, 1, 1)
+            best = measure(moves, args.number, args.runs)
+            allResults[name] = {
+                stage: {version: seconds * 1e6 for version, seconds in versions.items()}
+                for stage, versions in best.items()
+            }
+    finally:
+        plugin.terminate()
+    print(formatReport(allResults))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(allResults, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Benchmark ``_patched_getTextInfoSpeech`` against NVDA's original.
+
+Usage::
+
+    python benchmarks/benchTextInfoSpeech.py [corpus ...] [--repeat N] [--stream] [--json out.json]
+
+Every corpus (by default all files in ``benchmarks/corpus``) is replayed
+through both functions. For each workload the report lists per-call latency
+(mean, p50, p99), the mean time until the first speech sequence is yielded,
+the mean peak of traced allocations per call and the ratio of the patched
+mean to the original mean (above 1.00 means slower). ``--stream`` turns on
+the plugin's streamLeadingContent option.
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import replay
+
+import contentFirstBrowse  # noqa: E402
+
+FUNCTIONS = (
+    ("original", contentFirstBrowse._original_getTextInfoSpeech),
+    ("patched", contentFirstBrowse._patched_getTextInfoSpeech),
+)
+
+
+def _call(func, move, info):
+    return list(func(info, unit=move.unit, reason=replay.controlTypes.OutputReason.CARET))
+
+
+def measureLatency(func, corpus, repeat):
+    """Return per-call total latencies and latencies until the first yielded sequence."""
+    samples = []
+    firstSamples = []
+    perfCounter = time.perf_counter
+    reason = replay.controlTypes.OutputReason.CARET
+    replay.resetSpeechState()
+    prepared = replay.Replay(corpus, repeat)
+    gcWasEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        for move, info in prepared.iterCalls():
+            start = perfCounter()
+            first = None
+            for _sequence in func(info, unit=move.unit, reason=reason):
+                if first is None:
+                    first = perfCounter()
+            end = perfCounter()
+            samples.append(end - start)
+            firstSamples.append((first or end) - start)
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+    return samples, firstSamples
+
+
+def measureAllocations(func, corpus):
+    peaks = []
+    replay.resetSpeechState()
+    prepared = replay.Replay(corpus, 1)
+    tracemalloc.start()
+    try:
+        for move, info in prepared.iterCalls():
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            _call(func, move, info)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples, firstSamples, allocations):
+    return {
+        "calls": len(samples),
+        "meanUs": statistics.fmean(samples) * 1e6,
+        "firstUs": statistics.fmean(firstSamples) * 1e6,
+        "p50Us": percentile(samples, 0.50) * 1e6,
+        "p99Us": percentile(samples, 0.99) * 1e6,
+        "peakAllocKiB": statistics.fmean(allocations) / 1024 if allocations else 0.0,
+    }
+
+
+def runCorpus(corpus, repeat):
+    results = {}
+    for name, func in FUNCTIONS:
+        # Warm up caches and code paths before measuring.
+        measureLatency(func, corpus, 1)
+        samples, firstSamples = measureLatency(func, corpus, repeat)
+        allocations = measureAllocations(func, corpus)
+        results[name] = summarize(samples, firstSamples, allocations)
+    results["ratio"] = results["patched"]["meanUs"] / results["original"]["meanUs"]
+    return results
+
+
+def formatReport(allResults):
+    header = "%-18s %-9s %7s %9s %9s %9s %9s %11s %8s" % (
+        "workload",
+        "function",
+        "calls",
+        "mean us",
+        "p50 us",
+        "p99 us",
+        "first us",
+        "peak KiB",
+        "ratio",
+    )
+    lines = [header, "-" * len(header)]
+    for workload, results in allResults.items():
+        for name, _func in FUNCTIONS:
+            stats = results[name]
+            lines.append(
+                "%-18s %-9s %7d %9.1f %9.1f %9.1f %9.1f %11.2f %8s"
+                % (
+                    workload,
+                    name,
+                    stats["calls"],
+                    stats["meanUs"],
+                    stats["p50Us"],
+                    stats["p99Us"],
+                    stats["firstUs"],
+                    stats["peakAllocKiB"],
+                    "%.2fx" % results["ratio"] if name == "patched" else "",
+                )
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="corpus files or directories")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over each corpus (default 20)")
+    parser.add_argument("--stream", action="store_true", help="turn on the streamLeadingContent option")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        replay.config.conf[contentFirstBrowse._CONFIG_SECTION]["streamLeadingContent"] = args.stream
+        allResults = {}
+        for path in replay.iterCorpusPaths(args.corpus):
+            corpus = replay.loadCorpus(path)
+            allResults[corpus.name] = runCorpus(corpus, args.repeat)
+    finally:
+        plugin.terminate()
+    print(formatReport(allResults))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(allResults, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,644 @@
+"""Check the plugin's stateful paths against NVDA's original speech.
+
+Usage::
+
+    python benchmarks/checkStateful.py [--check NAME ...] [--seed N] [--json out.json]
+
+The corpus benchmarks replay each move once and in the recorded order. That
+never reaches the paths whose output depends on earlier calls. Each check
+here drives one such path through the patched function and through NVDA's
+original function. It then compares the words and speech commands spoken
+at every step, in any order, as ``benchScaling.py`` does.
+
+- ``cellWalk``: random walks over a data grid by table cell, once with
+  plain coordinates and once with presentational (``aria-rowindex`` and
+  ``aria-colindex``) ones. Cell speech is cached by how the cell relates to
+  the previous one, so revisiting a cell from another direction must not
+  reuse the speech of the first visit.
+- ``sayAllCarry``: say alls whose reading chunks end just after a list or
+  list item starts. The plugin holds the speech of such fields back until
+  the content of the next chunk. As in NVDA, every chunk is read with a copy
+  of the reader's state. A say all restarted from the beginning must not
+  pick up what the previous one held back.
+- ``prefetch``: a random walk over the lines of the bundled corpora with
+  neighbouring lines prepared while idle. The idle queue is drained after
+  every move, so the prepared speech is there when the caret arrives. Some
+  of the lines the walk goes to next are then wrapped in a landmark without
+  any event, as when a page changes what surrounds a line. Their text stays
+  the same, so only the fields tell the prepared speech is stale. The check
+  fails if prepared speech is never used.
+- ``latencyFallback``: a random walk over the lines of the bundled corpora
+  with a latency budget no content first call can meet, then with a
+  generous one. The idle queue is drained after every move, so the latency
+  probes run. The document must switch to NVDA's speech, speak exactly what
+  NVDA speaks while it does, and switch back once the budget allows it.
+- ``supersede``: random walks over the lines of the bundled corpora and
+  over the cells of a data grid in which some moves get a key press
+  while their text is read or their control fields are spoken. The plugin abandons those
+  moves, whose speech NVDA cancels, so they are not compared, with and
+  without leading content streamed. Every later move must still speak
+  what NVDA speaks. The check fails if no move is ever abandoned.
+- ``quickNav``: walks through the headings, links and form fields of the
+  bundled corpora by quick navigation, with two line editable fields added
+  among the form fields. After the first press of each type the idle queue
+  builds the type's index. As in NVDA, an editable field is read only up to
+  the end of its first line. Some items the walk goes to next are then
+  changed in their fields only: lines are wrapped in a landmark and editable
+  fields renamed. The check fails if indexed speech is never used, or never
+  for an editable field.
+
+The exit status is 1 if any check fails.
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+
+import benchScaling
+import core
+import inputCore
+import replay
+
+import contentFirstBrowse  # noqa: E402
+
+Role = replay.controlTypes.Role
+OutputReason = replay.controlTypes.OutputReason
+FUNCTIONS = benchScaling.FUNCTIONS
+
+GRID_ROWS = 6
+GRID_COLUMNS = 5
+# Offset of the presentational coordinates from the real ones, as with a
+# grid showing rows 501 onwards of a larger data set.
+PRESENTATIONAL_OFFSET = 500
+
+
+# Line corpora whose lines make up the document of the walks.
+LINE_CORPORA = ("article", "navLinks", "denseRows", "mathLesson")
+
+
+class LineDocument(replay.ReplayDocument):
+    """A document made of the lines of corpora, which text infos can move through."""
+
+    def __init__(self, name, lines):
+        super().__init__(name)
+        self.lines = lines
+
+    def makeLineInfo(self, index):
+        return LineTextInfo(self, (index, index + 1))
+
+    def makeTextInfo(self, position):
+        if position != replay.textInfos.POSITION_FIRST:
+            raise NotImplementedError(position)
+        return LineTextInfo(self, (0, 0))
+
+
+class LineTextInfo(replay.ReplayTextInfo):
+    """A range of a ``LineDocument``. Every unit is a line."""
+
+    def __init__(self, obj, offsets):
+        super().__init__(obj, None, offsets)
+
+    def copy(self):
+        return LineTextInfo(self.obj, (self._startOffset, self._endOffset))
+
+    def move(self, unit, direction, endPoint=None):
+        offset = self._endOffset if endPoint == "end" else self._startOffset
+        moved = min(max(offset + direction, 0), len(self.obj.lines)) - offset
+        if endPoint == "end":
+            self._endOffset += moved
+        else:
+            self._startOffset = self._endOffset = self._startOffset + moved
+        return moved
+
+    def expand(self, unit):
+        self._endOffset = min(self._startOffset + 1, len(self.obj.lines))
+
+    def getTextWithFields(self, formatConfig=None):
+        # Fresh commands for every call, since NVDA's function changes the list it reads.
+        return [
+            replay.decodeCommand(item)
+            for index in range(self._startOffset, self._endOffset)
+            for item in self.obj.lines[index]
+        ]
+
+    @property
+    def text(self):
+        return "".join(
+            item for index in range(self._startOffset, self._endOffset) for item in self.obj.lines[index]
+            if isinstance(item, str)
+        )
+
+
+def corpusLines(names=LINE_CORPORA):
+    lines = []
+    for name in names:
+        corpus = replay.loadCorpus(os.path.join(replay.CORPUS_DIR, name + ".jsonl"))
+        lines.extend(move.fields for move in corpus.moves)
+    return lines
+
+
+def randomWalk(rng, length, steps):
+    """Return ``steps`` line indexes of a walk down and up a document of ``length`` lines."""
+    index = 0
+    walk = []
+    for _step in range(steps):
+        walk.append(index)
+        index = min(length - 1, max(0, index + rng.choice((1, 1, 1, -1))))
+    return walk
+
+
+def _start(items, role, uniqueID, startOfNode=True, **attrs):
+    attrs.update(role=int(role), states=[], uniqueID=uniqueID, _startOfNode=startOfNode, _endOfNode=True)
+    items.append(["cs", attrs])
+
+
+def gridCell(row, column, presentational=False):
+    """Return the corpus commands of one cell of the grid."""
+    items = []
+    _start(items, Role.LANDMARK, 1, landmark="main")
+    _start(
+        items,
+        Role.TABLE,
+        2,
+        **{"table-id": 1, "table-rowcount": GRID_ROWS, "table-columncount": GRID_COLUMNS},
+    )
+    _start(items, Role.TABLEROW, 100 + row, **{"table-id": 1, "table-rownumber": row})
+    cell = {
+        "table-id": 1,
+        "table-rownumber": row,
+        "table-columnnumber": column,
+        "table-rowheadertext": "RowH%d" % row,
+        "table-columnheadertext": "ColH%d" % column,
+    }
+    if presentational:
+        cell["table-rownumber-presentational"] = row + PRESENTATIONAL_OFFSET
+        cell["table-columnnumber-presentational"] = column + PRESENTATIONAL_OFFSET
+    _start(items, Role.TABLECELL, 1000 + row * 100 + column, **cell)
+    items.append(["fc", {"font-family": "Segoe UI", "font-size": "12pt"}])
+    items.append("value %d.%d" % (row, column))
+    items.extend([["ce"]] * 4)
+    return items
+
+
+def speakMoves(func, calls, unit, reason=OutputReason.CARET):
+    """Return the speech items of ``func`` for each list of corpus commands in ``calls``.
+
+    The calls are made in order in one fresh document. The commands are
+    decoded for every call, since NVDA's function changes the list it reads.
+    """
+    replay.resetSpeechState()
+    doc = replay.ReplayDocument("check")
+    spoken = []
+    for items in calls:
+        info = replay.ReplayTextInfo(doc, [replay.decodeCommand(item) for item in items])
+        spoken.append(benchScaling.speechItems(func(info, unit=unit, reason=reason)))
+    return spoken
+
+
+def speakSayAll(func, doc, chunks, readerState=None):
+    """Return the speech items of ``func`` reading ``chunks`` as one say all, and the reader's final state.
+
+    As in NVDA's say all, each chunk starts where the previous one ended and
+    is read with a copy of the reader's state, which then replaces it.
+    """
+    if readerState is None:
+        readerState = replay._speakTextInfoStateFor(doc)
+    items = collections.Counter()
+    for offset, commands in enumerate(chunks):
+        info = replay.ReplayTextInfo(doc, [replay.decodeCommand(item) for item in commands], (offset, offset + 1))
+        state = readerState.copy()
+        items.update(
+            benchScaling.speechItems(
+                func(info, useCache=state, unit=replay.textInfos.UNIT_READINGCHUNK, reason=OutputReason.SAYALL),
+            ),
+        )
+        readerState = state.copy()
+    return items, readerState
+
+
+def compareSpoken(original, patched):
+    """Return ``(step, missing items, extra items)`` for every step where the two differ."""
+    return [
+        (step, dict(expected - actual), dict(actual - expected))
+        for step, (expected, actual) in enumerate(zip(original, patched))
+        if expected != actual
+    ]
+
+
+def compareFunctions(calls, unit, reason=OutputReason.CARET):
+    spoken = {name: speakMoves(func, calls, unit, reason) for name, func in FUNCTIONS}
+    return compareSpoken(spoken["original"], spoken["patched"])
+
+
+def checkCellWalk(rng, steps=400):
+    # Start with a walk that comes back to a cell from another row and column.
+    path = [(1, 1), (1, 2), (2, 2), (2, 1), (1, 1), (2, 1), (1, 2)]
+    row, column = path[-1]
+    while len(path) < steps:
+        row = min(GRID_ROWS, max(1, row + rng.choice((-1, 0, 1))))
+        column = min(GRID_COLUMNS, max(1, column + rng.choice((-1, 0, 1))))
+        path.append((row, column))
+    mismatches = []
+    calls = 0
+    for presentational in (False, True):
+        cells = [gridCell(row, column, presentational) for row, column in path]
+        calls += len(cells)
+        mismatches.extend(
+            ("presentational" if presentational else "plain", step, missing, extra)
+            for step, missing, extra in compareFunctions(cells, replay.textInfos.UNIT_CELL)
+        )
+    return {"calls": calls, "mismatches": mismatches}
+
+
+def listChunks(items):
+    """Return the reading chunks of a section holding a list of ``items`` items, split after each item starts."""
+    chunks = []
+    commands = []
+    _start(commands, Role.SECTION, 10)
+    commands.append("Intro paragraph. ")
+    _start(commands, Role.LIST, 11, _childcount=items)
+    chunks.append(commands)
+    for item in range(items):
+        commands = []
+        _start(commands, Role.SECTION, 10, startOfNode=False)
+        _start(commands, Role.LIST, 11, startOfNode=False, _childcount=items)
+        if item:
+            _start(commands, Role.LISTITEM, 20 + item - 1, startOfNode=False)
+            commands.append("rest of item %d. " % item)
+            commands.append(["ce"])
+        if item < items - 1:
+            _start(commands, Role.LISTITEM, 20 + item)
+            commands.append("item %d " % (item + 1))
+            commands.extend([["ce"]] * 3)
+        else:
+            _start(commands, Role.LISTITEM, 20 + item)
+            commands.append("last item. ")
+            commands.extend([["ce"]] * 4)
+        chunks.append(commands)
+    return chunks
+
+
+def checkSayAllCarry(rng):
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    contentFirstSayAll = section["contentFirstSayAll"]
+    section["contentFirstSayAll"] = True
+    mismatches = []
+    calls = 0
+    try:
+        for items in (1, 3, rng.randint(4, 12)):
+            chunks = listChunks(items)
+            spoken = {}
+            for name, func in FUNCTIONS:
+                replay.resetSpeechState()
+                doc = replay.ReplayDocument("sayAll")
+                # A say all stopped after its first chunk, then one that starts
+                # over and reads to the end. Only the complete one is compared:
+                # what the stopped one held back is never spoken.
+                speakSayAll(func, doc, chunks[:1])
+                spoken[name], _state = speakSayAll(func, doc, chunks)
+            calls += 2 * (len(chunks) + 1)
+            expected, actual = spoken["original"], spoken["patched"]
+            if expected != actual:
+                mismatches.append((items, dict(expected - actual), dict(actual - expected)))
+    finally:
+        section["contentFirstSayAll"] = contentFirstSayAll
+    return {"calls": calls, "mismatches": mismatches}
+
+
+def inLandmark(line, uniqueID):
+    """Return the corpus commands of ``line`` inside a navigation landmark."""
+    items = []
+    _start(items, Role.LANDMARK, uniqueID, landmark="navigation")
+    return items + list(line) + [["ce"]]
+
+
+def checkPrefetch(rng, steps=400):
+    lines = corpusLines()
+    walk = randomWalk(rng, len(lines), steps)
+    edits = {step for step in range(steps - 1) if rng.random() < 0.2}
+    spoken = {}
+    hits = []
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    prefetchNeighbours = section["prefetchNeighbours"]
+    takePrefetched = contentFirstBrowse._takePrefetched
+
+    def countedTakePrefetched(*args):
+        entry = takePrefetched(*args)
+        if entry is not None:
+            hits.append(entry)
+        return entry
+
+    section["prefetchNeighbours"] = True
+    contentFirstBrowse._takePrefetched = countedTakePrefetched
+    try:
+        for name, func in FUNCTIONS:
+            replay.resetSpeechState()
+            doc = LineDocument("prefetch", list(lines))
+            items = []
+            for step, index in enumerate(walk):
+                info = doc.makeLineInfo(index)
+                items.append(benchScaling.speechItems(func(info, unit=replay.textInfos.UNIT_LINE, reason=OutputReason.CARET)))
+                core.runPendingCalls()
+                if step in edits:
+                    nextIndex = walk[step + 1]
+                    doc.lines[nextIndex] = inLandmark(doc.lines[nextIndex], 900000 + step)
+            spoken[name] = items
+    finally:
+        section["prefetchNeighbours"] = prefetchNeighbours
+        contentFirstBrowse._takePrefetched = takePrefetched
+    mismatches = [("step",) + mismatch for mismatch in compareSpoken(spoken["original"], spoken["patched"])]
+    if not hits:
+        mismatches.append(("prepared speech was never used",))
+    return {"calls": 2 * steps, "mismatches": mismatches}
+
+
+def checkLatencyFallback(rng, steps=600):
+    lines = corpusLines()
+    walk = randomWalk(rng, len(lines), steps)
+    spoken = {}
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    latencyBudget = section["latencyBudget"]
+    prefetchNeighbours = section["prefetchNeighbours"]
+    floor = contentFirstBrowse._LATENCY_GUARD_FLOOR
+    # Moves served from prefetched speech are not timed, so every move is computed.
+    section["prefetchNeighbours"] = False
+    # Without the floor, any budget below 1 makes content first too slow.
+    contentFirstBrowse._LATENCY_GUARD_FLOOR = 0.0
+    try:
+        for name, func in FUNCTIONS:
+            replay.resetSpeechState()
+            section["latencyBudget"] = 0.01
+            doc = LineDocument("latency", lines)
+            items = []
+            fallback = []
+            for step, index in enumerate(walk):
+                if step == steps // 2:
+                    section["latencyBudget"] = 1000.0
+                info = doc.makeLineInfo(index)
+                items.append(benchScaling.speechItems(func(info, unit=replay.textInfos.UNIT_LINE, reason=OutputReason.CARET)))
+                docState = contentFirstBrowse._documentStates.get(doc)
+                fallback.append(docState is not None and docState.latencyGuard.fallback)
+                core.runPendingCalls()
+            spoken[name] = items
+    finally:
+        section["latencyBudget"] = latencyBudget
+        section["prefetchNeighbours"] = prefetchNeighbours
+        contentFirstBrowse._LATENCY_GUARD_FLOOR = floor
+    mismatches = [("step",) + mismatch for mismatch in compareSpoken(spoken["original"], spoken["patched"])]
+    if not any(fallback[: steps // 2]):
+        mismatches.append(("never fell back to NVDA's speech",))
+    if any(fallback[-steps // 4 :]):
+        mismatches.append(("did not return to content first",))
+    return {"calls": 2 * steps, "mismatches": mismatches}
+
+
+def interruptAt(info, call):
+    """Make ``info`` report a key press at its ``call``-th control field, as a user typing ahead would.
+
+    With ``call`` 0 the key is pressed while the text and fields are read.
+    """
+    name = "getControlFieldSpeech" if call else "getTextWithFields"
+    method = getattr(info, name)
+    calls = [0]
+
+    def interrupting(*args, **kwargs):
+        calls[0] += 1
+        if calls[0] == max(call, 1):
+            contentFirstBrowse._noteGesture(gesture=inputCore.InputGesture())
+        return method(*args, **kwargs)
+
+    setattr(info, name, interrupting)
+
+
+def checkSupersede(rng, steps=300):
+    lines = corpusLines()
+    lineWalk = randomWalk(rng, len(lines), steps)
+    cellWalk = []
+    row = column = 1
+    for _step in range(steps):
+        cellWalk.append((row, column))
+        row = min(GRID_ROWS, max(1, row + rng.choice((-1, 0, 1))))
+        column = min(GRID_COLUMNS, max(1, column + rng.choice((-1, 0, 1))))
+    interrupts = {step: rng.randint(0, 4) for step in range(steps) if rng.random() < 0.3}
+    section = replay.config.conf[contentFirstBrowse._CONFIG_SECTION]
+    streamLeadingContent = section["streamLeadingContent"]
+    updateCachesForSuperseded = contentFirstBrowse._updateCachesForSuperseded
+    superseded = []
+
+    def countedUpdateCachesForSuperseded(*args):
+        superseded.append(args)
+        return updateCachesForSuperseded(*args)
+
+    def makeInfos(walk, doc):
+        if walk is lineWalk:
+            return (doc.makeLineInfo(index) for index in walk), replay.textInfos.UNIT_LINE
+        infos = (
+            replay.ReplayTextInfo(doc, [replay.decodeCommand(item) for item in gridCell(row, column)])
+            for row, column in walk
+        )
+        return infos, replay.textInfos.UNIT_CELL
+
+    mismatches = []
+    contentFirstBrowse._updateCachesForSuperseded = countedUpdateCachesForSuperseded
+    try:
+        for stream in (False, True):
+            section["streamLeadingContent"] = stream
+            for walkName, walk in (("lines", lineWalk), ("cells", cellWalk)):
+                spoken = {}
+                for name, func in FUNCTIONS:
+                    replay.resetSpeechState()
+                    infos, unit = makeInfos(walk, LineDocument("supersede", lines))
+                    items = []
+                    for step, info in enumerate(infos):
+                        if step in interrupts:
+                            interruptAt(info, interrupts[step])
+                        items.append(benchScaling.speechItems(func(info, unit=unit, reason=OutputReason.CARET)))
+                    spoken[name] = items
+                mismatches.extend(
+                    (walkName, "streamed" if stream else "whole", "step", step, missing, extra)
+                    for step, missing, extra in compareSpoken(spoken["original"], spoken["patched"])
+                    if step not in interrupts
+                )
+    finally:
+        section["streamLeadingContent"] = streamLeadingContent
+        contentFirstBrowse._updateCachesForSuperseded = updateCachesForSuperseded
+    if not superseded:
+        mismatches.append(("no move was ever abandoned",))
+    return {"calls": 8 * steps, "mismatches": mismatches}
+
+
+# Quick navigation types and the read unit NVDA passes for them.
+QUICKNAV_TYPES = (("heading", None), ("link", replay.textInfos.UNIT_LINE), ("formField", None))
+QUICKNAV_ROLES = {"heading": {Role.HEADING}, "link": {Role.LINK}, "formField": {Role.BUTTON, Role.EDITABLETEXT}}
+# Lines between the editable fields added to the quick navigation document.
+EDITABLE_FIELD_SPACING = 40
+
+
+class QuickNavItem:
+    """An item of a ``QuickNavDocument``, with what ``TextInfoQuickNavItem.report`` reads of it."""
+
+    def __init__(self, doc, itemType, start, end, role):
+        self.itemType = itemType
+        self.textInfo = LineTextInfo(doc, (start, end))
+        self.obj = type("QuickNavObject", (), {"role": role})()
+
+
+class QuickNavDocument(LineDocument):
+    """A ``LineDocument`` whose items quick navigation can move through."""
+
+    def __init__(self, name, lines, items):
+        super().__init__(name, lines)
+        self.items = items
+
+    def _iterNodesByType(self, itemType, direction="next", pos=None):
+        if direction != "next":
+            raise NotImplementedError(direction)
+        for nodeType, start, end, role in self.items:
+            if nodeType == itemType and start >= pos._startOffset:
+                yield QuickNavItem(self, itemType, start, end, role)
+
+
+def editableField(uniqueID, name):
+    """Return the corpus commands of the two lines of an editable field."""
+    first = []
+    _start(first, Role.EDITABLETEXT, uniqueID, name=name)
+    first.extend(["first line of %s" % name, ["ce"]])
+    second = []
+    _start(second, Role.EDITABLETEXT, uniqueID, startOfNode=False, name=name)
+    second.extend(["second line of %s" % name, ["ce"]])
+    return [first, second]
+
+
+def quickNavDocument():
+    """Return the lines of the quick navigation document and its ``(itemType, start, end, role)`` items."""
+    lines = []
+    items = []
+    for offset, line in enumerate(corpusLines()):
+        if offset % EDITABLE_FIELD_SPACING == EDITABLE_FIELD_SPACING - 1:
+            uniqueID = 800000 + offset
+            items.append(("formField", len(lines), len(lines) + 2, Role.EDITABLETEXT))
+            lines.extend(editableField(uniqueID, "field %d" % uniqueID))
+        roles = {Role(item[1]["role"]) for item in line if item[0] == "cs"}
+        for itemType, _readUnit in QUICKNAV_TYPES:
+            matched = roles & QUICKNAV_ROLES[itemType]
+            if matched:
+                items.append((itemType, len(lines), len(lines) + 1, matched.pop()))
+        lines.append(line)
+    return lines, items
+
+
+def quickNavInfo(doc, item, readUnit):
+    """Return what NVDA's ``TextInfoQuickNavItem.report`` reads of ``item``."""
+    itemType, start, end, role = item
+    if itemType == "formField" and role == Role.EDITABLETEXT:
+        readUnit = replay.textInfos.UNIT_LINE
+    info = LineTextInfo(doc, (start, end))
+    if readUnit:
+        fieldInfo = info.copy()
+        info.collapse()
+        info.move(readUnit, 1, endPoint="end")
+        if info.compareEndPoints(fieldInfo, "endToEnd") > 0:
+            info.setEndPoint(fieldInfo, "endToEnd")
+    return info
+
+
+def checkQuickNav(rng, steps=200):
+    lines, items = quickNavDocument()
+    walks = []
+    for itemType, readUnit in QUICKNAV_TYPES:
+        typeItems = [item for item in items if item[0] == itemType]
+        walk = randomWalk(rng, len(typeItems), steps)
+        edits = {step for step in range(steps - 1) if rng.random() < 0.2}
+        walks.append((itemType, readUnit, typeItems, walk, edits))
+    editableStarts = {start for itemType, start, _end, role in items if role == Role.EDITABLETEXT}
+    spoken = {}
+    hits = []
+    takeQuickNavEntry = contentFirstBrowse._takeQuickNavEntry
+
+    def countedTakeQuickNavEntry(docState, info, *args):
+        entry = takeQuickNavEntry(docState, info, *args)
+        if entry is not None:
+            hits.append(info._startOffset)
+        return entry
+
+    contentFirstBrowse._takeQuickNavEntry = countedTakeQuickNavEntry
+    try:
+        for name, func in FUNCTIONS:
+            replay.resetSpeechState()
+            doc = QuickNavDocument("quickNav", list(lines), items)
+            spokenItems = []
+            for itemType, readUnit, typeItems, walk, edits in walks:
+                for step, index in enumerate(walk):
+                    info = quickNavInfo(doc, typeItems[index], readUnit)
+                    spokenItems.append(benchScaling.speechItems(func(info, unit=None, reason=OutputReason.QUICKNAV)))
+                    # The patched script builds the index after NVDA's script has reported the item.
+                    doc._quickNavScript(None, itemType, "next", "", readUnit)
+                    core.runPendingCalls()
+                    if step in edits:
+                        _itemType, start, _end, role = typeItems[walk[step + 1]]
+                        if role == Role.EDITABLETEXT:
+                            uniqueID = 800000 + step
+                            doc.lines[start : start + 2] = editableField(uniqueID, "renamed %d" % uniqueID)
+                        else:
+                            doc.lines[start] = inLandmark(doc.lines[start], 900000 + step)
+            spoken[name] = spokenItems
+    finally:
+        contentFirstBrowse._takeQuickNavEntry = takeQuickNavEntry
+    mismatches = [("step",) + mismatch for mismatch in compareSpoken(spoken["original"], spoken["patched"])]
+    if not hits:
+        mismatches.append(("indexed speech was never used",))
+    elif editableStarts.isdisjoint(hits):
+        mismatches.append(("indexed speech was never used for an editable field",))
+    return {"calls": 2 * steps * len(QUICKNAV_TYPES), "mismatches": mismatches}
+
+
+CHECKS = {
+    "cellWalk": checkCellWalk,
+    "sayAllCarry": checkSayAllCarry,
+    "prefetch": checkPrefetch,
+    "latencyFallback": checkLatencyFallback,
+    "supersede": checkSupersede,
+    "quickNav": checkQuickNav,
+}
+
+
+def formatReport(results):
+    header = "%-16s %6s %8s" % ("check", "calls", "result")
+    lines = [header, "-" * len(header)]
+    for name, result in results.items():
+        lines.append("%-16s %6d %8s" % (name, result["calls"], "FAIL" if result["mismatches"] else "ok"))
+    for name, result in results.items():
+        for mismatch in result["mismatches"]:
+            lines.append("%s: %s" % (name, " ".join(map(str, mismatch))))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--check",
+        action="append",
+        choices=list(CHECKS),
+        help="check to run, may be repeated (default all)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random walks (default 0)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    plugin = contentFirstBrowse.GlobalPlugin()
+    try:
+        results = {name: CHECKS[name](random.Random(args.seed)) for name in args.check or CHECKS}
+    finally:
+        plugin.terminate()
+    print(formatReport(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, default=repr)
+    return 1 if any(result["mismatches"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""Stand-in for NVDA's ``browseMode`` module."""
+
+import textInfos
+
+
+class BrowseModeTreeInterceptor:
+    def __init__(self, rootNVDAObject=None):
+        self.rootNVDAObject = rootNVDAObject
+        self.passThrough = False
+
+    def _iterNodesByType(self, itemType, direction="next", pos=None):
+        raise NotImplementedError
+
+    def _quickNavScript(self, gesture, itemType, direction, errorMessage, readUnit):
+        pass
+
+
+class BrowseModeDocumentTreeInterceptor(BrowseModeTreeInterceptor):
+    def __init__(self, rootNVDAObject=None):
+        super().__init__(rootNVDAObject)
+        self._lastCaretMoveWasFocus = False
+
+
+class BrowseModeDocumentTextInfo(textInfos.TextInfo):
+    pass
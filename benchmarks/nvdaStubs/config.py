@@ -0,0 +1,109 @@
+"""Stand-in for NVDA's ``config`` module.
+
+``conf`` is a tree of ``AggregatedSection`` dicts holding the NVDA 2025.3
+defaults for the sections the speech code reads. As in NVDA, writes go
+through ``AggregatedSection.__setitem__`` and ``copy()`` returns a plain dict.
+Add-ons can register extra sections in ``conf.spec``; their defaults are
+filled in on first access.
+"""
+
+import copy
+import re
+
+import extensionPoints
+
+post_configProfileSwitch = extensionPoints.Action()
+post_configReset = extensionPoints.Action()
+
+
+class AggregatedSection(dict):
+    def copy(self):
+        return dict(self)
+
+
+_SPEC_DEFAULT = re.compile(r"^(\w+)\(.*default=([^,)]*)")
+
+
+def _specDefault(spec):
+    match = _SPEC_DEFAULT.match(spec)
+    if match is None:
+        raise ValueError("unsupported spec: %r" % spec)
+    kind, value = match.groups()
+    value = value.strip().strip("\"'")
+    if kind == "boolean":
+        return value == "True"
+    if kind == "integer":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    return value
+
+
+class ConfigManager(AggregatedSection):
+    def __init__(self, sections):
+        super().__init__(sections)
+        self.spec = {}
+
+    def __missing__(self, key):
+        section = AggregatedSection({name: _specDefault(spec) for name, spec in self.spec[key].items()})
+        dict.__setitem__(self, key, section)
+        return section
+
+
+_defaults = {
+    "documentFormatting": {
+        "detectFormatAfterCursor": False,
+        "reportFontName": False,
+        "reportFontSize": False,
+        "reportFontAttributes": False,
+        "reportSuperscriptsAndSubscripts": False,
+        "reportEmphasis": False,
+        "reportHighlight": True,
+        "reportColor": False,
+        "reportRevisions": True,
+        "reportSpellingErrors": True,
+        "reportPage": True,
+        "reportLineNumber": False,
+        "reportLineIndentation": 0,
+        "ignoreBlankLinesForRLI": False,
+        "reportParagraphIndentation": False,
+        "reportTables": True,
+        "includeLayoutTables": False,
+        "reportTableHeaders": 1,
+        "reportTableCellCoords": True,
+        "reportCellBorders": 0,
+        "reportLinks": True,
+        "reportLinkType": True,
+        "reportGraphics": True,
+        "reportComments": True,
+        "reportBookmarks": True,
+        "reportLists": True,
+        "reportHeadings": True,
+        "reportBlockQuotes": True,
+        "reportGroupings": True,
+        "reportLandmarks": True,
+        "reportArticles": False,
+        "reportFrames": True,
+        "reportFigures": True,
+        "reportClickable": True,
+    },
+    "speech": {
+        "autoLanguageSwitching": True,
+    },
+}
+
+
+
+def _makeConf():
+    return ConfigManager(
+        {name: AggregatedSection(copy.deepcopy(section)) for name, section in _defaults.items()},
+    )
+
+
+conf = _makeConf()
+
+
+def resetConf():
+    dict.clear(conf)
+    dict.update(conf, _makeConf())
+    post_configReset.notify(factoryDefaults=True)
@@ -0,0 +1,100 @@
+"""Stand-in for NVDA's ``controlTypes`` module.
+
+Only the members used by ``contentFirstBrowse`` and the stub speech functions
+are provided. Values match NVDA 2025.3 so that corpora can store roles and
+states as plain integers.
+"""
+
+import enum
+
+
+class OutputReason(enum.IntEnum):
+    FOCUS = enum.auto()
+    FOCUSENTERED = enum.auto()
+    MOUSE = enum.auto()
+    QUERY = enum.auto()
+    CHANGE = enum.auto()
+    MESSAGE = enum.auto()
+    SAYALL = enum.auto()
+    CARET = enum.auto()
+    ONLYCACHE = enum.auto()
+    QUICKNAV = enum.auto()
+
+
+class _DisplayStringIntEnum(enum.IntEnum):
+    @property
+    def displayString(self):
+        return _displayStrings.get(self, self.name.lower())
+
+
+class Role(_DisplayStringIntEnum):
+    UNKNOWN = 0
+    CHECKBOX = 5
+    RADIOBUTTON = 6
+    STATICTEXT = 7
+    EDITABLETEXT = 8
+    BUTTON = 9
+    COMBOBOX = 13
+    LIST = 14
+    LISTITEM = 15
+    GRAPHIC = 16
+    LINK = 19
+    TABLE = 28
+    TABLECELL = 29
+    TABLEROW = 31
+    TABLECOLUMNHEADER = 32
+    TABLEROWHEADER = 33
+    FORM = 39
+    HEADING = 40
+    PARAGRAPH = 47
+    BLOCKQUOTE = 48
+    DOCUMENT = 52
+    GROUPING = 56
+    PROPERTYPAGE = 57
+    SECTION = 86
+    MATH = 104
+    LANDMARK = 150
+    ARTICLE = 151
+    REGION = 152
+    FIGURE = 153
+
+
+class State(_DisplayStringIntEnum):
+    UNAVAILABLE = 0x1
+    FOCUSED = 0x2
+    SELECTED = 0x4
+    BUSY = 0x8
+    PRESSED = 0x10
+    CHECKED = 0x20
+    HALFCHECKED = 0x40
+    READONLY = 0x80
+    EXPANDED = 0x100
+    COLLAPSED = 0x200
+    INVISIBLE = 0x400
+    VISITED = 0x800
+    LINKED = 0x1000
+    HASPOPUP = 0x2000
+    PROTECTED = 0x4000
+    REQUIRED = 0x8000
+    INVALID_ENTRY = 0x20000
+    MULTILINE = 0x100000
+    FOCUSABLE = 0x1000000
+    CLICKABLE = 0x2000000
+    EDITABLE = 0x4000000
+    CHECKABLE = 0x8000000
+
+
+_displayStrings = {
+    Role.EDITABLETEXT: "edit",
+    Role.COMBOBOX: "combo box",
+    Role.LISTITEM: "list item",
+    Role.TABLECELL: "cell",
+    Role.TABLECOLUMNHEADER: "column header",
+    Role.TABLEROWHEADER: "row header",
+    Role.CHECKBOX: "check box",
+    Role.RADIOBUTTON: "radio button",
+    Role.BLOCKQUOTE: "block quote",
+    State.HASPOPUP: "has popup",
+    State.INVALID_ENTRY: "invalid entry",
+    State.HALFCHECKED: "half checked",
+}
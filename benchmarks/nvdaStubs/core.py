@@ -0,0 +1,36 @@
+"""Stand-in for NVDA's ``core`` module.
+
+``callLater`` only queues the call. Nothing runs it automatically; call
+``runPendingCalls`` to run the calls that have not been stopped.
+"""
+
+_pending = []
+
+
+class _CallLater:
+    def __init__(self, delay, callable, args, kwargs):
+        self.delay = delay
+        self.callable = callable
+        self.args = args
+        self.kwargs = kwargs
+
+    def Stop(self):
+        try:
+            _pending.remove(self)
+        except ValueError:
+            pass
+
+    def IsRunning(self):
+        return self in _pending
+
+
+def callLater(delay, callable, *args, **kwargs):
+    timer = _CallLater(delay, callable, args, kwargs)
+    _pending.append(timer)
+    return timer
+
+
+def runPendingCalls():
+    while _pending:
+        timer = _pending.pop(0)
+        timer.callable(*timer.args, **timer.kwargs)
@@ -0,0 +1,29 @@
+"""Stand-in for NVDA's ``extensionPoints`` module."""
+
+
+class Action:
+    def __init__(self):
+        self._handlers = []
+
+    def register(self, handler):
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    def unregister(self, handler):
+        try:
+            self._handlers.remove(handler)
+            return True
+        except ValueError:
+            return False
+
+    def notify(self, **kwargs):
+        for handler in list(self._handlers):
+            handler(**kwargs)
+
+
+class Decider(Action):
+    def decide(self, **kwargs):
+        for handler in list(self._handlers):
+            if not handler(**kwargs):
+                return False
+        return True
@@ -0,0 +1,11 @@
+"""Stand-in for NVDA's ``globalVars`` module."""
+
+import os
+import tempfile
+
+
+class _AppArgs:
+    configPath = os.path.join(tempfile.gettempdir(), "nvdaStubConfig")
+
+
+appArgs = _AppArgs()
@@ -0,0 +1,14 @@
+"""Stand-in for NVDA's ``inputCore`` module."""
+
+import extensionPoints
+
+
+class InputGesture:
+    SPEECHEFFECT_CANCEL = "cancel"
+    SPEECHEFFECT_PAUSE = "pause"
+    SPEECHEFFECT_RESUME = "resume"
+
+    speechEffectWhenExecuted = SPEECHEFFECT_CANCEL
+
+
+decide_executeGesture = extensionPoints.Decider()
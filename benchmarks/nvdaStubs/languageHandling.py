@@ -0,0 +1,11 @@
+"""Stand-in for NVDA's ``speech.languageHandling`` helpers.
+
+The harness toggles ``autoLanguageSwitching`` per workload to exercise the
+language change paths of the speech builders.
+"""
+
+autoLanguageSwitching = True
+
+
+def shouldMakeLangChangeCommand():
+    return autoLanguageSwitching
@@ -0,0 +1,6 @@
+"""Stand-in for NVDA's ``logHandler`` module."""
+
+import logging
+
+log = logging.getLogger("nvda")
+log.debugWarning = log.debug
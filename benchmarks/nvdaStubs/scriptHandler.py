@@ -0,0 +1,12 @@
+"""Stand-in for NVDA's ``scriptHandler`` module."""
+
+
+def script(description="", category=None, gesture=None, gestures=None, **kwargs):
+    def decorator(func):
+        func.__doc__ = description
+        if category is not None:
+            func.category = category
+        func.gestures = list(gestures or ()) + ([gesture] if gesture else [])
+        return func
+
+    return decorator
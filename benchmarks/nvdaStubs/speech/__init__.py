@@ -0,0 +1,6 @@
+"""Stand-in for NVDA's ``speech`` package."""
+
+from .speech import (  # noqa: F401
+    SpeakTextInfoState,
+    getTextInfoSpeech,
+)
@@ -0,0 +1,743 @@
+"""Stand-in for NVDA's ``speech.speech`` module.
+
+``getTextInfoSpeech`` follows NVDA 2025.3 step for step so it can serve as
+the native baseline. The field speech helpers are reduced versions of their
+NVDA counterparts: they consult the same configuration keys, keep the same
+caches and module state (format attribute cache, table coordinates) and
+produce sequences of similar shape and size.
+"""
+
+import enum
+import itertools
+import re
+import unicodedata
+import weakref
+
+import config
+import controlTypes
+import languageHandling
+import textInfos
+from controlTypes import OutputReason
+
+BLANK_CHUNK_CHARS = frozenset((" ", "\n", "\r", "\0", "\u00a0"))
+LINE_END_CHARS = frozenset(("\n", "\r"))
+RE_INDENTATION_SPLIT = re.compile(r"^([^\S\r\n\f\v]*)(.*)$", re.UNICODE | re.DOTALL)
+
+
+class ReportLineIndentation(enum.IntEnum):
+    OFF = 0
+    SPEECH = 1
+    TONES = 2
+    SPEECH_AND_TONES = 3
+
+
+class ReportTableHeaders(enum.IntEnum):
+    OFF = 0
+    ROWS_AND_COLUMNS = 1
+    ROWS = 2
+    COLUMNS = 3
+
+
+class SpeechCommand:
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash((type(self), tuple(sorted(vars(self).items()))))
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join(repr(v) for v in vars(self).values()))
+
+
+class LangChangeCommand(SpeechCommand):
+    def __init__(self, lang):
+        self.lang = lang
+
+
+class EndUtteranceCommand(SpeechCommand):
+    pass
+
+
+class CallbackCommand(SpeechCommand):
+    def __init__(self, callback, name=None):
+        self._callback = callback
+        self._name = name
+
+
+class SpeechState:
+    def __init__(self):
+        self.oldTableID = None
+        self.oldRowNumber = None
+        self.oldRowSpan = None
+        self.oldColumnNumber = None
+        self.oldColumnSpan = None
+
+
+_speechState = SpeechState()
+
+
+class SpeakTextInfoState:
+    """Caches the state of a TextInfo's speech between calls, as in NVDA."""
+
+    __slots__ = [
+        "objRef",
+        "controlFieldStackCache",
+        "formatFieldAttributesCache",
+        "indentationCache",
+    ]
+
+    def __init__(self, obj):
+        if isinstance(obj, SpeakTextInfoState):
+            oldState = obj
+            self.objRef = oldState.objRef
+        else:
+            self.objRef = weakref.ref(obj)
+            oldState = getattr(obj, "_speakTextInfoState", None)
+        self.controlFieldStackCache = list(oldState.controlFieldStackCache) if oldState else []
+        self.formatFieldAttributesCache = oldState.formatFieldAttributesCache if oldState else {}
+        self.indentationCache = oldState.indentationCache if oldState else ""
+
+    def updateObj(self):
+        obj = self.objRef()
+        if obj:
+            obj._speakTextInfoState = self.copy()
+
+    def copy(self):
+        return self.__class__(self)
+
+
+def isBlank(text):
+    return not text or all(c in BLANK_CHUNK_CHARS for c in text)
+
+
+def unicodeNormalize(text):
+    return unicodedata.normalize("NFKC", text)
+
+
+def splitTextIndentation(text):
+    return RE_INDENTATION_SPLIT.match(text).groups()
+
+
+def getIndentationSpeech(indentation, formatConfig):
+    if not indentation:
+        return ["no indent"]
+    res = []
+    for char, group in itertools.groupby(indentation):
+        count = len(list(group))
+        name = "space" if char == " " else "tab" if char == "\t" else "indent"
+        res.append("%d %s" % (count, name))
+    return [" ".join(res)]
+
+
+def getSpellingSpeech(text, locale=None):
+    if locale is not None:
+        yield LangChangeCommand(locale)
+    for char in text:
+        yield char
+        yield EndUtteranceCommand()
+
+
+def _isControlEndFieldCommand(command):
+    return isinstance(command, textInfos.FieldCommand) and command.command == "controlEnd"
+
+
+class _MathSpeechProvider:
+    """Walks the MathML markup the way a presentation provider would."""
+
+    _TAG = re.compile(r"<(/?)(\w+)[^>]*>|([^<]+)")
+    _NAMES = {"mfrac": "fraction", "msqrt": "square root", "msup": "superscript", "msub": "subscript"}
+
+    def getSpeechForMathMl(self, mathMl):
+        out = []
+        depth = 0
+        for closing, tag, text in self._TAG.findall(mathMl):
+            if text:
+                out.append(text.strip())
+            elif closing:
+                depth -= 1
+                if tag in self._NAMES:
+                    out.append("end " + self._NAMES[tag])
+            else:
+                depth += 1
+                if tag in self._NAMES:
+                    out.append(self._NAMES[tag])
+        return [" ".join(x for x in out if x)]
+
+
+mathSpeechProvider = _MathSpeechProvider()
+
+
+def _extendSpeechSequence_addMathForTextInfo(speechSequence, info, field):
+    try:
+        speechSequence.extend(mathSpeechProvider.getSpeechForMathMl(info.getMathMl(field)))
+    except (NotImplementedError, LookupError):
+        return
+
+
+_REPORTABLE_STATES = (
+    controlTypes.State.VISITED,
+    controlTypes.State.REQUIRED,
+    controlTypes.State.CHECKED,
+    controlTypes.State.HALFCHECKED,
+    controlTypes.State.PRESSED,
+    controlTypes.State.EXPANDED,
+    controlTypes.State.COLLAPSED,
+    controlTypes.State.HASPOPUP,
+    controlTypes.State.INVALID_ENTRY,
+    controlTypes.State.UNAVAILABLE,
+)
+
+_ROLE_CONFIG_KEYS = {
+    controlTypes.Role.LINK: "reportLinks",
+    controlTypes.Role.GRAPHIC: "reportGraphics",
+    controlTypes.Role.HEADING: "reportHeadings",
+    controlTypes.Role.LIST: "reportLists",
+    controlTypes.Role.BLOCKQUOTE: "reportBlockQuotes",
+    controlTypes.Role.GROUPING: "reportGroupings",
+    controlTypes.Role.LANDMARK: "reportLandmarks",
+    controlTypes.Role.REGION: "reportLandmarks",
+    controlTypes.Role.ARTICLE: "reportArticles",
+    controlTypes.Role.FIGURE: "reportFigures",
+    controlTypes.Role.TABLE: "reportTables",
+    controlTypes.Role.TABLECELL: "reportTables",
+    controlTypes.Role.TABLECOLUMNHEADER: "reportTables",
+    controlTypes.Role.TABLEROWHEADER: "reportTables",
+}
+
+
+def _getTableCellSpeech(attrs, formatConfig, stateSequence):
+    tableID = attrs.get("table-id")
+    # As in NVDA, aria-rowindex/aria-colindex take precedence over the real coordinates.
+    rowNumber = attrs.get("table-rownumber-presentational") or attrs.get("table-rownumber")
+    columnNumber = attrs.get("table-columnnumber-presentational") or attrs.get("table-columnnumber")
+    reportTableHeaders = formatConfig["reportTableHeaders"]
+    reportCoords = formatConfig["reportTableCellCoords"]
+    sequence = []
+    if rowNumber and (tableID != _speechState.oldTableID or rowNumber != _speechState.oldRowNumber):
+        rowHeaderText = attrs.get("table-rowheadertext")
+        if rowHeaderText and reportTableHeaders in (ReportTableHeaders.ROWS_AND_COLUMNS, ReportTableHeaders.ROWS):
+            sequence.append(rowHeaderText)
+        if reportCoords:
+            sequence.append("row %s" % rowNumber)
+        _speechState.oldRowNumber = rowNumber
+    if columnNumber and (tableID != _speechState.oldTableID or columnNumber != _speechState.oldColumnNumber):
+        columnHeaderText = attrs.get("table-columnheadertext")
+        if columnHeaderText and reportTableHeaders in (
+            ReportTableHeaders.ROWS_AND_COLUMNS,
+            ReportTableHeaders.COLUMNS,
+        ):
+            sequence.append(columnHeaderText)
+        if reportCoords:
+            sequence.append("column %s" % columnNumber)
+        _speechState.oldColumnNumber = columnNumber
+    _speechState.oldTableID = tableID
+    sequence.extend(stateSequence)
+    return sequence
+
+
+def getControlFieldSpeech(attrs, ancestorAttrs, fieldType, formatConfig=None, extraDetail=False, reason=None):
+    if not formatConfig:
+        formatConfig = config.conf["documentFormatting"]
+    presCat = attrs.getPresentationCategory(ancestorAttrs, formatConfig, reason=reason)
+    role = attrs.get("role", controlTypes.Role.UNKNOWN)
+    configKey = _ROLE_CONFIG_KEYS.get(role)
+    if configKey and not formatConfig[configKey]:
+        return []
+    states = attrs.get("states", set())
+    if reason == OutputReason.FOCUS or attrs.get("alwaysReportName", False):
+        name = attrs.get("name", "")
+    else:
+        name = ""
+    roleText = attrs.get("roleText")
+    roleTextSequence = [roleText or role.displayString]
+    stateSequence = [state.displayString for state in _REPORTABLE_STATES if state in states]
+    if presCat == attrs.PRESCAT_CELL:
+        if fieldType in ("start_addedToControlFieldStack", "start_relative") and attrs.get("table-id"):
+            return _getTableCellSpeech(attrs, formatConfig, stateSequence)
+        return []
+    speakEntry = presCat in (attrs.PRESCAT_SINGLELINE, attrs.PRESCAT_CONTAINER)
+    speakWithinForLine = presCat == attrs.PRESCAT_SINGLELINE
+    speakExitForLine = presCat == attrs.PRESCAT_CONTAINER and bool(roleText)
+    speakExitForOther = presCat == attrs.PRESCAT_CONTAINER
+    if speakEntry and fieldType in ("start_addedToControlFieldStack", "start_relative"):
+        sequence = []
+        if name:
+            sequence.append(name)
+        sequence.extend(roleTextSequence)
+        sequence.extend(stateSequence)
+        level = attrs.get("level")
+        if level:
+            sequence.append("level %s" % level)
+        if role == controlTypes.Role.LIST and attrs.get("_childcount"):
+            sequence.append("with %s items" % attrs["_childcount"])
+        elif role == controlTypes.Role.TABLE and attrs.get("table-rowcount"):
+            sequence.append(
+                "with %s rows and %s columns" % (attrs["table-rowcount"], attrs.get("table-columncount")),
+            )
+        if attrs.get("description"):
+            sequence.append(attrs["description"])
+        return sequence
+    elif fieldType == "start_inControlFieldStack" and speakWithinForLine:
+        return roleTextSequence + stateSequence
+    elif fieldType == "end_removedFromControlFieldStack" and speakExitForOther:
+        return ["out of %s" % roleTextSequence[0]]
+    elif fieldType in ("end_relative", "end_inControlFieldStack") and speakExitForLine:
+        return ["out of %s" % roleTextSequence[0]]
+    return []
+
+
+_FONT_ATTRIBUTES = ("bold", "italic", "underline", "strikethrough")
+
+
+def getFormatFieldSpeech(
+    attrs,
+    attrsCache=None,
+    formatConfig=None,
+    reason=None,
+    unit=None,
+    extraDetail=False,
+    initialFormat=False,
+):
+    if not formatConfig:
+        formatConfig = config.conf["documentFormatting"]
+    if attrsCache is None:
+        attrsCache = {}
+    textList = []
+    if formatConfig["reportPage"]:
+        pageNumber = attrs.get("page-number")
+        if pageNumber and pageNumber != attrsCache.get("page-number"):
+            textList.append("page %s" % pageNumber)
+    if formatConfig["reportFontName"]:
+        fontFamily = attrs.get("font-family")
+        if fontFamily and fontFamily != attrsCache.get("font-family"):
+            textList.append(fontFamily)
+    if formatConfig["reportFontSize"]:
+        fontSize = attrs.get("font-size")
+        if fontSize and fontSize != attrsCache.get("font-size"):
+            textList.append(fontSize)
+    if formatConfig["reportFontAttributes"]:
+        for name in _FONT_ATTRIBUTES:
+            value = attrs.get(name)
+            oldValue = attrsCache.get(name)
+            if (value or oldValue is not None) and value != oldValue:
+                textList.append(name if value else "no %s" % name)
+    if formatConfig["reportSpellingErrors"]:
+        invalidSpelling = attrs.get("invalid-spelling")
+        oldInvalidSpelling = attrsCache.get("invalid-spelling")
+        if (invalidSpelling or oldInvalidSpelling is not None) and invalidSpelling != oldInvalidSpelling:
+            textList.append("spelling error" if invalidSpelling else "out of spelling error")
+    if formatConfig["reportHighlight"]:
+        marked = attrs.get("marked")
+        oldMarked = attrsCache.get("marked")
+        if (marked or oldMarked is not None) and marked != oldMarked:
+            textList.append("highlighted" if marked else "out of highlighted")
+    if formatConfig["reportComments"]:
+        comment = attrs.get("comment")
+        if comment and comment != attrsCache.get("comment"):
+            textList.append("has comment")
+    attrsCache.clear()
+    attrsCache.update(attrs)
+    return textList
+
+
+def _getTextInfoSpeech_considerSpelling(unit, onlyInitialFields, textWithFields, reason, speechSequence, language):
+    if onlyInitialFields or any(isinstance(x, str) for x in speechSequence):
+        yield speechSequence
+    if not onlyInitialFields:
+        yield list(getSpellingSpeech(textWithFields[0], locale=language))
+
+
+def _getTextInfoSpeech_updateCache(useCache, speakTextInfoState, newControlFieldStack, formatFieldAttributesCache):
+    speakTextInfoState.controlFieldStackCache = newControlFieldStack
+    speakTextInfoState.formatFieldAttributesCache = formatFieldAttributesCache
+    if not isinstance(useCache, SpeakTextInfoState):
+        speakTextInfoState.updateObj()
+
+
+def getTextInfoSpeech(
+    info,
+    useCache=True,
+    formatConfig=None,
+    unit=None,
+    reason=OutputReason.QUERY,
+    _prefixSpeechCommand=None,
+    onlyInitialFields=False,
+    suppressBlanks=False,
+):
+    if isinstance(useCache, SpeakTextInfoState):
+        speakTextInfoState = useCache
+    elif useCache:
+        speakTextInfoState = SpeakTextInfoState(info.obj)
+    else:
+        speakTextInfoState = None
+    extraDetail = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
+    if not formatConfig:
+        formatConfig = config.conf["documentFormatting"]
+    formatConfig = formatConfig.copy()
+    if extraDetail:
+        formatConfig["extraDetail"] = True
+    reportIndentation = (
+        unit == textInfos.UNIT_LINE and formatConfig["reportLineIndentation"] != ReportLineIndentation.OFF
+    )
+    # For performance reasons, when navigating by paragraph or table cell, spelling errors will not be announced.
+    if unit in (textInfos.UNIT_PARAGRAPH, textInfos.UNIT_CELL) and reason == OutputReason.CARET:
+        formatConfig["reportSpellingErrors"] = False
+
+    # Fetch the last controlFieldStack, or make a blank one
+    controlFieldStackCache = speakTextInfoState.controlFieldStackCache if speakTextInfoState else []
+    formatFieldAttributesCache = speakTextInfoState.formatFieldAttributesCache if speakTextInfoState else {}
+    textWithFields = info.getTextWithFields(formatConfig)
+    # We don't care about node bounds, especially when comparing fields.
+    # Remove them.
+    for command in textWithFields:
+        if not isinstance(command, textInfos.FieldCommand):
+            continue
+        field = command.field
+        if not field:
+            continue
+        try:
+            del field["_startOfNode"]
+        except KeyError:
+            pass
+        try:
+            del field["_endOfNode"]
+        except KeyError:
+            pass
+
+    # Make a new controlFieldStack and formatField from the textInfo's initialFields
+    newControlFieldStack = []
+    newFormatField = textInfos.FormatField()
+    initialFields = []
+    for field in textWithFields:
+        if isinstance(field, textInfos.FieldCommand) and field.command in ("controlStart", "formatChange"):
+            initialFields.append(field.field)
+        else:
+            break
+    if len(initialFields) > 0:
+        del textWithFields[0 : len(initialFields)]
+    endFieldCount = 0
+    for field in reversed(textWithFields):
+        if isinstance(field, textInfos.FieldCommand) and field.command == "controlEnd":
+            endFieldCount += 1
+        else:
+            break
+    if endFieldCount > 0:
+        del textWithFields[0 - endFieldCount :]
+    for field in initialFields:
+        if isinstance(field, textInfos.ControlField):
+            newControlFieldStack.append(field)
+        elif isinstance(field, textInfos.FormatField):
+            newFormatField.update(field)
+        else:
+            raise ValueError("unknown field: %s" % field)
+    # Calculate how many fields in the old and new controlFieldStacks are the same
+    commonFieldCount = 0
+    for count in range(min(len(newControlFieldStack), len(controlFieldStackCache))):
+        # #2199: When comparing controlFields try using uniqueID if it exists before resorting to compairing the entire dictionary
+        oldUniqueID = controlFieldStackCache[count].get("uniqueID")
+        newUniqueID = newControlFieldStack[count].get("uniqueID")
+        if ((oldUniqueID is not None or newUniqueID is not None) and newUniqueID == oldUniqueID) or (
+            newControlFieldStack[count] == controlFieldStackCache[count]
+        ):
+            commonFieldCount += 1
+        else:
+            break
+
+    speechSequence = []
+    # #2591: Only if the reason is not focus, Speak the exit of any controlFields not in the new stack.
+    # We don't do this for focus because hearing "out of list", etc. isn't useful when tabbing or using quick navigation and makes navigation less efficient.
+    if reason not in [OutputReason.FOCUS, OutputReason.QUICKNAV]:
+        endingBlock = False
+        for count in reversed(range(commonFieldCount, len(controlFieldStackCache))):
+            fieldSequence = info.getControlFieldSpeech(
+                controlFieldStackCache[count],
+                controlFieldStackCache[0:count],
+                "end_removedFromControlFieldStack",
+                formatConfig,
+                extraDetail,
+                reason=reason,
+            )
+            if fieldSequence:
+                speechSequence.extend(fieldSequence)
+            if not endingBlock and reason == OutputReason.SAYALL:
+                endingBlock = bool(int(controlFieldStackCache[count].get("isBlock", 0)))
+        if endingBlock:
+            speechSequence.append(EndUtteranceCommand())
+    # The TextInfo should be considered blank if we are only exiting fields (i.e. we aren't
+    # entering any new fields and there is no text).
+    shouldConsiderTextInfoBlank = True
+
+    if _prefixSpeechCommand is not None:
+        assert isinstance(_prefixSpeechCommand, SpeechCommand)
+        speechSequence.append(_prefixSpeechCommand)
+
+    # Get speech text for any fields that are in both controlFieldStacks, if extra detail is not requested
+    if not extraDetail:
+        for count in range(commonFieldCount):
+            field = newControlFieldStack[count]
+            fieldSequence = info.getControlFieldSpeech(
+                field,
+                newControlFieldStack[0:count],
+                "start_inControlFieldStack",
+                formatConfig,
+                extraDetail,
+                reason=reason,
+            )
+            if fieldSequence:
+                speechSequence.extend(fieldSequence)
+                shouldConsiderTextInfoBlank = False
+            if field.get("role") == controlTypes.Role.MATH:
+                shouldConsiderTextInfoBlank = False
+                _extendSpeechSequence_addMathForTextInfo(speechSequence, info, field)
+
+    # When true, we are inside a clickable field, and should therefore not announce any more new clickable fields
+    inClickable = False
+    # Get speech text for any fields in the new controlFieldStack that are not in the old controlFieldStack
+    for count in range(commonFieldCount, len(newControlFieldStack)):
+        field = newControlFieldStack[count]
+        if not inClickable and formatConfig["reportClickable"]:
+            states = field.get("states")
+            if states and controlTypes.State.CLICKABLE in states:
+                # We entered the most outer clickable, so announce it, if we won't be announcing anything else interesting for this field
+                presCat = field.getPresentationCategory(newControlFieldStack[0:count], formatConfig, reason)
+                if not presCat or presCat is field.PRESCAT_LAYOUT:
+                    speechSequence.append(controlTypes.State.CLICKABLE.displayString)
+                    shouldConsiderTextInfoBlank = False
+                inClickable = True
+        fieldSequence = info.getControlFieldSpeech(
+            field,
+            newControlFieldStack[0:count],
+            "start_addedToControlFieldStack",
+            formatConfig,
+            extraDetail,
+            reason=reason,
+        )
+        if fieldSequence:
+            speechSequence.extend(fieldSequence)
+            shouldConsiderTextInfoBlank = False
+        if field.get("role") == controlTypes.Role.MATH:
+            shouldConsiderTextInfoBlank = False
+            _extendSpeechSequence_addMathForTextInfo(speechSequence, info, field)
+        commonFieldCount += 1
+
+    # Fetch the text for format field attributes that have changed between what was previously cached, and this textInfo's initialFormatField.
+    fieldSequence = info.getFormatFieldSpeech(
+        newFormatField,
+        formatFieldAttributesCache,
+        formatConfig,
+        reason=reason,
+        unit=unit,
+        extraDetail=extraDetail,
+        initialFormat=True,
+    )
+    if fieldSequence:
+        speechSequence.extend(fieldSequence)
+    language = None
+    lastLanguage = None
+    if languageHandling.shouldMakeLangChangeCommand():
+        language = newFormatField.get("language")
+        speechSequence.append(LangChangeCommand(language))
+        lastLanguage = language
+    isWordOrCharUnit = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
+    firstText = ""
+    if len(textWithFields) > 0:
+        firstField = textWithFields[0]
+        if isinstance(firstField, str):
+            firstText = firstField.strip() if not firstField.isspace() else firstField
+    if onlyInitialFields or (
+        isWordOrCharUnit
+        and (len(firstText) == 1 or len(unicodeNormalize(firstText)) == 1)
+        and all(_isControlEndFieldCommand(x) for x in itertools.islice(textWithFields, 1, None))
+    ):
+        if reason != OutputReason.ONLYCACHE:
+            yield from _getTextInfoSpeech_considerSpelling(
+                unit,
+                onlyInitialFields,
+                textWithFields,
+                reason,
+                speechSequence,
+                language,
+            )
+        if useCache:
+            _getTextInfoSpeech_updateCache(
+                useCache,
+                speakTextInfoState,
+                newControlFieldStack,
+                formatFieldAttributesCache,
+            )
+        return False
+
+    # Similar to before, but If the most inner clickable is exited, then we allow announcing clickable for the next lot of clickable fields entered.
+    inClickable = False
+    # Move through the field commands, getting speech text for all controlStarts, controlEnds and formatChange commands
+    # But also keep newControlFieldStack up to date as we will need it for the ends
+    # Add any text to a separate list, as it must be handled differently.
+    # Also make sure that LangChangeCommand objects are added before any controlField or formatField speech
+    relativeSpeechSequence = []
+    inTextChunk = False
+    allIndentation = ""
+    indentationDone = False
+    for command in textWithFields:
+        if isinstance(command, str):
+            # Text should break a run of clickables
+            inClickable = False
+            if reportIndentation and not indentationDone:
+                indentation, command = splitTextIndentation(command)
+                # Combine all indentation into one string for later processing.
+                allIndentation += indentation
+                if command:
+                    # There was content after the indentation, so there is no more indentation.
+                    indentationDone = True
+            if command:
+                if inTextChunk:
+                    relativeSpeechSequence[-1] += command
+                else:
+                    relativeSpeechSequence.append(command)
+                    inTextChunk = True
+        elif isinstance(command, textInfos.FieldCommand):
+            newLanguage = None
+            if command.command == "controlStart":
+                # Control fields always start a new chunk, even if they have no field text.
+                inTextChunk = False
+                fieldSequence = []
+                if not inClickable and formatConfig["reportClickable"]:
+                    states = command.field.get("states")
+                    if states and controlTypes.State.CLICKABLE in states:
+                        # We have entered an outer most clickable or entered a new clickable after exiting a previous one
+                        # Announce it if there is nothing else interesting about the field, but not if the user turned it off.
+                        presCat = command.field.getPresentationCategory(
+                            newControlFieldStack[0:],
+                            formatConfig,
+                            reason,
+                        )
+                        if not presCat or presCat is command.field.PRESCAT_LAYOUT:
+                            fieldSequence.append(controlTypes.State.CLICKABLE.displayString)
+                        inClickable = True
+                fieldSequence.extend(
+                    info.getControlFieldSpeech(
+                        command.field,
+                        newControlFieldStack,
+                        "start_relative",
+                        formatConfig,
+                        extraDetail,
+                        reason=reason,
+                    )
+                )
+                newControlFieldStack.append(command.field)
+            elif command.command == "controlEnd":
+                # Exiting a controlField should break a run of clickables
+                inClickable = False
+                # Control fields always start a new chunk, even if they have no field text.
+                inTextChunk = False
+                fieldSequence = info.getControlFieldSpeech(
+                    newControlFieldStack[-1],
+                    newControlFieldStack[0:-1],
+                    "end_relative",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
+                del newControlFieldStack[-1]
+                if commonFieldCount > len(newControlFieldStack):
+                    commonFieldCount = len(newControlFieldStack)
+            elif command.command == "formatChange":
+                fieldSequence = info.getFormatFieldSpeech(
+                    command.field,
+                    formatFieldAttributesCache,
+                    formatConfig,
+                    reason=reason,
+                    unit=unit,
+                    extraDetail=extraDetail,
+                )
+                if fieldSequence:
+                    inTextChunk = False
+                if languageHandling.shouldMakeLangChangeCommand():
+                    newLanguage = command.field.get("language")
+                    if lastLanguage != newLanguage:
+                        # The language has changed, so this starts a new text chunk.
+                        inTextChunk = False
+            if not inTextChunk:
+                if fieldSequence:
+                    if languageHandling.shouldMakeLangChangeCommand() and lastLanguage is not None:
+                        # Fields must be spoken in the default language.
+                        relativeSpeechSequence.append(LangChangeCommand(None))
+                        lastLanguage = None
+                    relativeSpeechSequence.extend(fieldSequence)
+                if command.command == "controlStart" and command.field.get("role") == controlTypes.Role.MATH:
+                    _extendSpeechSequence_addMathForTextInfo(relativeSpeechSequence, info, command.field)
+                if languageHandling.shouldMakeLangChangeCommand() and newLanguage != lastLanguage:
+                    relativeSpeechSequence.append(LangChangeCommand(newLanguage))
+                    lastLanguage = newLanguage
+    if (
+        reportIndentation
+        and speakTextInfoState
+        and (
+            # either not ignoring blank lines
+            not formatConfig["ignoreBlankLinesForRLI"]
+            # or line isn't completely blank
+            or any(not (set(t) <= LINE_END_CHARS) for t in textWithFields if isinstance(t, str))
+        )
+        and allIndentation != speakTextInfoState.indentationCache
+    ):
+        indentationSpeech = getIndentationSpeech(allIndentation, formatConfig)
+        if languageHandling.shouldMakeLangChangeCommand() and speechSequence[-1].lang is not None:
+            # Indentation must be spoken in the default language,
+            # but the initial format field specified a different language.
+            # Insert the indentation before the LangChangeCommand.
+            langChange = speechSequence.pop()
+            speechSequence.extend(indentationSpeech)
+            speechSequence.append(langChange)
+        else:
+            speechSequence.extend(indentationSpeech)
+        if speakTextInfoState:
+            speakTextInfoState.indentationCache = allIndentation
+    # Don't add this text if it is blank.
+    relativeBlank = True
+    for x in relativeSpeechSequence:
+        if isinstance(x, str) and not isBlank(x):
+            relativeBlank = False
+            break
+    if not relativeBlank:
+        speechSequence.extend(relativeSpeechSequence)
+        shouldConsiderTextInfoBlank = False
+
+    # Finally get speech text for any fields left in new controlFieldStack that are common with the old controlFieldStack (for closing), if extra detail is not requested
+    if languageHandling.shouldMakeLangChangeCommand() and lastLanguage is not None:
+        speechSequence.append(
+            LangChangeCommand(None),
+        )
+        lastLanguage = None
+    if not extraDetail:
+        for count in reversed(range(min(len(newControlFieldStack), commonFieldCount))):
+            fieldSequence = info.getControlFieldSpeech(
+                newControlFieldStack[count],
+                newControlFieldStack[0:count],
+                "end_inControlFieldStack",
+                formatConfig,
+                extraDetail,
+                reason=reason,
+            )
+            if fieldSequence:
+                speechSequence.extend(fieldSequence)
+                shouldConsiderTextInfoBlank = False
+
+    # If there is nothing that should cause the TextInfo to be considered
+    # non-blank, blank should be reported, unless we are doing a say all.
+    if not suppressBlanks and reason != OutputReason.SAYALL and shouldConsiderTextInfoBlank:
+        # Translators: This is spoken when the line is considered blank.
+        speechSequence.append("blank")
+
+    # Cache a copy of the new controlFieldStack for future use
+    if useCache:
+        _getTextInfoSpeech_updateCache(
+            useCache,
+            speakTextInfoState,
+            newControlFieldStack,
+            formatFieldAttributesCache,
+        )
+
+    if reason == OutputReason.ONLYCACHE or not speechSequence:
+        return False
+
+    yield speechSequence
+    return True
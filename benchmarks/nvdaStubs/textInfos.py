@@ -0,0 +1,113 @@
+"""Stand-in for NVDA's ``textInfos`` package."""
+
+from controlTypes import Role, State
+
+UNIT_CHARACTER = "character"
+UNIT_WORD = "word"
+UNIT_LINE = "line"
+UNIT_SENTENCE = "sentence"
+UNIT_PARAGRAPH = "paragraph"
+UNIT_CELL = "cell"
+UNIT_READINGCHUNK = "readingChunk"
+
+POSITION_FIRST = "first"
+POSITION_LAST = "last"
+POSITION_CARET = "caret"
+
+
+class Field(dict):
+    pass
+
+
+class FormatField(Field):
+    pass
+
+
+class ControlField(Field):
+    PRESCAT_SINGLELINE = "singleLine"
+    PRESCAT_MARKER = "marker"
+    PRESCAT_CONTAINER = "container"
+    PRESCAT_CELL = "cell"
+    PRESCAT_LAYOUT = None
+
+    def getPresentationCategory(self, ancestors, formatConfig, reason=None, extraDetail=False):
+        role = self.get("role", Role.UNKNOWN)
+        states = self.get("states", set())
+        if role in (Role.LINK, Role.HEADING, Role.BUTTON, Role.RADIOBUTTON, Role.CHECKBOX, Role.GRAPHIC, Role.MATH):
+            return self.PRESCAT_SINGLELINE
+        if role in (Role.EDITABLETEXT, Role.COMBOBOX):
+            if State.MULTILINE in states:
+                return self.PRESCAT_CONTAINER
+            return self.PRESCAT_SINGLELINE
+        if role in (Role.TABLECELL, Role.TABLECOLUMNHEADER, Role.TABLEROWHEADER):
+            return self.PRESCAT_CELL
+        if role == Role.TABLE:
+            if self.get("table-layout") and not formatConfig["includeLayoutTables"]:
+                return self.PRESCAT_LAYOUT
+            return self.PRESCAT_CONTAINER
+        if role in (Role.LIST, Role.FORM, Role.BLOCKQUOTE, Role.LANDMARK, Role.ARTICLE, Role.REGION, Role.FIGURE):
+            return self.PRESCAT_CONTAINER
+        if role == Role.GROUPING and (self.get("name") or self.get("description")):
+            return self.PRESCAT_CONTAINER
+        return self.PRESCAT_LAYOUT
+
+
+class FieldCommand:
+    def __init__(self, command, field):
+        if command not in ("controlStart", "controlEnd", "formatChange"):
+            raise ValueError("Unknown command: %s" % command)
+        elif command == "controlStart" and not isinstance(field, ControlField):
+            raise ValueError("command: %s needs a controlField" % command)
+        elif command == "formatChange" and not isinstance(field, FormatField):
+            raise ValueError("command: %s needs a formatField" % command)
+        self.command = command
+        self.field = field
+
+    def __repr__(self):
+        return "FieldCommand %s with %s" % (self.command, self.field)
+
+
+class TextInfo:
+    def __init__(self, obj, position):
+        self.obj = obj
+        self.basePosition = position
+
+    def getTextWithFields(self, formatConfig=None):
+        raise NotImplementedError
+
+    def getControlFieldSpeech(self, attrs, ancestorAttrs, fieldType, formatConfig=None, extraDetail=False, reason=None):
+        import speech.speech
+
+        return speech.speech.getControlFieldSpeech(
+            attrs,
+            ancestorAttrs,
+            fieldType,
+            formatConfig,
+            extraDetail,
+            reason,
+        )
+
+    def getFormatFieldSpeech(
+        self,
+        attrs,
+        attrsCache=None,
+        formatConfig=None,
+        reason=None,
+        unit=None,
+        extraDetail=False,
+        initialFormat=False,
+    ):
+        import speech.speech
+
+        return speech.speech.getFormatFieldSpeech(
+            attrs,
+            attrsCache=attrsCache,
+            formatConfig=formatConfig,
+            reason=reason,
+            unit=unit,
+            extraDetail=extraDetail,
+            initialFormat=initialFormat,
+        )
+
+    def getMathMl(self, field):
+        raise LookupError("no MathML for field")
@@ -0,0 +1,7 @@
+"""Stand-in for NVDA's ``ui`` module."""
+
+from logHandler import log
+
+
+def message(text, *args, **kwargs):
+    log.info("ui.message: %s" % text)
@@ -0,0 +1,236 @@
+"""Replay recorded ``getTextWithFields`` streams against stand-in NVDA modules.
+
+A corpus file is JSON lines, optionally gzip compressed. The first line is a
+header object; every following line is one browse mode caret move::
+
+    {"format": "contentFirstBrowse-corpus", "version": 1, "name": "..."}
+    {"doc": "page1", "unit": "line", "formatConfig": {...}, "languageSwitching": true,
+     "cache": [<control field>, ...], "fields": [<command>, ...]}
+
+A command is either a plain string (text), ``["cs", attrs]`` (controlStart),
+``["ce"]`` (controlEnd) or ``["fc", attrs]`` (formatChange). In attrs,
+``role`` is stored as an int and ``states`` as a list of ints. ``cache`` is
+the document's ``controlFieldStackCache`` before the move; the replay seeds
+each document from its first move and lets later moves evolve the cache.
+"""
+
+import gzip
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+
+CORPUS_FORMAT = "contentFirstBrowse-corpus"
+CORPUS_VERSION = 1
+
+
+def installStubs():
+    """Make the stand-in NVDA modules and the plugin importable."""
+    for path in (os.path.join(BENCH_DIR, "nvdaStubs"), os.path.join(REPO_DIR, "globalPlugins")):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+installStubs()
+
+import browseMode  # noqa: E402
+import config  # noqa: E402
+import controlTypes  # noqa: E402
+import languageHandling  # noqa: E402
+import textInfos  # noqa: E402
+
+
+def decodeAttrs(attrs, fieldClass):
+    field = fieldClass(attrs)
+    role = field.get("role")
+    if role is not None:
+        field["role"] = controlTypes.Role(role)
+    states = field.get("states")
+    if states is not None:
+        field["states"] = {controlTypes.State(state) for state in states}
+    return field
+
+
+def decodeCommand(item):
+    if isinstance(item, str):
+        return item
+    code = item[0]
+    if code == "cs":
+        return textInfos.FieldCommand("controlStart", decodeAttrs(item[1], textInfos.ControlField))
+    if code == "ce":
+        return textInfos.FieldCommand("controlEnd", None)
+    if code == "fc":
+        return textInfos.FieldCommand("formatChange", decodeAttrs(item[1], textInfos.FormatField))
+    raise ValueError("unknown corpus command: %r" % (code,))
+
+
+class Move:
+    __slots__ = ("doc", "unit", "formatConfig", "languageSwitching", "cache", "fields")
+
+    def __init__(self, record):
+        self.doc = record["doc"]
+        self.unit = record.get("unit")
+        self.formatConfig = record.get("formatConfig", {})
+        self.languageSwitching = record.get("languageSwitching", True)
+        self.cache = record.get("cache", [])
+        self.fields = record["fields"]
+
+    def decodeFields(self):
+        return [decodeCommand(item) for item in self.fields]
+
+    def decodeCache(self):
+        return [decodeAttrs(attrs, textInfos.ControlField) for attrs in self.cache]
+
+
+class Corpus:
+    def __init__(self, path, header, moves):
+        self.path = path
+        self.header = header
+        self.moves = moves
+
+    @property
+    def name(self):
+        return self.header.get("name") or os.path.basename(self.path).split(".")[0]
+
+
+def loadCorpus(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        lines = (line for line in f if line.strip())
+        header = json.loads(next(lines))
+        if header.get("format") != CORPUS_FORMAT:
+            raise ValueError("%s is not a contentFirstBrowse corpus" % path)
+        if header.get("version", 1) > CORPUS_VERSION:
+            raise ValueError("%s uses unsupported corpus version %s" % (path, header["version"]))
+        moves = [Move(json.loads(line)) for line in lines]
+    return Corpus(path, header, moves)
+
+
+def iterCorpusPaths(paths=None):
+    if not paths:
+        paths = [CORPUS_DIR]
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".jsonl", ".jsonl.gz")):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+class ReplayDocument(browseMode.BrowseModeDocumentTreeInterceptor):
+    """A browse mode document whose caret moves come from a corpus."""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+
+
+class ReplayTextInfo(browseMode.BrowseModeDocumentTextInfo):
+    """Hands out one prepared ``getTextWithFields`` result per call."""
+
+    def __init__(self, obj, textWithFields, offsets=(0, 0)):
+        super().__init__(obj, None)
+        self._textWithFields = textWithFields
+        self._startOffset, self._endOffset = offsets
+
+    def copy(self):
+        return ReplayTextInfo(self.obj, self._textWithFields, (self._startOffset, self._endOffset))
+
+    def collapse(self, end=False):
+        if end:
+            self._startOffset = self._endOffset
+        else:
+            self._endOffset = self._startOffset
+
+    def compareEndPoints(self, other, which):
+        selfEndPoint, otherEndPoint = which.split("To")
+        selfOffset = self._endOffset if selfEndPoint == "end" else self._startOffset
+        otherOffset = other._endOffset if otherEndPoint == "End" else other._startOffset
+        return (selfOffset > otherOffset) - (selfOffset < otherOffset)
+
+    def setEndPoint(self, other, which):
+        selfEndPoint, otherEndPoint = which.split("To")
+        offset = other._endOffset if otherEndPoint == "End" else other._startOffset
+        if selfEndPoint == "end":
+            self._endOffset = offset
+        else:
+            self._startOffset = offset
+
+    # A corpus only holds the moves that were made, so there is nothing to move to.
+    def move(self, unit, direction, endPoint=None):
+        return 0
+
+    def expand(self, unit):
+        pass
+
+    def getTextWithFields(self, formatConfig=None):
+        return self._textWithFields
+
+    def getMathMl(self, field):
+        mathMl = field.get("mathMl")
+        if mathMl is None:
+            raise LookupError("field has no MathML")
+        return mathMl
+
+
+_formatConfigCache = {}
+
+
+def applyMoveConfig(move):
+    """Point ``config.conf`` at the formatting the move was recorded with."""
+    key = tuple(sorted(move.formatConfig.items()))
+    formatConfig = _formatConfigCache.get(key)
+    if formatConfig is None:
+        formatConfig = dict(config._defaults["documentFormatting"])
+        formatConfig.update(move.formatConfig)
+        _formatConfigCache[key] = formatConfig
+    if config.conf["documentFormatting"] is not formatConfig:
+        config.conf["documentFormatting"] = formatConfig
+    languageHandling.autoLanguageSwitching = move.languageSwitching
+
+
+class Replay:
+    """Prepared inputs for replaying a corpus ``repeat`` times.
+
+    Field dicts are decoded ahead of time so that the cost of building them
+    does not show up in the measured calls.
+    """
+
+    def __init__(self, corpus, repeat=1):
+        self.corpus = corpus
+        self.repeat = repeat
+        self._prepared = [
+            [(move, move.decodeFields()) for move in corpus.moves] for _i in range(repeat)
+        ]
+
+    def iterCalls(self):
+        """Yield ``(move, info)`` pairs, seeding each document once per pass."""
+        for passMoves in self._prepared:
+            docs = {}
+            for move, textWithFields in passMoves:
+                doc = docs.get(move.doc)
+                if doc is None:
+                    doc = docs[move.doc] = ReplayDocument(move.doc)
+                    cache = move.decodeCache()
+                    if cache:
+                        state = _speakTextInfoStateFor(doc)
+                        state.controlFieldStackCache = cache
+                        state.updateObj()
+                applyMoveConfig(move)
+                yield move, ReplayTextInfo(doc, textWithFields)
+
+
+def _speakTextInfoStateFor(doc):
+    import speech.speech
+
+    return speech.speech.SpeakTextInfoState(doc)
+
+
+def resetSpeechState():
+    import speech.speech
+
+    speech.speech._speechState.__init__()
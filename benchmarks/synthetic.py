@@ -0,0 +1,249 @@
+"""Build synthetic corpora whose structure is set by a few size parameters.
+
+Usage::
+
+    python benchmarks/synthetic.py out.jsonl [--lines N] [--depth N] [--siblings N] [--clickables N]
+        [--languages N] [--math N] [--indentation N] [--table-width N] [--empty-controls N] [--seed N]
+
+Every move is one line of a document read with the down arrow. A line sits
+inside a main landmark and ``depth`` nested groupings and sections, and is a
+paragraph, or a table row when ``table-width`` is set. Its body holds
+``siblings`` links, ``clickables`` clickable spans and ``math`` equations,
+each followed by a word of text, with ``languages`` language switches spread
+over it. With ``indentation`` set the line starts with that many spaces and
+line indentation is reported. A table row spreads the body over
+``table-width`` cells. ``empty-controls`` buttons without text, such as icon
+buttons, end the body, so that the line closes fields no text was read in.
+
+The corpus uses the format described in ``replay.py``, so the written file
+can be passed to ``benchTextInfoSpeech.py``; ``benchScaling.py`` builds the
+corpora in memory.
+"""
+
+import argparse
+import json
+import random
+import sys
+
+import replay
+
+Role = replay.controlTypes.Role
+State = replay.controlTypes.State
+
+# The parameters of makeCorpus that describe the structure of a line, with the
+# value each has when it is not the one being varied.
+PARAMETERS = {
+    "depth": 2,
+    "siblings": 4,
+    "clickables": 0,
+    "languages": 0,
+    "math": 0,
+    "indentation": 0,
+    "tableWidth": 0,
+    "emptyControls": 0,
+}
+
+_WORDS = (
+    "quick",
+    "brown",
+    "fox",
+    "jumps",
+    "over",
+    "lazy",
+    "dog",
+    "speech",
+    "content",
+    "table",
+    "report",
+    "browse",
+)
+_LANGUAGES = ("de", "fr", "en")
+_MATH_ML = "<math><mfrac><mi>a</mi><mi>b</mi></mfrac></math>"
+
+
+class _LineBuilder:
+    """Encodes the commands of one line as corpus items."""
+
+    def __init__(self, rng, uniqueIDs):
+        self.rng = rng
+        self.uniqueIDs = uniqueIDs
+        self.items = []
+
+    def start(self, role, uniqueID=None, states=(), **attrs):
+        attrs["role"] = int(role)
+        attrs["states"] = [int(state) for state in states]
+        attrs["uniqueID"] = next(self.uniqueIDs) if uniqueID is None else uniqueID
+        attrs["_startOfNode"] = True
+        attrs["_endOfNode"] = True
+        self.items.append(["cs", attrs])
+
+    def end(self):
+        self.items.append(["ce"])
+
+    def text(self, words=1):
+        self.items.append(" ".join(self.rng.choice(_WORDS) for _i in range(words)) + " ")
+
+    def format(self, language=None):
+        attrs = {"font-family": "Segoe UI", "font-size": "12pt"}
+        if language is not None:
+            attrs["language"] = language
+        self.items.append(["fc", attrs])
+
+
+def _bodyItems(rng, siblings, clickables, math):
+    """Return the kinds of the body controls of a line in a stable shuffled order."""
+    kinds = ["link"] * siblings + ["clickable"] * clickables + ["math"] * math
+    rng.shuffle(kinds)
+    return kinds
+
+
+def _addControl(line, kind):
+    if kind == "link":
+        line.start(Role.LINK, states=(State.LINKED, State.FOCUSABLE))
+        line.text(2)
+    elif kind == "clickable":
+        line.start(Role.GROUPING, states=(State.CLICKABLE,))
+        line.text(2)
+    else:
+        line.start(Role.MATH, mathMl=_MATH_ML)
+        line.text()
+    line.end()
+    line.text()
+
+
+def _addEmptyControls(line, count):
+    for _i in range(count):
+        line.start(Role.BUTTON, states=(State.FOCUSABLE,))
+        line.end()
+
+
+def _addBody(line, kinds, languages):
+    # Language switches go before evenly spaced controls, the last one back to
+    # the document language.
+    switchAt = {}
+    if languages:
+        step = max(1, len(kinds) // languages)
+        for switch in range(languages):
+            switchAt.setdefault(min(len(kinds), switch * step), []).append(
+                None if switch == languages - 1 else _LANGUAGES[switch % len(_LANGUAGES)],
+            )
+    for index, kind in enumerate(kinds):
+        for language in switchAt.get(index, ()):
+            line.format(language)
+        _addControl(line, kind)
+    for language in switchAt.get(len(kinds), ()):
+        line.format(language)
+        line.text()
+
+
+def makeCorpus(
+    lines=8,
+    depth=2,
+    siblings=4,
+    clickables=0,
+    languages=0,
+    math=0,
+    indentation=0,
+    tableWidth=0,
+    emptyControls=0,
+    seed=0,
+    name=None,
+):
+    """Return a ``replay.Corpus`` of ``lines`` caret moves with the given structure."""
+    rng = random.Random(seed)
+    uniqueIDs = iter(range(1000, 1 << 30))
+    if name is None:
+        name = "synthetic"
+    formatConfig = {"reportLineIndentation": 1} if indentation else {}
+    # The landmark, groupings, sections and table enclose every line.
+    outerIDs = [next(uniqueIDs) for _i in range(depth + 2)]
+    moves = []
+    for lineIndex in range(lines):
+        line = _LineBuilder(rng, uniqueIDs)
+        line.start(Role.LANDMARK, outerIDs[0], landmark="main")
+        for level in range(depth):
+            line.start(Role.GROUPING if level % 2 else Role.SECTION, outerIDs[level + 1])
+        kinds = _bodyItems(rng, siblings, clickables, math)
+        if tableWidth:
+            line.start(
+                Role.TABLE,
+                outerIDs[-1],
+                **{"table-id": 1, "table-rowcount": lines, "table-columncount": tableWidth},
+            )
+            line.start(Role.TABLEROW, **{"table-id": 1, "table-rownumber": lineIndex + 1})
+            line.format()
+            if indentation:
+                line.items.append(" " * indentation)
+            perCell = -(-len(kinds) // tableWidth) if kinds else 0
+            for column in range(tableWidth):
+                line.start(
+                    Role.TABLECELL,
+                    **{"table-id": 1, "table-rownumber": lineIndex + 1, "table-columnnumber": column + 1},
+                )
+                line.text()
+                _addBody(line, kinds[column * perCell : (column + 1) * perCell], languages if not column else 0)
+                if column == tableWidth - 1:
+                    _addEmptyControls(line, emptyControls)
+                line.end()
+            line.end()
+        else:
+            line.start(Role.PARAGRAPH)
+            line.format()
+            if indentation:
+                line.items.append(" " * indentation)
+            line.text(3)
+            _addBody(line, kinds, languages)
+            _addEmptyControls(line, emptyControls)
+            line.end()
+        moves.append(
+            replay.Move(
+                {
+                    "doc": name,
+                    "unit": "line",
+                    "formatConfig": formatConfig,
+                    "languageSwitching": True,
+                    "cache": [],
+                    "fields": line.items,
+                },
+            ),
+        )
+    header = {"format": replay.CORPUS_FORMAT, "version": replay.CORPUS_VERSION, "name": name}
+    return replay.Corpus(name, header, moves)
+
+
+def writeCorpus(corpus, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(corpus.header) + "\n")
+        for move in corpus.moves:
+            record = {
+                "doc": move.doc,
+                "unit": move.unit,
+                "formatConfig": move.formatConfig,
+                "languageSwitching": move.languageSwitching,
+                "cache": move.cache,
+                "fields": move.fields,
+            }
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="corpus file to write")
+    parser.add_argument("--lines", type=int, default=8, help="caret moves (default 8)")
+    for name, default in PARAMETERS.items():
+        parser.add_argument(
+            "--" + "".join("-" + c.lower() if c.isupper() else c for c in name),
+            dest=name,
+            type=int,
+            default=default,
+            help="default %d" % default,
+        )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    parameters = {name: getattr(args, name) for name in PARAMETERS}
+    writeCorpus(makeCorpus(args.lines, seed=args.seed, **parameters), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,39 @@
 # NVDA 插件：contentFirstBrowse
-# 在浏览模式的光标移动中强制“内容优先”的朗读顺序（适用于所有角色）。
+# 在浏览模式的光标移动中强制“内容优先”的朗读顺序（默认适用于所有角色，可按角色配置）。
 
 import builtins
+import collections
+import functools
+import gzip
 import itertools
+import json
+import operator
+import os
+import queue
+import threading
+import time
+import weakref
+import config
+import core
 import globalPluginHandler
+import globalVars
 import browseMode
+import inputCore
 import speech
 import speech.speech as speechMod
+import textInfos
+import ui
 from controlTypes import OutputReason
 from logHandler import log
+from scriptHandler import script
 
 _original_getTextInfoSpeech = speechMod.getTextInfoSpeech
+_original_quickNavScript = browseMode.BrowseModeTreeInterceptor._quickNavScript
+# 派发检查用到的对象，绑定为模块全局以省去每次调用的属性查找。
+_CARET = OutputReason.CARET
+_QUICKNAV = OutputReason.QUICKNAV
+_SAYALL = OutputReason.SAYALL
+_BrowseModeDocumentTextInfo = browseMode.BrowseModeDocumentTextInfo
 _isPatched = False
 
 
@@ -19,8 +42,1793 @@ def _t(text):
     return translate(text) if callable(translate) else text
 
 
-def _isBrowseModeTextInfo(info):
-    return isinstance(info, browseMode.BrowseModeDocumentTextInfo)
+# 插件配置，保存在 NVDA 配置的 [contentFirstBrowse] 段。
+_CONFIG_SECTION = "contentFirstBrowse"
+_CONFIG_SPEC = {
+    # 开头的内容一确定就先交给语音合成器，其后的字段朗读作为第二段送出。
+    "streamLeadingContent": "boolean(default=False)",
+    # 空闲时预先计算下一行/上一行（或单元格）的朗读。
+    "prefetchNeighbours": "boolean(default=False)",
+    # 朗读全部时也先读内容，再读角色和状态。
+    "contentFirstSayAll": "boolean(default=False)",
+    # 某个文档的内容优先朗读耗时超过 NVDA 原有朗读的这个倍数时，该文档改用原有朗读；0 表示不限制。
+    "latencyBudget": "float(default=3.0, min=0.0)",
+    # 按角色（及状态）指定顺序，例如 "editableText=rolesFirst, table+layout=suppressed"；未列出的角色内容优先。
+    "rolePolicies": 'string(default="")',
+}
+
+# 回放语料格式，与 benchmarks/replay.py 保持一致。
+_CORPUS_FORMAT = "contentFirstBrowse-corpus"
+_CORPUS_VERSION = 1
+# 录制时保存的 documentFormatting 选项，即朗读路径实际读取的那些。
+_CORPUS_FORMAT_CONFIG_KEYS = (
+    "reportLineIndentation",
+    "ignoreBlankLinesForRLI",
+    "reportClickable",
+    "reportSpellingErrors",
+    "reportFontName",
+    "reportFontSize",
+    "reportFontAttributes",
+    "reportHighlight",
+    "reportComments",
+    "reportPage",
+    "reportLinks",
+    "reportGraphics",
+    "reportHeadings",
+    "reportLists",
+    "reportBlockQuotes",
+    "reportGroupings",
+    "reportLandmarks",
+    "reportArticles",
+    "reportFigures",
+    "reportTables",
+    "includeLayoutTables",
+    "reportTableHeaders",
+    "reportTableCellCoords",
+)
+_CORPUS_QUEUE_SIZE = 256
+
+
+def _encodeCorpusValue(value):
+    if isinstance(value, (str, bool, float)) or value is None:
+        return value
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, (set, frozenset, list, tuple)):
+        values = [_encodeCorpusValue(v) for v in value]
+        try:
+            return sorted(values)
+        except TypeError:
+            return values
+    return str(value)
+
+
+def _encodeCorpusAttrs(attrs):
+    return {key: _encodeCorpusValue(value) for key, value in attrs.items()}
+
+
+def _encodeCorpusCommand(item):
+    if isinstance(item, str):
+        return item
+    code, attrs = item
+    if attrs is None:
+        return [code]
+    return [code, _encodeCorpusAttrs(attrs)]
+
+
+class _CorpusRecorder:
+    """把浏览模式光标移动看到的 textWithFields 写入压缩的回放语料。
+
+    主线程只做浅拷贝并放入有界队列，编码、压缩和写盘都在后台线程完成；
+    队列满时丢弃该次移动，不阻塞朗读。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+        self.dropped = 0
+        self._docNames = weakref.WeakKeyDictionary()
+        self._queue = queue.Queue(maxsize=_CORPUS_QUEUE_SIZE)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="contentFirstBrowse corpus writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _docName(self, doc):
+        try:
+            name = self._docNames.get(doc)
+            if name is None:
+                name = self._docNames[doc] = "%s#%d" % (type(doc).__name__, len(self._docNames) + 1)
+            return name
+        except TypeError:
+            return type(doc).__name__
+
+    def record(self, info, unit, formatConfig, controlFieldStackCache, textWithFields):
+        textInfos = speechMod.textInfos
+        fields = []
+        for item in textWithFields:
+            if isinstance(item, str):
+                fields.append(item)
+            elif isinstance(item, textInfos.FieldCommand):
+                code = {"controlStart": "cs", "controlEnd": "ce", "formatChange": "fc"}.get(item.command)
+                if code:
+                    fields.append((code, dict(item.field) if item.field is not None else None))
+        move = {
+            "doc": self._docName(info.obj),
+            "unit": unit,
+            "formatConfig": {key: formatConfig[key] for key in _CORPUS_FORMAT_CONFIG_KEYS if key in formatConfig},
+            "languageSwitching": bool(speechMod.languageHandling.shouldMakeLangChangeCommand()),
+            "cache": [dict(field) for field in controlFieldStackCache],
+            "fields": fields,
+        }
+        try:
+            self._queue.put_nowait(move)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+        log.info(
+            "contentFirstBrowse: recorded %d caret moves to %s (%d dropped)"
+            % (self.recorded, self.path, self.dropped)
+        )
+
+    def _run(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with gzip.open(self.path, "wt", encoding="utf-8") as f:
+                header = {
+                    "format": _CORPUS_FORMAT,
+                    "version": _CORPUS_VERSION,
+                    "name": os.path.basename(self.path).split(".")[0],
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                f.write(json.dumps(header) + "\n")
+                while True:
+                    move = self._queue.get()
+                    if move is None:
+                        break
+                    move["formatConfig"] = _encodeCorpusAttrs(move["formatConfig"])
+                    move["cache"] = [_encodeCorpusAttrs(field) for field in move["cache"]]
+                    move["fields"] = [_encodeCorpusCommand(item) for item in move["fields"]]
+                    f.write(json.dumps(move, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    self.recorded += 1
+        except Exception:
+            log.error("contentFirstBrowse: failed writing corpus %s" % self.path, exc_info=True)
+            # 写入失败后继续清空队列，避免 stop() 阻塞。
+            while self._queue.get() is not None:
+                pass
+
+
+_corpusRecorder = None
+
+# 耗时采样的环形缓冲区大小，以及报告中各阶段的顺序。
+_LATENCY_SAMPLE_COUNT = 2048
+_LATENCY_PHASES = (
+    "getTextWithFields",
+    "stackDiff",
+    "controlFieldSpeech",
+    "formatFieldSpeech",
+    "reorder",
+    "assembly",
+)
+_LATENCY_COUNTERS = ("fields", "textChunks", "pendingFlushes")
+# 报告中按这些结果路径分别计数；只有 computed 的样本才参与各阶段统计。
+_LATENCY_PATHS = ("computed", "prefetched", "indexed", "superseded", "spelling")
+
+
+class _LatencySample:
+    """一次内容优先朗读的各阶段耗时（秒）与计数。
+
+    lap() 记录自上次 mark() 或 lap() 以来的时间；timed() 包装的调用单独计时，
+    并从所在阶段中扣除；skip() 扣除生成器让出期间调用方所用的时间。
+    """
+
+    __slots__ = (
+        "docType",
+        "path",
+        "phases",
+        "fields",
+        "textChunks",
+        "pendingFlushes",
+        "start",
+        "total",
+        "_mark",
+    )
+
+    def __init__(self, docType):
+        self.docType = docType
+        self.path = "computed"
+        self.phases = dict.fromkeys(_LATENCY_PHASES, 0.0)
+        self.fields = 0
+        self.textChunks = 0
+        self.pendingFlushes = 0
+        self.total = 0.0
+        self.start = self._mark = time.perf_counter()
+
+    def mark(self):
+        self._mark = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self._mark
+        self._mark = now
+
+    def timed(self, phase, func):
+        phases = self.phases
+        perfCounter = time.perf_counter
+
+        def timedCall(*args, **kwargs):
+            start = perfCounter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perfCounter() - start
+                phases[phase] += elapsed
+                self._mark += elapsed
+
+        return timedCall
+
+    def skip(self, elapsed):
+        self.start += elapsed
+        self._mark += elapsed
+
+    def countFields(self, stream):
+        textChunks = 0
+        for op in itertools.islice(stream.ops, stream.bodyEnd):
+            if op == _OP_TEXT:
+                textChunks += 1
+        self.textChunks = textChunks
+        self.fields = len(stream.controlStack) + stream.bodyEnd - textChunks
+
+
+def _documentType(doc):
+    """报告和日志中区分文档的名称：应用名加文档类名。"""
+    appName = getattr(getattr(getattr(doc, "rootNVDAObject", None), "appModule", None), "appName", None)
+    docType = type(doc).__name__
+    if appName:
+        docType = "%s (%s)" % (appName, docType)
+    return docType
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))]
+
+
+class _LatencySampler:
+    """保存最近若干次内容优先朗读的耗时样本，并生成分阶段的延迟报告。"""
+
+    def __init__(self, size):
+        self.samples = collections.deque(maxlen=size)
+
+    def newSample(self, info):
+        return _LatencySample(_documentType(info.obj))
+
+    def add(self, sample):
+        sample.total = time.perf_counter() - sample.start
+        self.samples.append(sample)
+
+    def report(self):
+        samples = list(self.samples)
+        lines = ["contentFirstBrowse latency report: %d samples, times in microseconds" % len(samples)]
+        byDocType = collections.defaultdict(list)
+        for sample in samples:
+            byDocType[sample.docType].append(sample)
+        for docType, docSamples in sorted(byDocType.items()):
+            pathCounts = collections.Counter(sample.path for sample in docSamples)
+            lines.append("")
+            lines.append(
+                "%s: %s"
+                % (docType, ", ".join("%d %s" % (pathCounts[path], path) for path in _LATENCY_PATHS)),
+            )
+            computed = [sample for sample in docSamples if sample.path == "computed"]
+            if not computed:
+                continue
+            lines.append("  %-20s %9s %9s %9s" % ("phase", "p50", "p95", "p99"))
+            columns = [("total", [sample.total for sample in computed])]
+            columns.extend((phase, [sample.phases[phase] for sample in computed]) for phase in _LATENCY_PHASES)
+            for name, values in columns:
+                values.sort()
+                lines.append(
+                    "  %-20s %9.1f %9.1f %9.1f"
+                    % (
+                        name,
+                        _percentile(values, 0.50) * 1e6,
+                        _percentile(values, 0.95) * 1e6,
+                        _percentile(values, 0.99) * 1e6,
+                    ),
+                )
+            lines.append(
+                "  mean counts: "
+                + ", ".join(
+                    "%s %.1f" % (name, sum(getattr(sample, name) for sample in computed) / len(computed))
+                    for name in _LATENCY_COUNTERS
+                ),
+            )
+        return "\n".join(lines)
+
+
+_latencySampler = None
+
+# 每个文档缓存的栈内控件字段朗读条数。
+_FIELD_SPEECH_CACHE_SIZE = 256
+# 光标停下多久后开始预取相邻位置的朗读（毫秒），以及每个文档保留的预取条数。
+_PREFETCH_DELAY_MS = 100
+_PREFETCH_CACHE_SIZE = 4
+# 每个表格缓存的单元格开始序列条数，以及每个文档保留缓存的表格数。
+_CELL_SPEECH_CACHE_SIZE = 512
+_CELL_SPEECH_TABLES = 8
+# 每个文档缓存的数学内容朗读条数。
+_MATH_SPEECH_CACHE_SIZE = 32
+# 每个文档共用的控件字段快照数上限，超过后清空重建。
+_FIELD_SNAPSHOT_CACHE_SIZE = 1024
+# 控件字段快照保留的键：下一次移动比较字段栈、朗读离开控件（含呈现类别和按角色的策略）以及朗读全部判断块级元素时读取的属性。
+_FIELD_SNAPSHOT_KEYS = (
+    "role",
+    "roleText",
+    "states",
+    "landmark",
+    "alwaysReportName",
+    "isHidden",
+    "isBlock",
+    "uniqueID",
+    "table-id",
+    "table-layout",
+)
+# 只有 namedContainerRoles 中角色的呈现类别取决于名称和描述，其他字段的快照不保留这两个键。
+_FIELD_SNAPSHOT_NAME_KEYS = ("name", "description")
+# 延迟保护：指数加权平均的权重；作出判断前至少需要的内容优先样本数；
+# 每隔多少次内容优先朗读取样一次、稍后重算测原有朗读；测原有朗读花的时间最多为内容优先朗读总耗时的几分之一；
+# 改用原有朗读后每隔多少次调用试一次内容优先；
+# 内容优先平均耗时低于这个值（秒）时不切换，听不出差别；恢复时要回到上限的这个比例以内，避免来回切换。
+_LATENCY_GUARD_ALPHA = 0.25
+_LATENCY_GUARD_MIN_SAMPLES = 8
+_LATENCY_GUARD_PROBE_INTERVAL = 32
+_LATENCY_GUARD_PROBE_SHARE = 16
+_LATENCY_GUARD_RETRY_CALLS = 32
+_LATENCY_GUARD_FLOOR = 0.005
+_LATENCY_GUARD_RESTORE = 0.75
+# 快速导航索引：每种元素最多收录的个数，以及每次空闲时处理的元素个数。
+_QUICKNAV_INDEX_MAX_ITEMS = 500
+_QUICKNAV_INDEX_SLICE = 8
+# NVDA 为表格单元格朗读保存的模块级状态，会影响并被 getControlFieldSpeech 修改。
+_TABLE_SPEECH_STATE_ATTRS = ("oldTableID", "oldRowNumber", "oldRowSpan", "oldColumnNumber", "oldColumnSpan")
+
+# 配置修订号：配置方案切换、重置，或 _getSpeechContext 发现读取的配置值变化时递增，用作缓存键的一部分。
+_configRevision = 0
+
+
+def _bumpConfigRevision(**kwargs):
+    global _configRevision
+    _configRevision += 1
+
+
+# 角色朗读策略：内容优先（默认）、先读角色和状态（NVDA 原有顺序）、不读角色和状态。
+_POLICY_CONTENT_FIRST = 0
+_POLICY_ROLES_FIRST = 1
+_POLICY_SUPPRESSED = 2
+_POLICY_NAMES = {
+    "contentfirst": _POLICY_CONTENT_FIRST,
+    "rolesfirst": _POLICY_ROLES_FIRST,
+    "suppressed": _POLICY_SUPPRESSED,
+}
+# 除状态名外，规则中可以使用的字段标志：layout 表示排版用表格。
+_LAYOUT_FLAG = "layout"
+
+
+def _compileRolePolicies(text, controlTypes):
+    """把 rolePolicies 配置编译为平坦的查找表 {角色: 策略}。
+
+    带状态或排版条件的角色，值为按条件多少排序（多的在前）的 ((所需状态, 是否要求排版表格, 策略), ...)。
+    无法识别的条目写入日志后忽略。
+    """
+    rules = collections.defaultdict(list)
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            selector, policyName = entry.split("=")
+            policy = _POLICY_NAMES[policyName.strip().lower()]
+            roleName, *flags = (part.strip() for part in selector.split("+"))
+            role = controlTypes.Role[roleName.upper()]
+            states = frozenset(controlTypes.State[flag.upper()] for flag in flags if flag.lower() != _LAYOUT_FLAG)
+            layout = any(flag.lower() == _LAYOUT_FLAG for flag in flags)
+        except (ValueError, KeyError):
+            log.warning("contentFirstBrowse: ignoring invalid role policy %r" % entry)
+            continue
+        rules[role].append((states, layout, policy))
+    table = {}
+    for role, roleRules in rules.items():
+        if len(roleRules) == 1 and not roleRules[0][0] and not roleRules[0][1]:
+            table[role] = roleRules[0][2]
+        else:
+            table[role] = tuple(sorted(roleRules, key=lambda rule: len(rule[0]) + rule[1], reverse=True))
+    return table
+
+
+def _fieldPolicy(rolePolicies, field):
+    """按编译好的策略表返回字段的朗读策略。"""
+    rules = rolePolicies.get(field.get("role"), _POLICY_CONTENT_FIRST)
+    if rules.__class__ is not tuple:
+        return rules
+    for states, layout, policy in rules:
+        if states and not states <= (field.get("states") or frozenset()):
+            continue
+        if layout and not field.get("table-layout"):
+            continue
+        return policy
+    return _POLICY_CONTENT_FIRST
+
+
+class _SpeechContext:
+    """朗读路径用到的 speech 模块绑定，以及按单位缓存的派生 formatConfig。
+
+    绑定在创建时解析一次；配置修订号变化或 isCurrent() 发现配置值变化后，
+    由 _getSpeechContext 换成新对象。缓存的 formatConfig 由多次光标移动共享，不得修改。
+    """
+
+    # 从 speech.speech 解析的名称。
+    _BINDINGS = (
+        "textInfos",
+        "controlTypes",
+        "config",
+        "languageHandling",
+        "ReportLineIndentation",
+        "unicodeNormalize",
+        "LangChangeCommand",
+        "EndUtteranceCommand",
+        "SpeechCommand",
+        "isBlank",
+        "splitTextIndentation",
+        "getIndentationSpeech",
+        "LINE_END_CHARS",
+        "_extendSpeechSequence_addMathForTextInfo",
+        "_getTextInfoSpeech_considerSpelling",
+        "_getTextInfoSpeech_updateCache",
+        "SpeakTextInfoState",
+    )
+    __slots__ = (
+        "revision",
+        "extraDetailUnits",
+        "noSpellingErrorUnits",
+        "streamLeadingContent",
+        "prefetchNeighbours",
+        "prefetchUnits",
+        "contentFirstSayAll",
+        "latencyBudget",
+        "rolePolicies",
+        "suppressedRoles",
+        "cellRoles",
+        "namedContainerRoles",
+        "_unitSettings",
+        "_readFormatConfig",
+        "_readPluginConfig",
+        "_configValues",
+    ) + _BINDINGS
+
+    def __init__(self, revision):
+        self.revision = revision
+        for name in self._BINDINGS:
+            setattr(self, name, getattr(speechMod, name))
+        textInfos = self.textInfos
+        self.extraDetailUnits = frozenset((textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD))
+        self.noSpellingErrorUnits = frozenset((textInfos.UNIT_PARAGRAPH, textInfos.UNIT_CELL))
+        pluginConfig = self.config.conf[_CONFIG_SECTION]
+        self.streamLeadingContent = pluginConfig["streamLeadingContent"]
+        self.prefetchNeighbours = pluginConfig["prefetchNeighbours"]
+        self.prefetchUnits = frozenset((textInfos.UNIT_LINE, textInfos.UNIT_CELL))
+        self.contentFirstSayAll = pluginConfig["contentFirstSayAll"]
+        self.latencyBudget = pluginConfig["latencyBudget"]
+        # 配置修订号变化时才重新编译，每个字段只查一次字典。
+        self.rolePolicies = _compileRolePolicies(pluginConfig["rolePolicies"], self.controlTypes)
+        self.suppressedRoles = frozenset(
+            role
+            for role, rules in self.rolePolicies.items()
+            if rules == _POLICY_SUPPRESSED
+            or (rules.__class__ is tuple and any(policy == _POLICY_SUPPRESSED for _states, _layout, policy in rules))
+        )
+        Role = self.controlTypes.Role
+        self.cellRoles = frozenset((Role.TABLECELL, Role.TABLECOLUMNHEADER, Role.TABLEROWHEADER))
+        self.namedContainerRoles = frozenset((Role.GROUPING, Role.REGION, Role.PROPERTYPAGE))
+        self._unitSettings = {}
+        # 配置写入没有通知，所以记下创建时读到的全部 documentFormatting 和插件配置值，
+        # 每次移动用 itemgetter 取一遍比较。
+        formatConfig = self.config.conf["documentFormatting"]
+        self._readFormatConfig = operator.itemgetter(*formatConfig.copy())
+        self._readPluginConfig = operator.itemgetter(*_CONFIG_SPEC)
+        self._configValues = (self._readFormatConfig(formatConfig), self._readPluginConfig(pluginConfig))
+
+    def isCurrent(self):
+        """创建后读取的配置值都没有变化时返回 True。"""
+        conf = self.config.conf
+        try:
+            values = (self._readFormatConfig(conf["documentFormatting"]), self._readPluginConfig(conf[_CONFIG_SECTION]))
+        except KeyError:
+            return False
+        return values == self._configValues
+
+    def deriveUnitSettings(self, formatConfig, unit):
+        """返回 (formatConfig 副本, extraDetail, reportIndentation)，规则与 NVDA 的光标朗读一致。"""
+        extraDetail = unit in self.extraDetailUnits
+        formatConfig = formatConfig.copy()
+        if extraDetail:
+            formatConfig["extraDetail"] = True
+        reportIndentation = (
+            unit == self.textInfos.UNIT_LINE
+            and formatConfig["reportLineIndentation"] != self.ReportLineIndentation.OFF
+        )
+        # For performance reasons, when navigating by paragraph or table cell, spelling errors will not be announced.
+        if unit in self.noSpellingErrorUnits:
+            formatConfig["reportSpellingErrors"] = False
+        return formatConfig, extraDetail, reportIndentation
+
+    def unitSettings(self, unit):
+        """按单位缓存的 deriveUnitSettings(config.conf["documentFormatting"], unit)。"""
+        settings = self._unitSettings.get(unit)
+        if settings is None:
+            settings = self._unitSettings[unit] = self.deriveUnitSettings(
+                self.config.conf["documentFormatting"],
+                unit,
+            )
+        return settings
+
+
+_speechContext = None
+
+
+def _getSpeechContext(checkConfig=False):
+    """返回当前的 _SpeechContext；checkConfig 为 True 时先核对配置值，每次移动核对一次即可。"""
+    global _speechContext
+    context = _speechContext
+    if context is None or context.revision != _configRevision:
+        context = _speechContext = _SpeechContext(_configRevision)
+    elif checkConfig and not context.isCurrent():
+        _bumpConfigRevision()
+        context = _speechContext = _SpeechContext(_configRevision)
+    return context
+
+
+class _LRUCache:
+    __slots__ = ("maxSize", "_items")
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxSize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class _LatencyGuard:
+    """单个文档内容优先朗读与 NVDA 原有朗读耗时（秒）的指数加权平均。
+
+    内容优先的耗时取自实际朗读；原有朗读的耗时取样几次移动，稍后用同一次移动重算测得，
+    重算花的时间记在 probeCredit 上，不超过内容优先朗读总耗时的 1/_LATENCY_GUARD_PROBE_SHARE。
+    超出预算时该文档改用原有朗读，之后每隔若干次调用试一次内容优先，回到预算内即恢复。
+    """
+
+    __slots__ = (
+        "contentFirst",
+        "native",
+        "contentFirstCount",
+        "nativeCount",
+        "sinceProbe",
+        "probeCredit",
+        "fallback",
+        "nativeCalls",
+    )
+
+    def __init__(self):
+        self.contentFirst = 0.0
+        self.native = 0.0
+        self.contentFirstCount = 0
+        self.nativeCount = 0
+        # 第一次内容优先朗读就取样。
+        self.sinceProbe = _LATENCY_GUARD_PROBE_INTERVAL
+        self.probeCredit = 0.0
+        self.fallback = False
+        self.nativeCalls = 0
+
+    def routeNative(self):
+        """改用原有朗读期间返回 True，每隔 _LATENCY_GUARD_RETRY_CALLS 次放一次内容优先。"""
+        if not self.fallback:
+            return False
+        self.nativeCalls += 1
+        if self.nativeCalls < _LATENCY_GUARD_RETRY_CALLS:
+            return True
+        self.nativeCalls = 0
+        return False
+
+    def probeDue(self):
+        """这次移动该取样时返回 True：改用原有朗读期间每次，否则每隔 _LATENCY_GUARD_PROBE_INTERVAL 次，且重算没有用超时间。"""
+        return (self.fallback or self.sinceProbe >= _LATENCY_GUARD_PROBE_INTERVAL) and self.probeCredit >= 0.0
+
+    def startProbe(self):
+        self.sinceProbe = 0
+
+    def addContentFirst(self, elapsed, doc, budget):
+        self.contentFirst = elapsed if not self.contentFirstCount else _ewma(self.contentFirst, elapsed)
+        self.contentFirstCount += 1
+        self.sinceProbe += 1
+        self.probeCredit += elapsed / _LATENCY_GUARD_PROBE_SHARE
+        self._decide(doc, budget)
+
+    def addNative(self, elapsed, doc, budget):
+        self.native = elapsed if not self.nativeCount else _ewma(self.native, elapsed)
+        self.nativeCount += 1
+        self.probeCredit -= elapsed
+        self._decide(doc, budget)
+
+    def _decide(self, doc, budget):
+        if self.contentFirstCount < _LATENCY_GUARD_MIN_SAMPLES or not self.nativeCount:
+            return
+        limit = max(self.native * budget, _LATENCY_GUARD_FLOOR)
+        if self.fallback:
+            limit *= _LATENCY_GUARD_RESTORE
+        over = self.contentFirst > limit
+        if over == self.fallback:
+            return
+        self.fallback = over
+        self.nativeCalls = 0
+        log.info(
+            "contentFirstBrowse: %s: content first %.1f ms, NVDA %.1f ms, budget %.1fx: %s"
+            % (
+                _documentType(doc),
+                self.contentFirst * 1e3,
+                self.native * 1e3,
+                budget,
+                "falling back to NVDA's speech order" if over else "content first restored",
+            ),
+        )
+
+
+def _ewma(average, value):
+    return average + _LATENCY_GUARD_ALPHA * (value - average)
+
+
+class _DocumentState:
+    """单个浏览模式文档的插件缓存。
+
+    大多数缓存以字段内容（指纹）为键，或在使用前与读到的字段核对，控件属性变化不会让它们给出过时的朗读；
+    文档重新载入时全部丢弃。
+    """
+
+    __slots__ = (
+        "__weakref__",
+        "processID",
+        "fieldSpeechCache",
+        "prefetched",
+        "cellSpeechCaches",
+        "mathSpeechCache",
+        "quickNavIndexes",
+        "latencyGuard",
+        "fieldSnapshots",
+        "lastStack",
+        "lastFields",
+        "caretGeneration",
+    )
+
+    def __init__(self):
+        # 文档所属进程，控件事件据此快速排除其他程序的对象。
+        self.processID = None
+        self.fieldSpeechCache = _LRUCache(_FIELD_SPEECH_CACHE_SIZE)
+        self.prefetched = _LRUCache(_PREFETCH_CACHE_SIZE)
+        # 表格 ID -> 该表格单元格开始序列的缓存，只保留最近用过的几个表格。
+        self.cellSpeechCaches = _LRUCache(_CELL_SPEECH_TABLES)
+        self.mathSpeechCache = _LRUCache(_MATH_SPEECH_CACHE_SIZE)
+        # 快速导航元素类型 -> _QuickNavIndex。
+        self.quickNavIndexes = {}
+        # 指纹 -> _FieldSnapshot，让各次移动和各缓存条目共用同一个快照。
+        self.fieldSnapshots = {}
+        # 内容变化不影响耗时的比较，invalidate 时保留。
+        self.latencyGuard = _LatencyGuard()
+        # 上一次移动留下的控件字段栈，下一次移动的旧栈通常就是这些字段对象。
+        self.lastStack = ()
+        # 与 lastStack 对应的完整字段，供下一次移动直接比较；栈来自缓存条目的层仍是快照。
+        self.lastFields = ()
+        # 每次光标移动朗读时递增，用来识别已被后续移动取代的预取。
+        self.caretGeneration = 0
+
+    def invalidate(self):
+        """文档重新载入：丢弃全部缓存。"""
+        self.fieldSpeechCache.clear()
+        self.prefetched.clear()
+        self.cellSpeechCaches.clear()
+        self.mathSpeechCache.clear()
+        # 文档变化后索引整体作废，下次使用该类快速导航时重建。
+        self.quickNavIndexes.clear()
+        self.fieldSnapshots.clear()
+
+    def invalidateAttributes(self):
+        """控件的名称、值、状态或描述变化：只丢弃不以字段内容为键的缓存。"""
+        # 数学朗读取自 MathML，而字段中只有节点标识。
+        self.mathSpeechCache.clear()
+
+    def stackKey(self, stack):
+        # 快照自带指纹，只有录制语料时留下的完整字段需要计算。
+        return tuple(map(_stackFieldFingerprint, stack))
+
+    def rememberStack(self, stack, controlFingerprints, snapshot=True):
+        """记下移动后的控件字段栈，返回要存入 SpeakTextInfoState 和缓存的栈。
+
+        snapshot 为真时返回的是字段的精简快照，完整字段只在文档状态中保留最后一个栈；
+        为假时原样保留完整字段，也不计算指纹。
+        """
+        self.lastFields = tuple(stack)
+        if not snapshot:
+            self.lastStack = self.lastFields
+            return self.lastStack
+        snapshots = self.fieldSnapshots
+        newStack = []
+        for field in stack:
+            if field.__class__ is not _FieldSnapshot:
+                fingerprint = controlFingerprints.get(id(field)) if controlFingerprints else None
+                if fingerprint is None:
+                    fingerprint = _fieldFingerprint(field)
+                shared = snapshots.get(fingerprint)
+                if shared is None:
+                    if len(snapshots) >= _FIELD_SNAPSHOT_CACHE_SIZE:
+                        snapshots.clear()
+                    shared = snapshots[fingerprint] = _FieldSnapshot(field, fingerprint)
+                field = shared
+            newStack.append(field)
+        self.lastStack = tuple(newStack)
+        return self.lastStack
+
+
+_documentStates = weakref.WeakKeyDictionary()
+
+
+def _getDocumentState(doc):
+    state = _documentStates.get(doc)
+    if state is None:
+        state = _documentStates[doc] = _DocumentState()
+        state.processID = getattr(getattr(doc, "rootNVDAObject", None), "processID", None)
+    return state
+
+
+def _invalidateDocumentFor(obj, reloaded=False):
+    """obj 所在的文档有缓存时丢弃受影响的部分；reloaded 为真表示文档重新载入，丢弃全部。
+
+    这些事件来自所有程序的所有控件，不属于有缓存的文档所在进程的对象不再查找其文档。
+    """
+    if not _documentStates:
+        return
+    try:
+        processID = obj.processID
+        if not any(state.processID in (processID, None) for state in _documentStates.values()):
+            return
+        doc = obj.treeInterceptor
+    except Exception:
+        return
+    state = _documentStates.get(doc) if doc is not None else None
+    if state is None:
+        return
+    if reloaded:
+        state.invalidate()
+    else:
+        state.invalidateAttributes()
+
+
+def _hashableValue(value):
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashableValue(v) for v in value)
+    if isinstance(value, dict):
+        return frozenset((k, _hashableValue(v)) for k, v in value.items())
+    return value
+
+
+def _fieldFingerprint(field):
+    if field is None:
+        return None
+    # 常见情况下只有 states 不可哈希，单独处理以走 C 实现的快速路径。
+    states = field.get("states")
+    if states is not None and states.__hash__ is None:
+        field = dict(field)
+        field["states"] = frozenset(states)
+    try:
+        return hash(frozenset(field.items()))
+    except TypeError:
+        return hash(frozenset((key, _hashableValue(value)) for key, value in field.items()))
+
+
+class _FieldSnapshot(textInfos.ControlField):
+    """移动后控件字段栈中字段的精简快照，只含 _FIELD_SNAPSHOT_KEYS 中的键，分组、区域和属性页另含名称和描述。
+
+    记有原字段的指纹，与其他字段按指纹比较，结果与比较原字段相同。快照由多次移动共用，不得修改。
+    与普通字典比较时先比较快照保留的键，有不同的就不必计算对方的指纹。
+    """
+
+    __slots__ = ("fingerprint",)
+
+    def __init__(self, field, fingerprint):
+        keys = _FIELD_SNAPSHOT_KEYS
+        if field.get("role") in _getSpeechContext().namedContainerRoles:
+            keys += _FIELD_SNAPSHOT_NAME_KEYS
+        super().__init__((key, field[key]) for key in keys if key in field)
+        self.fingerprint = fingerprint
+
+    def __eq__(self, other):
+        if other.__class__ is _FieldSnapshot:
+            return self.fingerprint == other.fingerprint
+        if isinstance(other, dict):
+            if not self._keysMatch(other):
+                return False
+            return self.fingerprint == _fieldFingerprint(other)
+        return NotImplemented
+
+    def _keysMatch(self, other):
+        get = other.get
+        for key, value in self.items():
+            if get(key) != value:
+                return False
+        return True
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+
+def _sameField(docState, stream, count, oldField, newField):
+    """判断旧栈与新栈第 count 层的字段是否相同，结果与 NVDA 比较整个字典相同。
+
+    旧字段是上次移动留下的快照时，与文档状态保留的完整字段直接比较，相同则新字段沿用它的指纹；
+    其他快照（如取样时复制的状态中的）只能先比较保留的键，再比较新字段的指纹。
+    """
+    if oldField.__class__ is not _FieldSnapshot:
+        return oldField == newField
+    if docState is not None:
+        lastStack = docState.lastStack
+        if count < len(lastStack) and lastStack[count] is oldField:
+            lastField = docState.lastFields[count]
+            if lastField.__class__ is not _FieldSnapshot:
+                if lastField != newField:
+                    return False
+                stream.controlFingerprints[id(newField)] = oldField.fingerprint
+                return True
+    if not oldField._keysMatch(newField):
+        return False
+    return oldField.fingerprint == stream.fieldFingerprint(newField)
+
+
+def _stackFieldFingerprint(field):
+    """旧栈中的字段可能是快照，其指纹是原字段的指纹。"""
+    if field.__class__ is _FieldSnapshot:
+        return field.fingerprint
+    return _fieldFingerprint(field)
+
+
+# textWithFields 单次扫描后得到的操作码。
+_OP_TEXT = 0
+_OP_CONTROL_START = 1
+_OP_CONTROL_END = 2
+_OP_FORMAT_CHANGE = 3
+_OP_OTHER = 4
+_COMMAND_OPS = {
+    "controlStart": _OP_CONTROL_START,
+    "controlEnd": _OP_CONTROL_END,
+    "formatChange": _OP_FORMAT_CHANGE,
+}
+
+
+class _FieldStream:
+    """textWithFields 的紧凑表示。
+
+    开头的 controlStart/formatChange 已折叠为 controlStack 和 formatField，
+    其余条目按顺序存放在平行数组 ops（操作码）和 args（文本或字段）中；
+    末尾连续的 controlEnd 保留在数组里，但位于 bodyEnd 之后。
+    controlFingerprints 以 id 记录已算出的控件字段指纹，只在有缓存要用到时由 fieldFingerprint 计算；
+    正文字段的指纹和整段的 key 由 _fingerprintStream 按需计算，之前 key 为 None。
+    """
+
+    __slots__ = (
+        "ops",
+        "args",
+        "bodyEnd",
+        "controlStack",
+        "formatField",
+        "key",
+        "controlFingerprints",
+    )
+
+    def iterText(self):
+        ops = self.ops
+        args = self.args
+        return (args[index] for index in range(self.bodyEnd) if ops[index] == _OP_TEXT)
+
+    def fieldFingerprint(self, field):
+        fingerprint = self.controlFingerprints.get(id(field))
+        if fingerprint is None:
+            fingerprint = self.controlFingerprints[id(field)] = _fieldFingerprint(field)
+        return fingerprint
+
+
+def _tokenizeTextWithFields(textWithFields, textInfos):
+    """一次遍历完成去除节点边界和拆分开头字段，再从末尾找出连续的 controlEnd；不计算任何指纹。"""
+    FieldCommand = textInfos.FieldCommand
+    ControlField = textInfos.ControlField
+    FormatField = textInfos.FormatField
+    ops = []
+    args = []
+    appendOp = ops.append
+    appendArg = args.append
+    commandOp = _COMMAND_OPS.get
+    controlStack = []
+    formatField = FormatField()
+    items = iter(textWithFields)
+    # 开头的字段，直到第一个其他条目。
+    for item in items:
+        if isinstance(item, FieldCommand):
+            field = item.field
+            op = commandOp(item.command, _OP_OTHER)
+            if field:
+                # We don't care about node bounds, especially when comparing fields.
+                field.pop("_startOfNode", None)
+                field.pop("_endOfNode", None)
+            if op == _OP_CONTROL_START or op == _OP_FORMAT_CHANGE:
+                if isinstance(field, ControlField):
+                    controlStack.append(field)
+                elif isinstance(field, FormatField):
+                    formatField.update(field)
+                else:
+                    raise ValueError("unknown field: %s" % field)
+                continue
+            appendOp(op)
+            appendArg(field)
+        else:
+            appendOp(_OP_TEXT if isinstance(item, str) else _OP_OTHER)
+            appendArg(item)
+        break
+    # 其余条目，从上面停下的位置继续。
+    for item in items:
+        if isinstance(item, FieldCommand):
+            field = item.field
+            if field:
+                field.pop("_startOfNode", None)
+                field.pop("_endOfNode", None)
+            appendOp(commandOp(item.command, _OP_OTHER))
+            appendArg(field)
+        else:
+            appendOp(_OP_TEXT if isinstance(item, str) else _OP_OTHER)
+            appendArg(item)
+    bodyEnd = len(ops)
+    while bodyEnd and ops[bodyEnd - 1] == _OP_CONTROL_END:
+        bodyEnd -= 1
+    stream = _FieldStream()
+    stream.ops = ops
+    stream.args = args
+    stream.bodyEnd = bodyEnd
+    stream.controlStack = controlStack
+    stream.formatField = formatField
+    stream.key = None
+    stream.controlFingerprints = {}
+    return stream
+
+
+def _fingerprintStream(stream):
+    """计算正文各字段的指纹和整段输入的 key；只在核对预先算好的朗读时调用。"""
+    controlFingerprints = stream.controlFingerprints
+    args = stream.args
+    stackKey = tuple(stream.fieldFingerprint(field) for field in stream.controlStack)
+    key = [stackKey, _fieldFingerprint(stream.formatField)]
+    for index, op in enumerate(stream.ops):
+        arg = args[index]
+        if op == _OP_TEXT:
+            key.append(arg)
+        elif op == _OP_OTHER and not isinstance(arg, dict):
+            key.append(arg)
+        else:
+            fieldFingerprint = _fieldFingerprint(arg)
+            if op == _OP_CONTROL_START:
+                controlFingerprints[id(arg)] = fieldFingerprint
+            key.append((op, fieldFingerprint))
+    stream.key = tuple(key)
+
+
+def _bodyCommands(stream, textInfos):
+    """为需要列表形式的 NVDA 函数重建去掉开头字段和末尾 controlEnd 的 textWithFields。"""
+    FieldCommand = textInfos.FieldCommand
+    commands = []
+    for index in range(stream.bodyEnd):
+        op = stream.ops[index]
+        arg = stream.args[index]
+        if op == _OP_TEXT or op == _OP_OTHER:
+            commands.append(arg)
+        elif op == _OP_CONTROL_START:
+            commands.append(FieldCommand("controlStart", arg))
+        elif op == _OP_CONTROL_END:
+            commands.append(FieldCommand("controlEnd", arg))
+        else:
+            commands.append(FieldCommand("formatChange", arg))
+    return commands
+
+
+def _getInStackFieldSpeech(
+    docState,
+    key,
+    getControlFieldSpeech,
+    field,
+    ancestors,
+    fieldType,
+    formatConfig,
+    extraDetail,
+    reason,
+):
+    """取栈内字段（start/end_inControlFieldStack）的朗读序列，未变化的字段直接复用上次的结果。"""
+    sequence = docState.fieldSpeechCache.get(key)
+    if sequence is not None:
+        return list(sequence)
+    tableSpeechState = _getTableSpeechState()
+    sequence = getControlFieldSpeech(
+        field,
+        ancestors,
+        fieldType,
+        formatConfig,
+        extraDetail,
+        reason=reason,
+    )
+    # 修改了表格朗读状态的结果依赖调用顺序，不缓存。
+    if _getTableSpeechState() == tableSpeechState:
+        docState.fieldSpeechCache.put(key, tuple(sequence) if sequence else ())
+    return sequence
+
+
+def _getCellFieldSpeech(
+    docState,
+    keyPrefix,
+    fingerprint,
+    getControlFieldSpeech,
+    field,
+    ancestors,
+    fieldType,
+    formatConfig,
+    extraDetail,
+    reason,
+):
+    """取表格单元格的开始序列（行列标题与坐标），按表格缓存。
+
+    NVDA 只比较表格朗读状态与单元格自身的表格 ID、行列号和跨度是否相等，
+    所以缓存键记录这些相等关系而不是状态本身；命中时把调用改过的状态属性设成同样的值。
+    """
+    tableSpeechState = _getTableSpeechState()
+    relation = tuple(map(operator.eq, tableSpeechState, _cellTableValues(field)))
+    key = keyPrefix + (fingerprint, relation)
+    tableID = field.get("table-id")
+    cache = docState.cellSpeechCaches.get(tableID)
+    if cache is None:
+        cache = _LRUCache(_CELL_SPEECH_CACHE_SIZE)
+        docState.cellSpeechCaches.put(tableID, cache)
+    entry = cache.get(key)
+    if entry is not None:
+        sequence, stateChanges = entry
+        state = speechMod._speechState
+        for name, value in stateChanges:
+            setattr(state, name, value)
+        return list(sequence)
+    sequence = getControlFieldSpeech(
+        field,
+        ancestors,
+        fieldType,
+        formatConfig,
+        extraDetail,
+        reason=reason,
+    )
+    stateChanges = tuple(
+        (name, new)
+        for name, old, new in zip(_TABLE_SPEECH_STATE_ATTRS, tableSpeechState, _getTableSpeechState())
+        if new != old
+    )
+    cache.put(key, (tuple(sequence) if sequence else (), stateChanges))
+    return sequence
+
+
+def _addMathSpeech(context, docState, stream, speechSequence, info, field):
+    """把数学字段的朗读加入 speechSequence，按字段指纹缓存数学朗读提供者的结果。"""
+    # 字段本身不含 MathML。虚拟缓冲区的字段带有节点标识，指纹相同即为同一个数学对象；
+    # 没有标识的字段（其他类型的文档）指纹相同也可能是不同的公式，不使用缓存。
+    if docState is None or field.get("uniqueID") is None:
+        context._extendSpeechSequence_addMathForTextInfo(speechSequence, info, field)
+        return
+    fingerprint = stream.fieldFingerprint(field)
+    key = (context.revision, fingerprint)
+    sequence = docState.mathSpeechCache.get(key)
+    if sequence is not None:
+        speechSequence.extend(sequence)
+        return
+    start = len(speechSequence)
+    context._extendSpeechSequence_addMathForTextInfo(speechSequence, info, field)
+    docState.mathSpeechCache.put(key, tuple(speechSequence[start:]))
+
+
+def _cellTableValues(field):
+    """按 NVDA 的取法返回与 _TABLE_SPEECH_STATE_ATTRS 逐一比较的单元格值：呈现用的行列号（aria-rowindex/colindex）优先。"""
+    get = field.get
+    return (
+        get("table-id"),
+        get("table-rownumber-presentational") or get("table-rownumber"),
+        get("table-rowsspanned"),
+        get("table-columnnumber-presentational") or get("table-columnnumber"),
+        get("table-columnsspanned"),
+    )
+
+
+_readTableSpeechState = operator.attrgetter(*_TABLE_SPEECH_STATE_ATTRS)
+
+
+def _getTableSpeechState():
+    return _readTableSpeechState(speechMod._speechState)
+
+
+def _setTableSpeechState(values):
+    state = speechMod._speechState
+    for name, value in zip(_TABLE_SPEECH_STATE_ATTRS, values):
+        setattr(state, name, value)
+
+
+class _SpeechCacheEntry:
+    """一次光标移动的朗读结果，以及重放它时需要恢复的缓存状态。"""
+
+    __slots__ = (
+        "speechChunks",
+        "controlFieldStack",
+        "formatFieldAttributes",
+        "indentation",
+        "tableSpeechState",
+    )
+
+    def __init__(self, speechChunks, controlFieldStack, formatFieldAttributes, indentation, tableSpeechState):
+        # 按送出顺序排列的各段朗读序列；什么都不朗读时为 None。
+        self.speechChunks = speechChunks
+        self.controlFieldStack = controlFieldStack
+        self.formatFieldAttributes = formatFieldAttributes
+        self.indentation = indentation
+        self.tableSpeechState = tableSpeechState
+
+
+class _PrefetchEntry(_SpeechCacheEntry):
+    """空闲时预先算好的朗读，附带计算时的输入状态和 textWithFields 的 key，用于使用前的校验。"""
+
+    __slots__ = ("streamKey", "inputKey")
+
+
+def _speechInputKey(context, docState, doc, speakTextInfoState, unit, reason, suppressBlanks, makeLangChangeCommand):
+    """除 textWithFields 外，决定一次朗读结果的全部输入。"""
+    return (
+        context.revision,
+        unit,
+        reason,
+        suppressBlanks,
+        makeLangChangeCommand,
+        getattr(doc, "_lastCaretMoveWasFocus", False),
+        docState.stackKey(speakTextInfoState.controlFieldStackCache),
+        _fieldFingerprint(speakTextInfoState.formatFieldAttributesCache),
+        speakTextInfoState.indentationCache,
+        _getTableSpeechState(),
+    )
+
+
+def _applySpeechCacheEntry(context, entry, docState, controlFingerprints, useCache, speakTextInfoState):
+    """把缓存的朗读结果留下的状态恢复到 speakTextInfoState，效果与重新计算一次相同。"""
+    docState.rememberStack(entry.controlFieldStack, controlFingerprints)
+    formatFieldAttributesCache = speakTextInfoState.formatFieldAttributesCache
+    formatFieldAttributesCache.clear()
+    formatFieldAttributesCache.update(entry.formatFieldAttributes)
+    speakTextInfoState.indentationCache = entry.indentation
+    _setTableSpeechState(entry.tableSpeechState)
+    context._getTextInfoSpeech_updateCache(
+        useCache,
+        speakTextInfoState,
+        list(entry.controlFieldStack),
+        formatFieldAttributesCache,
+    )
+
+
+def _positionKey(info):
+    """返回 TextInfo 在文档中的位置；不是基于偏移量的 TextInfo 时返回 None。"""
+    startOffset = getattr(info, "_startOffset", None)
+    endOffset = getattr(info, "_endOffset", None)
+    if startOffset is None or endOffset is None:
+        return None
+    return (startOffset, endOffset)
+
+
+# 输入代号：每个会打断朗读的手势到达时递增。
+# 由 inputCore.decide_executeGesture 在键盘钩子线程中修改，主线程只读取比较。
+_inputGeneration = 0
+
+
+def _noteGesture(gesture=None, **kwargs):
+    """decide_executeGesture 的处理函数：记录打断朗读的输入，总是放行手势。"""
+    global _inputGeneration
+    if getattr(gesture, "speechEffectWhenExecuted", None) == inputCore.InputGesture.SPEECHEFFECT_CANCEL:
+        _inputGeneration += 1
+    return True
+
+
+def _updateCachesForSuperseded(
+    context,
+    docState,
+    useCache,
+    speakTextInfoState,
+    stream,
+    addedCount,
+    startIndex,
+    controlFieldStack,
+    formatField,
+    getControlFieldSpeech,
+    formatConfig,
+    extraDetail,
+    reason,
+):
+    """朗读已被取代时，只把 startIndex 起剩余字段命令的影响记入缓存，不再计算其余朗读。
+
+    controlFieldStack 中从 addedCount 起是新进入、尚未朗读的字段，没有则 addedCount 为 None；
+    formatField 是尚未记入格式缓存的格式字段，没有则为 None。
+    NVDA 朗读单元格时更新表格朗读状态，之后的移动据此决定是否读出行列，
+    所以尚未朗读的单元格仍照常调用 getControlFieldSpeech，只丢弃结果。
+    """
+    cellRoles = context.cellRoles
+    if addedCount is not None:
+        for count in range(addedCount, len(controlFieldStack)):
+            field = controlFieldStack[count]
+            if field.get("table-id") is not None and field.get("role") in cellRoles:
+                getControlFieldSpeech(
+                    field,
+                    controlFieldStack[0:count],
+                    "start_addedToControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
+    ops = stream.ops
+    args = stream.args
+    for index in range(startIndex, stream.bodyEnd):
+        op = ops[index]
+        if op == _OP_CONTROL_START:
+            field = args[index]
+            if field.get("table-id") is not None and field.get("role") in cellRoles:
+                getControlFieldSpeech(
+                    field,
+                    controlFieldStack,
+                    "start_relative",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
+            controlFieldStack.append(field)
+        elif op == _OP_CONTROL_END:
+            if controlFieldStack:
+                del controlFieldStack[-1]
+        elif op == _OP_FORMAT_CHANGE:
+            formatField = args[index]
+    if not useCache:
+        return
+    formatFieldAttributesCache = speakTextInfoState.formatFieldAttributesCache
+    if formatField is not None:
+        # getFormatFieldSpeech 结束时格式缓存即为最后处理的格式字段。
+        formatFieldAttributesCache.clear()
+        formatFieldAttributesCache.update(formatField)
+    if docState is not None:
+        controlFieldStack = list(
+            docState.rememberStack(controlFieldStack, stream.controlFingerprints, _corpusRecorder is None),
+        )
+    context._getTextInfoSpeech_updateCache(
+        useCache,
+        speakTextInfoState,
+        controlFieldStack,
+        formatFieldAttributesCache,
+    )
+
+
+_prefetchTimer = None
+_isPrefetching = False
+# 预先计算时读到的 textWithFields 的 key，由 _computeSpeechEntry 取走。
+_prefetchStreamKey = None
+
+
+def _notePrefetchStream(stream):
+    """在字段栈被改动之前记下预先计算读到的 textWithFields 的 key。"""
+    global _prefetchStreamKey
+    _fingerprintStream(stream)
+    _prefetchStreamKey = stream.key
+
+
+def _takePrefetchStreamKey():
+    global _prefetchStreamKey
+    streamKey = _prefetchStreamKey
+    _prefetchStreamKey = None
+    return streamKey
+
+
+def _cancelPrefetch():
+    global _prefetchTimer
+    timer = _prefetchTimer
+    if timer is not None:
+        _prefetchTimer = None
+        timer.Stop()
+
+
+def _schedulePrefetch(info, unit, docState):
+    global _prefetchTimer
+    _cancelPrefetch()
+    _prefetchTimer = core.callLater(
+        _PREFETCH_DELAY_MS,
+        _prefetchNeighbour,
+        info.copy(),
+        unit,
+        (1, -1),
+        docState.caretGeneration,
+        _inputGeneration,
+    )
+
+
+def _computeSpeechEntry(context, docState, info, unit, reason, speakTextInfoState):
+    """以 speakTextInfoState 为起点算出 info 的内容优先朗读，speakTextInfoState 随之更新为朗读后的状态。
+
+    用于空闲时的预先计算：调用方负责设置 _isPrefetching，并在之后恢复表格朗读状态。
+    """
+    # SpeakTextInfoState 的副本与原状态共用格式缓存字典，而计算会就地修改它。
+    speakTextInfoState.formatFieldAttributesCache = dict(speakTextInfoState.formatFieldAttributesCache)
+    _takePrefetchStreamKey()
+    entry = _PrefetchEntry(None, None, None, None, None)
+    entry.inputKey = _speechInputKey(
+        context,
+        docState,
+        info.obj,
+        speakTextInfoState,
+        unit,
+        reason,
+        False,
+        context.languageHandling.shouldMakeLangChangeCommand(),
+    )
+    speechChunks = []
+    speechGen = _patched_getTextInfoSpeech(
+        info,
+        useCache=speakTextInfoState,
+        unit=unit,
+        reason=reason,
+    )
+    # 用 next() 取出全部分段，以便得到生成器的返回值。
+    while True:
+        try:
+            speechChunks.append(tuple(next(speechGen)))
+        except StopIteration as stop:
+            spoken = stop.value
+            break
+    # 内容优先朗读把读到的 textWithFields 的 key 留在这里；改用了原有朗读时为 None，条目不会被使用。
+    entry.streamKey = _takePrefetchStreamKey()
+    entry.speechChunks = tuple(speechChunks) if spoken and speechChunks else None
+    entry.controlFieldStack = tuple(speakTextInfoState.controlFieldStackCache)
+    entry.formatFieldAttributes = dict(speakTextInfoState.formatFieldAttributesCache)
+    entry.indentation = speakTextInfoState.indentationCache
+    entry.tableSpeechState = _getTableSpeechState()
+    return entry
+
+
+def _prefetchNeighbour(info, unit, directions, caretGeneration, inputGeneration):
+    """计算 info 在 directions[0] 方向上相邻位置的朗读，其余方向留到下一次空闲。
+
+    定时器无法从钩子线程停止，因此光标已经移动或有新输入到达时在这里放弃。
+    """
+    global _prefetchTimer, _isPrefetching
+    _prefetchTimer = None
+    direction = directions[0]
+    doc = info.obj
+    docState = _documentStates.get(doc)
+    if docState is None or docState.caretGeneration != caretGeneration or _inputGeneration != inputGeneration:
+        return
+    context = _getSpeechContext()
+    tableSpeechState = _getTableSpeechState()
+    _isPrefetching = True
+    try:
+        neighbour = info.copy()
+        neighbour.collapse()
+        if neighbour.move(unit, direction) != 0:
+            neighbour.expand(unit)
+            key = (unit, _positionKey(neighbour))
+            entry = _computeSpeechEntry(
+                context,
+                docState,
+                neighbour,
+                unit,
+                OutputReason.CARET,
+                context.SpeakTextInfoState(doc),
+            )
+            # 计算途中有新输入时结果可能不完整，丢弃。
+            if _inputGeneration == inputGeneration:
+                docState.prefetched.put(key, entry)
+    except Exception:
+        log.debugWarning("contentFirstBrowse: prefetch failed", exc_info=True)
+        return
+    finally:
+        _setTableSpeechState(tableSpeechState)
+        _isPrefetching = False
+    if len(directions) > 1 and _inputGeneration == inputGeneration:
+        _prefetchTimer = core.callLater(
+            0,
+            _prefetchNeighbour,
+            info,
+            unit,
+            directions[1:],
+            caretGeneration,
+            inputGeneration,
+        )
+
+
+def _takePrefetched(docState, info, unit, stream, getInputKey):
+    """取出 info 位置的预取结果；输入状态或 textWithFields（含全部字段）已变化时返回 None。
+
+    getInputKey 返回当前的输入键，只在该位置有预取结果时调用；stream 的 key 也只在这时计算。
+    """
+    positionKey = _positionKey(info)
+    if positionKey is None:
+        return None
+    entry = docState.prefetched.get((unit, positionKey))
+    if entry is None or entry.inputKey != getInputKey():
+        return None
+    if stream.key is None:
+        _fingerprintStream(stream)
+    if entry.streamKey != stream.key:
+        return None
+    return entry
+
+
+_latencyProbeTimer = None
+
+
+def _cancelLatencyProbe():
+    global _latencyProbeTimer
+    timer = _latencyProbeTimer
+    if timer is not None:
+        _latencyProbeTimer = None
+        timer.Stop()
+
+
+def _scheduleLatencyProbe(info, unit, reason, speakTextInfoState, tableSpeechState):
+    """稍后用 NVDA 原有朗读重算一次刚才的移动，测得的耗时交给文档的延迟保护。
+
+    之后的移动不会推迟已安排的重算，所以连续按键时也能测到；重算未完成前不再取样。
+    """
+    global _latencyProbeTimer
+    _latencyProbeTimer = core.callLater(
+        _PREFETCH_DELAY_MS,
+        _probeNativeSpeech,
+        info,
+        unit,
+        reason,
+        speakTextInfoState,
+        tableSpeechState,
+    )
+
+
+def _probeNativeSpeech(info, unit, reason, speakTextInfoState, tableSpeechState):
+    global _latencyProbeTimer
+    _latencyProbeTimer = None
+    docState = _documentStates.get(info.obj)
+    if docState is None:
+        return
+    realTableSpeechState = _getTableSpeechState()
+    _setTableSpeechState(tableSpeechState)
+    try:
+        start = time.perf_counter()
+        for _sequence in _original_getTextInfoSpeech(info, useCache=speakTextInfoState, unit=unit, reason=reason):
+            pass
+        elapsed = time.perf_counter() - start
+    except Exception:
+        log.debugWarning("contentFirstBrowse: latency probe failed", exc_info=True)
+        return
+    finally:
+        _setTableSpeechState(realTableSpeechState)
+    budget = _getSpeechContext().latencyBudget
+    if budget:
+        docState.latencyGuard.addNative(elapsed, info.obj, budget)
+
+
+class _QuickNavIndex:
+    """一种快速导航元素的朗读索引：位置 -> 该位置的 _PrefetchEntry 列表。
+
+    按文档顺序逐个计算元素的朗读，起点状态取自前一个元素朗读后的状态，
+    与连续按同一个快速导航键时的状态相同；再按相反顺序计算一遍供反方向跳转使用。
+    使用时与预取一样核对输入状态和读到的 textWithFields，不符则照常计算。
+    """
+
+    __slots__ = ("readUnit", "entries", "complete")
+
+    def __init__(self, readUnit):
+        self.readUnit = readUnit
+        self.entries = {}
+        self.complete = False
+
+
+_quickNavIndexTimer = None
+
+
+def _cancelQuickNavIndex():
+    global _quickNavIndexTimer
+    timer = _quickNavIndexTimer
+    if timer is not None:
+        _quickNavIndexTimer = None
+        timer.Stop()
+
+
+def _scheduleQuickNavIndex(doc, itemType, readUnit):
+    """首次使用某类快速导航时，在空闲时为该类元素建立朗读索引。"""
+    global _quickNavIndexTimer
+    docState = _getDocumentState(doc)
+    index = docState.quickNavIndexes.get(itemType)
+    if index is not None and index.readUnit == readUnit:
+        return
+    index = docState.quickNavIndexes[itemType] = _QuickNavIndex(readUnit)
+    # 同一时间只建立一个索引，被打断的索引丢弃，下次使用时重建。
+    _cancelQuickNavIndex()
+    for otherType, other in list(docState.quickNavIndexes.items()):
+        if not other.complete and other is not index:
+            del docState.quickNavIndexes[otherType]
+    _quickNavIndexTimer = core.callLater(
+        _PREFETCH_DELAY_MS,
+        _runQuickNavIndexSlice,
+        doc,
+        itemType,
+        index,
+        _buildQuickNavIndex(doc, docState, itemType, index),
+    )
+
+
+def _quickNavSpeechInfo(context, item, readUnit):
+    """返回快速导航朗读该元素时使用的范围，与 browseMode.TextInfoQuickNavItem.report 相同。"""
+    info = item.textInfo.copy()
+    # If we are dealing with a form field, ensure we don't read the whole content if it's an editable text.
+    if item.itemType == "formField" and item.obj.role == context.controlTypes.Role.EDITABLETEXT:
+        readUnit = context.textInfos.UNIT_LINE
+    if readUnit:
+        fieldInfo = info.copy()
+        info.collapse()
+        info.move(readUnit, 1, endPoint="end")
+        if info.compareEndPoints(fieldInfo, "endToEnd") > 0:
+            info.setEndPoint(fieldInfo, "endToEnd")
+    return info
+
+
+def _buildQuickNavIndex(doc, docState, itemType, index):
+    """逐个元素建立索引的生成器，每算完一项让出一次；被新输入打断的一项会在之后重算。
+
+    元素在正向计算时边枚举边取，枚举也分摊到各次让出之间；反向计算使用正向时记下的范围。
+    """
+    context = _getSpeechContext()
+    infos = []
+
+    def iterForward():
+        start = doc.makeTextInfo(context.textInfos.POSITION_FIRST)
+        for item in doc._iterNodesByType(itemType, "next", start):
+            if len(infos) >= _QUICKNAV_INDEX_MAX_ITEMS:
+                return
+            if getattr(item, "textInfo", None) is None:
+                # 没有范围的元素也让出一次，免得一次枚举过多元素。
+                yield None
+                continue
+            info = _quickNavSpeechInfo(context, item, index.readUnit)
+            infos.append(info)
+            yield info
+
+    for backwards in (False, True):
+        speakTextInfoState = context.SpeakTextInfoState(doc)
+        tableSpeechState = _getTableSpeechState()
+        for info in reversed(infos) if backwards else iterForward():
+            if info is None:
+                yield
+                continue
+            positionKey = _positionKey(info)
+            while True:
+                inputGeneration = _inputGeneration
+                state = context.SpeakTextInfoState(speakTextInfoState)
+                realTableSpeechState = _getTableSpeechState()
+                _setTableSpeechState(tableSpeechState)
+                try:
+                    entry = _computeSpeechEntry(context, docState, info, None, _QUICKNAV, state)
+                finally:
+                    _setTableSpeechState(realTableSpeechState)
+                if _inputGeneration == inputGeneration:
+                    break
+                # 计算途中有新输入，结果可能不完整：先让出，之后重算这一项。
+                yield
+            speakTextInfoState = state
+            tableSpeechState = entry.tableSpeechState
+            if positionKey is not None:
+                index.entries.setdefault(positionKey, []).append(entry)
+            yield
+    index.complete = True
+
+
+def _runQuickNavIndexSlice(doc, itemType, index, builder):
+    global _quickNavIndexTimer, _isPrefetching
+    _quickNavIndexTimer = None
+    docState = _documentStates.get(doc)
+    # 文档已关闭，或内容已变化而索引已被丢弃。
+    if docState is None or docState.quickNavIndexes.get(itemType) is not index or not getattr(doc, "isAlive", True):
+        return
+    inputGeneration = _inputGeneration
+    _isPrefetching = True
+    try:
+        for _step in range(_QUICKNAV_INDEX_SLICE):
+            next(builder)
+            if _inputGeneration != inputGeneration:
+                break
+    except StopIteration:
+        return
+    except Exception:
+        log.debugWarning("contentFirstBrowse: building the quick navigation index failed", exc_info=True)
+        # 留下已完成的部分，不再重试。
+        index.complete = True
+        return
+    finally:
+        _isPrefetching = False
+    # 有新输入时等到再次空闲。
+    _quickNavIndexTimer = core.callLater(
+        0 if _inputGeneration == inputGeneration else _PREFETCH_DELAY_MS,
+        _runQuickNavIndexSlice,
+        doc,
+        itemType,
+        index,
+        builder,
+    )
+
+
+def _takeQuickNavEntry(docState, info, stream, getInputKey):
+    """取出快速导航索引中 info 位置、输入状态和 textWithFields（含全部字段）都相同的朗读，没有则返回 None。
+
+    getInputKey 和 stream 的 key 同 _takePrefetched，只在该位置有索引条目时计算。
+    """
+    positionKey = _positionKey(info)
+    if positionKey is None:
+        return None
+    inputKey = None
+    for index in docState.quickNavIndexes.values():
+        for entry in index.entries.get(positionKey, ()):
+            if inputKey is None:
+                inputKey = getInputKey()
+            if entry.inputKey != inputKey:
+                continue
+            if stream.key is None:
+                _fingerprintStream(stream)
+            if entry.streamKey == stream.key:
+                return entry
+    return None
+
+
+def _patched_quickNavScript(self, gesture, itemType, direction, errorMessage, readUnit):
+    _original_quickNavScript(self, gesture, itemType, direction, errorMessage, readUnit)
+    if (
+        isinstance(self, browseMode.BrowseModeDocumentTreeInterceptor)
+        and not self.passThrough
+        and not _getDocumentState(self).latencyGuard.fallback
+    ):
+        try:
+            _scheduleQuickNavIndex(self, itemType, readUnit)
+        except Exception:
+            log.debugWarning("contentFirstBrowse: could not schedule the quick navigation index", exc_info=True)
+
+
+class _PendingField:
+    """一个已进入、但其开始序列尚未朗读的控件字段。"""
+
+    __slots__ = ("field", "sequence", "hasMath")
+
+    def __init__(self, field, sequence, hasMath):
+        self.field = field
+        self.sequence = sequence
+        self.hasMath = hasMath
+
+
+class _PendingStartFields:
+    """按进入顺序保存待朗读的控件开始序列。
+
+    已冲刷的条目总是列表的前缀，用水位线记录其长度，
+    因此每个条目只会被冲刷或弹出一次。
+    """
+
+    __slots__ = ("_items", "_flushedCount")
+
+    def __init__(self):
+        self._items = []
+        self._flushedCount = 0
+
+    def append(self, field, sequence, hasMath):
+        self._items.append(_PendingField(field, sequence, hasMath))
+
+    def takeUnflushed(self):
+        items = self._items
+        start = self._flushedCount
+        if start == len(items):
+            return ()
+        self._flushedCount = len(items)
+        return items[start:]
+
+    def popUnflushed(self, field):
+        """如果最后一个条目属于 field，将其弹出；仅当它尚未冲刷时返回该条目。"""
+        items = self._items
+        if not items or items[-1].field is not field:
+            return None
+        pending = items.pop()
+        if self._flushedCount > len(items):
+            self._flushedCount = len(items)
+            return None
+        return pending
+
+
+# 朗读全部：上一段末尾已进入但还没读到内容的字段，(SpeakTextInfoState, [(栈位置, _PendingField)])。
+# 条目数不超过字段栈深度，与文档长度无关。
+_sayAllCarry = None
+
+
+def _takeSayAllCarry(info, speakTextInfoState):
+    global _sayAllCarry
+    carry = _sayAllCarry
+    _sayAllCarry = None
+    if carry is None:
+        return ()
+    doc, end, stack, carried = carry
+    # NVDA 的朗读全部每段都换用状态的副本，所以不按状态对象认：
+    # 接着上一段的末尾、且字段栈仍是上一段留下的那些字段，才是同一次朗读全部的下一段。
+    stackCache = speakTextInfoState.controlFieldStackCache
+    if (
+        info.obj is not doc
+        or len(stackCache) != len(stack)
+        or any(field is not kept for field, kept in zip(stackCache, stack))
+        or info.compareEndPoints(end, "startToStart") != 0
+    ):
+        return ()
+    return carried
+
+
+def _splitSayAllCarry(controlFieldStack, closedCount, unflushed):
+    """返回 (段末仍然打开、留给下一段的 (栈位置, 条目), 应在这一段冲刷的其余条目)。
+
+    controlFieldStack 的最后 closedCount 个字段已被段末的 controlEnd 关闭，之后不会再有内容。
+    """
+    if not unflushed:
+        return (), ()
+    openCount = len(controlFieldStack) - closedCount
+    positions = {id(field): index for index, field in enumerate(controlFieldStack)}
+    carried = []
+    remaining = []
+    for pending in unflushed:
+        index = positions.get(id(pending.field))
+        if index is not None and index < openCount:
+            carried.append((index, pending))
+        else:
+            remaining.append(pending)
+    return carried, remaining
+
+
+def _keepSayAllCarry(info, speakTextInfoState, carried):
+    """在 speakTextInfoState 更新为这一段末尾的字段栈之后，把 carried 留给从 info 末尾开始的下一段。"""
+    global _sayAllCarry
+    end = info.copy()
+    end.collapse(end=True)
+    _sayAllCarry = (info.obj, end, tuple(speakTextInfoState.controlFieldStackCache), carried)
 
 
 def _shouldApplyContentFirstForTextInfo(info):
@@ -36,7 +1844,15 @@ def _shouldApplyContentFirstForTextInfo(info):
         return False
 
 
-# 基于 NVDA 2025.3 的 speech.getTextInfoSpeech，实现浏览模式光标移动的内容优先顺序。
+def _routeNative(info):
+    """延迟保护让这个文档改用原有朗读时返回 True；空闲时的预先计算不受影响。"""
+    if _isPrefetching:
+        return False
+    docState = _documentStates.get(info.obj)
+    return docState is not None and docState.latencyGuard.routeNative() and bool(_getSpeechContext().latencyBudget)
+
+
+# 基于 NVDA 2025.3 的 speech.getTextInfoSpeech，实现浏览模式光标移动、快速导航（以及可选的朗读全部）的内容优先顺序。
 def _patched_getTextInfoSpeech(
     info,
     useCache=True,
@@ -47,12 +1863,31 @@ def _patched_getTextInfoSpeech(
     onlyInitialFields=False,
     suppressBlanks=False,
 ):
+    # 这是普通函数而不是生成器：不适用的调用直接拿到 NVDA 原函数的生成器，
+    # 不多一层生成器帧和 yield from。
     if (
-        reason != OutputReason.CARET
-        or not _isBrowseModeTextInfo(info)
+        (
+            reason is not _CARET
+            and reason is not _QUICKNAV
+            and (reason is not _SAYALL or not _getSpeechContext(checkConfig=True).contentFirstSayAll)
+        )
+        or not isinstance(info, _BrowseModeDocumentTextInfo)
         or not _shouldApplyContentFirstForTextInfo(info)
+        or _routeNative(info)
     ):
-        result = yield from _original_getTextInfoSpeech(
+        return _original_getTextInfoSpeech(
+            info,
+            useCache,
+            formatConfig,
+            unit,
+            reason,
+            _prefixSpeechCommand,
+            onlyInitialFields,
+            suppressBlanks,
+        )
+    sampler = _latencySampler
+    if sampler is None or _isPrefetching:
+        return _getContentFirstTextInfoSpeech(
             info,
             useCache,
             formatConfig,
@@ -61,158 +1896,384 @@ def _patched_getTextInfoSpeech(
             _prefixSpeechCommand,
             onlyInitialFields,
             suppressBlanks,
+            None,
+        )
+    return _sampleContentFirstTextInfoSpeech(
+        sampler,
+        info,
+        useCache,
+        formatConfig,
+        unit,
+        reason,
+        _prefixSpeechCommand,
+        onlyInitialFields,
+        suppressBlanks,
+    )
+
+
+def _sampleContentFirstTextInfoSpeech(
+    sampler,
+    info,
+    useCache,
+    formatConfig,
+    unit,
+    reason,
+    _prefixSpeechCommand,
+    onlyInitialFields,
+    suppressBlanks,
+):
+    sample = sampler.newSample(info)
+    speechGen = _getContentFirstTextInfoSpeech(
+        info,
+        useCache,
+        formatConfig,
+        unit,
+        reason,
+        _prefixSpeechCommand,
+        onlyInitialFields,
+        suppressBlanks,
+        sample,
+    )
+    perfCounter = time.perf_counter
+    try:
+        while True:
+            try:
+                sequence = next(speechGen)
+            except StopIteration as stop:
+                return stop.value
+            # 调用方处理这一段的时间不计入样本。
+            pausedAt = perfCounter()
+            yield sequence
+            sample.skip(perfCounter() - pausedAt)
+    finally:
+        speechGen.close()
+        sampler.add(sample)
+
+
+def _flushPendingFields(context, docState, stream, info, sequence, unflushed, language, sample):
+    """把尚未朗读的字段开始序列依次加入 sequence。
+
+    language 是当前的语言，字段以默认语言朗读，之后切换回 language。
+    """
+    if sample is not None:
+        sample.pendingFlushes += len(unflushed)
+    LangChangeCommand = context.LangChangeCommand
+    for pending in unflushed:
+        if pending.sequence:
+            if language is not None:
+                sequence.append(LangChangeCommand(None))
+                sequence.extend(pending.sequence)
+                sequence.append(LangChangeCommand(language))
+            else:
+                sequence.extend(pending.sequence)
+        if pending.hasMath:
+            _addMathSpeech(context, docState, stream, sequence, info, pending.field)
+
+
+def _addIndentationSpeech(
+    context,
+    speechSequence,
+    stream,
+    formatConfig,
+    speakTextInfoState,
+    allIndentation,
+    makeLangChangeCommand,
+):
+    """缩进有变化时把缩进朗读加到开头的朗读序列末尾，规则与 NVDA 相同。"""
+    if (
+        speakTextInfoState
+        and (
+            # either not ignoring blank lines
+            not formatConfig["ignoreBlankLinesForRLI"]
+            # or line isn't completely blank
+            or any(not (set(t) <= context.LINE_END_CHARS) for t in stream.iterText())
         )
-        return result
-
-    textInfos = speechMod.textInfos
-    controlTypes = speechMod.controlTypes
-    config = speechMod.config
-    languageHandling = speechMod.languageHandling
-    ReportLineIndentation = speechMod.ReportLineIndentation
-    unicodeNormalize = speechMod.unicodeNormalize
-    LangChangeCommand = speechMod.LangChangeCommand
-    EndUtteranceCommand = speechMod.EndUtteranceCommand
-    isBlank = speechMod.isBlank
-    splitTextIndentation = speechMod.splitTextIndentation
-    getIndentationSpeech = speechMod.getIndentationSpeech
-    _extendSpeechSequence_addMathForTextInfo = speechMod._extendSpeechSequence_addMathForTextInfo
-    _getTextInfoSpeech_considerSpelling = speechMod._getTextInfoSpeech_considerSpelling
-    _getTextInfoSpeech_updateCache = speechMod._getTextInfoSpeech_updateCache
-    SpeakTextInfoState = speechMod.SpeakTextInfoState
-
-    if isinstance(useCache, SpeakTextInfoState):
+        and allIndentation != speakTextInfoState.indentationCache
+    ):
+        indentationSpeech = context.getIndentationSpeech(allIndentation, formatConfig)
+        if makeLangChangeCommand and speechSequence[-1].lang is not None:
+            # Indentation must be spoken in the default language,
+            # but the initial format field specified a different language.
+            # Insert the indentation before the LangChangeCommand.
+            langChange = speechSequence.pop()
+            speechSequence.extend(indentationSpeech)
+            speechSequence.append(langChange)
+        else:
+            speechSequence.extend(indentationSpeech)
+        if speakTextInfoState:
+            speakTextInfoState.indentationCache = allIndentation
+
+
+def _splitLeadingChunk(speechSequence, relativeSpeechSequence, splitIndex):
+    """返回先送出的一段：开头的朗读和 relativeSpeechSequence 中 splitIndex 之前的条目，后者从中删去。"""
+    leadingChunk = speechSequence + relativeSpeechSequence[0:splitIndex]
+    del relativeSpeechSequence[0:splitIndex]
+    return leadingChunk
+
+
+def _getContentFirstTextInfoSpeech(
+    info,
+    useCache,
+    formatConfig,
+    unit,
+    reason,
+    _prefixSpeechCommand,
+    onlyInitialFields,
+    suppressBlanks,
+    sample,
+):
+    """内容优先的 getTextInfoSpeech；sample 不为 None 时记录各阶段耗时。"""
+    start = time.perf_counter()
+    context = _getSpeechContext(checkConfig=True)
+    textInfos = context.textInfos
+    controlTypes = context.controlTypes
+    LangChangeCommand = context.LangChangeCommand
+    isBlank = context.isBlank
+    _getTextInfoSpeech_updateCache = context._getTextInfoSpeech_updateCache
+    # 整次移动中语言切换设置不会变化，只判断一次。
+    makeLangChangeCommand = context.languageHandling.shouldMakeLangChangeCommand()
+    getControlFieldSpeech = info.getControlFieldSpeech
+    getFormatFieldSpeech = info.getFormatFieldSpeech
+    # 没有配置角色策略时二者为空，各处只做一次真值判断。
+    # 不读的字段仍照常调用 getControlFieldSpeech，以便 NVDA 更新表格朗读状态，只丢弃结果。
+    rolePolicies = context.rolePolicies
+    suppressedRoles = context.suppressedRoles
+    if sample is not None:
+        getControlFieldSpeech = sample.timed("controlFieldSpeech", getControlFieldSpeech)
+        getFormatFieldSpeech = sample.timed("formatFieldSpeech", getFormatFieldSpeech)
+
+    if isinstance(useCache, context.SpeakTextInfoState):
         speakTextInfoState = useCache
     elif useCache:
-        speakTextInfoState = SpeakTextInfoState(info.obj)
+        speakTextInfoState = context.SpeakTextInfoState(info.obj)
     else:
         speakTextInfoState = None
-    extraDetail = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
-    if not formatConfig:
-        formatConfig = config.conf["documentFormatting"]
-    formatConfig = formatConfig.copy()
-    if extraDetail:
-        formatConfig["extraDetail"] = True
-    reportIndentation = (
-        unit == textInfos.UNIT_LINE and formatConfig["reportLineIndentation"] != ReportLineIndentation.OFF
-    )
-    # For performance reasons, when navigating by paragraph or table cell, spelling errors will not be announced.
-    if unit in (textInfos.UNIT_PARAGRAPH, textInfos.UNIT_CELL) and reason == OutputReason.CARET:
-        formatConfig["reportSpellingErrors"] = False
+    formatConfigWasGiven = bool(formatConfig)
+    if formatConfigWasGiven:
+        formatConfig, extraDetail, reportIndentation = context.deriveUnitSettings(formatConfig, unit)
+    else:
+        formatConfig, extraDetail, reportIndentation = context.unitSettings(unit)
 
     # Fetch the last controlFieldStack, or make a blank one
     controlFieldStackCache = speakTextInfoState.controlFieldStackCache if speakTextInfoState else []
     formatFieldAttributesCache = speakTextInfoState.formatFieldAttributesCache if speakTextInfoState else {}
+    # 朗读开始后又有打断朗读的输入到达，说明这次的朗读会被取消，不必再算下去。
+    inputGeneration = _inputGeneration
+    # 调用方自带 formatConfig 时朗读结果不只取决于配置修订号，不使用任何缓存。
+    docState = None if formatConfigWasGiven else _getDocumentState(info.obj)
+    # 只有这样的移动可以整个使用预先算好的朗读。
+    reusable = False
+    if docState is not None and useCache is True:
+        docState.caretGeneration += 1
+        reusable = _prefixSpeechCommand is None and not onlyInitialFields
+    prefetch = reusable and context.prefetchNeighbours and unit in context.prefetchUnits
+
+    if sample is not None:
+        sample.mark()
     textWithFields = info.getTextWithFields(formatConfig)
-    # We don't care about node bounds, especially when comparing fields.
-    # Remove them.
-    for command in textWithFields:
-        if not isinstance(command, textInfos.FieldCommand):
-            continue
-        field = command.field
-        if not field:
-            continue
-        try:
-            del field["_startOfNode"]
-        except KeyError:
-            pass
-        try:
-            del field["_endOfNode"]
-        except KeyError:
-            pass
+    if sample is not None:
+        sample.lap("getTextWithFields")
+    recorder = _corpusRecorder
+    if recorder is not None and not _isPrefetching:
+        recorder.record(info, unit, formatConfig, controlFieldStackCache, textWithFields)
+    stream = _tokenizeTextWithFields(textWithFields, textInfos)
+    if _isPrefetching:
+        _notePrefetchStream(stream)
+    # 空闲时已经算好了这个位置的朗读（预取或快速导航索引），且计算时依据的状态和读到的 textWithFields 都没有变化。
+    if reusable and _corpusRecorder is None and (docState.prefetched or docState.quickNavIndexes):
+        getSpeechInputKey = functools.partial(
+            _speechInputKey,
+            context,
+            docState,
+            info.obj,
+            speakTextInfoState,
+            unit,
+            reason,
+            suppressBlanks,
+            makeLangChangeCommand,
+        )
+        entry = None
+        path = "indexed"
+        if reason == OutputReason.QUICKNAV and docState.quickNavIndexes:
+            entry = _takeQuickNavEntry(docState, info, stream, getSpeechInputKey)
+        if entry is None and docState.prefetched:
+            entry = _takePrefetched(docState, info, unit, stream, getSpeechInputKey)
+            path = "prefetched"
+        if entry is not None:
+            if sample is not None:
+                sample.path = path
+            _applySpeechCacheEntry(context, entry, docState, stream.controlFingerprints, useCache, speakTextInfoState)
+            if prefetch:
+                _schedulePrefetch(info, unit, docState)
+            if entry.speechChunks is None:
+                return False
+            for chunk in entry.speechChunks:
+                yield list(chunk)
+            return True
+    # 只有真正计算的移动参与延迟保护的比较；取样的移动留下移动前的状态，供稍后用原有朗读重算。
+    latencyGuard = None
+    probe = None
+    if docState is not None and useCache is True and not _isPrefetching and context.latencyBudget:
+        latencyGuard = docState.latencyGuard
+        if _latencyProbeTimer is None and latencyGuard.probeDue():
+            latencyGuard.startProbe()
+            probeState = context.SpeakTextInfoState(speakTextInfoState)
+            probeState.formatFieldAttributesCache = dict(probeState.formatFieldAttributesCache)
+            probe = (info.copy(), unit, reason, probeState, _getTableSpeechState())
 
     # Make a new controlFieldStack and formatField from the textInfo's initialFields
-    newControlFieldStack = []
-    newFormatField = textInfos.FormatField()
-    initialFields = []
-    for field in textWithFields:
-        if isinstance(field, textInfos.FieldCommand) and field.command in ("controlStart", "formatChange"):
-            initialFields.append(field.field)
-        else:
-            break
-    if len(initialFields) > 0:
-        del textWithFields[0 : len(initialFields)]
-    endFieldCount = 0
-    for field in reversed(textWithFields):
-        if isinstance(field, textInfos.FieldCommand) and field.command == "controlEnd":
-            endFieldCount += 1
-        else:
-            break
-    if endFieldCount > 0:
-        del textWithFields[0 - endFieldCount :]
-    for field in initialFields:
-        if isinstance(field, textInfos.ControlField):
-            newControlFieldStack.append(field)
-        elif isinstance(field, textInfos.FormatField):
-            newFormatField.update(field)
-        else:
-            raise ValueError("unknown field: %s" % field)
+    newControlFieldStack = stream.controlStack
+    newFormatField = stream.formatField
+    ops = stream.ops
+    args = stream.args
+    bodyEnd = stream.bodyEnd
+    if sample is not None:
+        sample.countFields(stream)
+        sample.mark()
     # Calculate how many fields in the old and new controlFieldStacks are the same
     commonFieldCount = 0
     for count in range(min(len(newControlFieldStack), len(controlFieldStackCache))):
         # #2199: When comparing controlFields try using uniqueID if it exists before resorting to compairing the entire dictionary
-        oldUniqueID = controlFieldStackCache[count].get("uniqueID")
-        newUniqueID = newControlFieldStack[count].get("uniqueID")
+        oldField = controlFieldStackCache[count]
+        newField = newControlFieldStack[count]
+        # 使用缓存时先比较整个字段：相同的字段沿用上次的指纹，缓存和快照不必重新计算；
+        # 旧字段是快照时见 _sameField。结果与先比较 uniqueID 相同。
+        if docState is not None and _sameField(docState, stream, count, oldField, newField):
+            commonFieldCount += 1
+            continue
+        oldUniqueID = oldField.get("uniqueID")
+        newUniqueID = newField.get("uniqueID")
         if ((oldUniqueID is not None or newUniqueID is not None) and newUniqueID == oldUniqueID) or (
-            newControlFieldStack[count] == controlFieldStackCache[count]
+            docState is None and _sameField(None, stream, count, oldField, newField)
         ):
             commonFieldCount += 1
         else:
             break
 
+    if sample is not None:
+        sample.lap("stackDiff")
+    if _inputGeneration != inputGeneration:
+        if sample is not None:
+            sample.path = "superseded"
+        _updateCachesForSuperseded(
+            context,
+            docState,
+            useCache,
+            speakTextInfoState,
+            stream,
+            commonFieldCount,
+            0,
+            newControlFieldStack,
+            newFormatField,
+            getControlFieldSpeech,
+            formatConfig,
+            extraDetail,
+            reason,
+        )
+        return False
     speechSequence = []
+    # 朗读全部时取出上一段末尾还没读的字段开始序列：字段仍在栈中的，稍后代替它的栈内序列；
+    # 已经退出的，这些序列按原生顺序本该在上一段末尾读出，放在这一段最前面。
+    carriedFields = None
+    if reason == OutputReason.SAYALL and speakTextInfoState is not None:
+        for index, pending in _takeSayAllCarry(info, speakTextInfoState):
+            if index < commonFieldCount and not extraDetail:
+                if carriedFields is None:
+                    carriedFields = {}
+                carriedFields[index] = pending
+                continue
+            if pending.sequence:
+                speechSequence.extend(pending.sequence)
+            if pending.hasMath:
+                _addMathSpeech(context, docState, stream, speechSequence, info, pending.field)
     # #2591: Only if the reason is not focus, Speak the exit of any controlFields not in the new stack.
     # We don't do this for focus because hearing "out of list", etc. isn't useful when tabbing or using quick navigation and makes navigation less efficient.
     if reason not in [OutputReason.FOCUS, OutputReason.QUICKNAV]:
         endingBlock = False
         for count in reversed(range(commonFieldCount, len(controlFieldStackCache))):
-            fieldSequence = info.getControlFieldSpeech(
-                controlFieldStackCache[count],
+            field = controlFieldStackCache[count]
+            fieldSequence = getControlFieldSpeech(
+                field,
                 controlFieldStackCache[0:count],
                 "end_removedFromControlFieldStack",
                 formatConfig,
                 extraDetail,
                 reason=reason,
             )
+            if (
+                fieldSequence
+                and suppressedRoles
+                and field.get("role") in suppressedRoles
+                and _fieldPolicy(rolePolicies, field) == _POLICY_SUPPRESSED
+            ):
+                fieldSequence = []
             if fieldSequence:
                 speechSequence.extend(fieldSequence)
             if not endingBlock and reason == OutputReason.SAYALL:
-                endingBlock = bool(int(controlFieldStackCache[count].get("isBlock", 0)))
+                endingBlock = bool(int(field.get("isBlock", 0)))
         if endingBlock:
-            speechSequence.append(EndUtteranceCommand())
+            speechSequence.append(context.EndUtteranceCommand())
     # The TextInfo should be considered blank if we are only exiting fields (i.e. we aren't
     # entering any new fields and there is no text).
     shouldConsiderTextInfoBlank = True
 
     if _prefixSpeechCommand is not None:
-        assert isinstance(_prefixSpeechCommand, speechMod.SpeechCommand)
+        assert isinstance(_prefixSpeechCommand, context.SpeechCommand)
         speechSequence.append(_prefixSpeechCommand)
 
     # 收集控制字段的开始序列，稍后在内容之后朗读。
-    pendingStartFields = []
+    pendingStartFields = _PendingStartFields()
 
+    # 栈内字段的缓存键以朗读原因和字段及其全部祖先的指纹链区分。
+    # 只有这些缓存用到指纹，不使用缓存时不计算。
+    if docState is not None and not extraDetail:
+        stackChain = tuple(map(stream.fieldFingerprint, newControlFieldStack[0:commonFieldCount]))
+    else:
+        stackChain = None
     # Get speech text for any fields that are in both controlFieldStacks, if extra detail is not requested
     if not extraDetail:
         for count in range(commonFieldCount):
             field = newControlFieldStack[count]
-            fieldSequence = info.getControlFieldSpeech(
-                field,
-                newControlFieldStack[0:count],
-                "start_inControlFieldStack",
-                formatConfig,
-                extraDetail,
-                reason=reason,
-            )
+            carried = carriedFields.get(count) if carriedFields is not None else None
+            if carried is not None:
+                # 上一段进入了这个字段但没读到它的内容，读进入时的序列。
+                if carried.sequence or carried.hasMath:
+                    shouldConsiderTextInfoBlank = False
+                    pendingStartFields.append(field, carried.sequence, carried.hasMath)
+                continue
+            if stackChain is not None:
+                fieldSequence = _getInStackFieldSpeech(
+                    docState,
+                    (context.revision, unit, reason, "start_inControlFieldStack", stackChain[0 : count + 1]),
+                    getControlFieldSpeech,
+                    field,
+                    newControlFieldStack[0:count],
+                    "start_inControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason,
+                )
+            else:
+                fieldSequence = getControlFieldSpeech(
+                    field,
+                    newControlFieldStack[0:count],
+                    "start_inControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
             hasMath = field.get("role") == controlTypes.Role.MATH
+            policy = _fieldPolicy(rolePolicies, field) if rolePolicies else _POLICY_CONTENT_FIRST
+            if policy == _POLICY_SUPPRESSED:
+                fieldSequence = []
             if fieldSequence or hasMath:
                 shouldConsiderTextInfoBlank = False
-                pendingStartFields.append(
-                    {
-                        "field": field,
-                        "sequence": fieldSequence,
-                        "flushed": False,
-                        "hasMath": hasMath,
-                    }
-                )
+                if policy == _POLICY_ROLES_FIRST:
+                    speechSequence.extend(fieldSequence)
+                    if hasMath:
+                        _addMathSpeech(context, docState, stream, speechSequence, info, field)
+                else:
+                    pendingStartFields.append(field, fieldSequence, hasMath)
 
     # When true, we are inside a clickable field, and should therefore not announce any more new clickable fields
     inClickable = False
@@ -229,31 +2290,48 @@ def _patched_getTextInfoSpeech(
                     fieldSequence.append(controlTypes.State.CLICKABLE.displayString)
                     shouldConsiderTextInfoBlank = False
                 inClickable = True
-        fieldSequence.extend(
-            info.getControlFieldSpeech(
-                field,
-                newControlFieldStack[0:count],
-                "start_addedToControlFieldStack",
-                formatConfig,
-                extraDetail,
-                reason=reason,
+        if docState is not None and field.get("table-id") is not None and field.get("role") in context.cellRoles:
+            fieldSequence.extend(
+                _getCellFieldSpeech(
+                    docState,
+                    (context.revision, unit, reason, "start_addedToControlFieldStack"),
+                    stream.fieldFingerprint(field),
+                    getControlFieldSpeech,
+                    field,
+                    newControlFieldStack[0:count],
+                    "start_addedToControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason,
+                ),
+            )
+        else:
+            fieldSequence.extend(
+                getControlFieldSpeech(
+                    field,
+                    newControlFieldStack[0:count],
+                    "start_addedToControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
             )
-        )
         hasMath = field.get("role") == controlTypes.Role.MATH
+        policy = _fieldPolicy(rolePolicies, field) if rolePolicies else _POLICY_CONTENT_FIRST
+        if policy == _POLICY_SUPPRESSED:
+            fieldSequence = []
         if fieldSequence or hasMath:
             shouldConsiderTextInfoBlank = False
-            pendingStartFields.append(
-                {
-                    "field": field,
-                    "sequence": fieldSequence,
-                    "flushed": False,
-                    "hasMath": hasMath,
-                }
-            )
+            if policy == _POLICY_ROLES_FIRST:
+                speechSequence.extend(fieldSequence)
+                if hasMath:
+                    _addMathSpeech(context, docState, stream, speechSequence, info, field)
+            else:
+                pendingStartFields.append(field, fieldSequence, hasMath)
         commonFieldCount += 1
 
     # Fetch the text for format field attributes that have changed between what was previously cached, and this textInfo's initialFormatField.
-    fieldSequence = info.getFormatFieldSpeech(
+    fieldSequence = getFormatFieldSpeech(
         newFormatField,
         formatFieldAttributesCache,
         formatConfig,
@@ -266,31 +2344,36 @@ def _patched_getTextInfoSpeech(
         speechSequence.extend(fieldSequence)
     language = None
     lastLanguage = None
-    if languageHandling.shouldMakeLangChangeCommand():
+    if makeLangChangeCommand:
         language = newFormatField.get("language")
         speechSequence.append(LangChangeCommand(language))
         lastLanguage = language
-    isWordOrCharUnit = unit in (textInfos.UNIT_CHARACTER, textInfos.UNIT_WORD)
+    isWordOrCharUnit = extraDetail
     firstText = ""
-    if len(textWithFields) > 0:
-        firstField = textWithFields[0]
-        if isinstance(firstField, str):
-            firstText = firstField.strip() if not firstField.isspace() else firstField
+    if bodyEnd > 0 and ops[0] == _OP_TEXT:
+        firstField = args[0]
+        firstText = firstField.strip() if not firstField.isspace() else firstField
     if onlyInitialFields or (
         isWordOrCharUnit
-        and (len(firstText) == 1 or len(unicodeNormalize(firstText)) == 1)
-        and all(speechMod._isControlEndFieldCommand(x) for x in itertools.islice(textWithFields, 1, None))
+        and (len(firstText) == 1 or len(context.unicodeNormalize(firstText)) == 1)
+        and all(op == _OP_CONTROL_END for op in itertools.islice(ops, 1, bodyEnd))
     ):
+        if sample is not None:
+            sample.path = "spelling"
         if reason != OutputReason.ONLYCACHE:
-            yield from _getTextInfoSpeech_considerSpelling(
+            yield from context._getTextInfoSpeech_considerSpelling(
                 unit,
                 onlyInitialFields,
-                textWithFields,
+                _bodyCommands(stream, textInfos),
                 reason,
                 speechSequence,
                 language,
             )
         if useCache:
+            if docState is not None:
+                newControlFieldStack = list(
+                    docState.rememberStack(newControlFieldStack, stream.controlFingerprints, recorder is None),
+                )
             _getTextInfoSpeech_updateCache(
                 useCache,
                 speakTextInfoState,
@@ -309,43 +2392,23 @@ def _patched_getTextInfoSpeech(
     inTextChunk = False
     allIndentation = ""
     indentationDone = False
+    # 流式模式：遇到第一段非空文本后的下一个分块边界时，先送出到此为止的朗读。
+    streamLeadingContent = context.streamLeadingContent and reason != OutputReason.ONLYCACHE
+    contentSeen = False
+    streamed = False
+    # 分段处的语言；其余部分不以语言切换开头时，才需要在开头切换回这种语言。
+    resumeLanguage = None
 
-    def _appendPendingSequence(seq):
-        nonlocal lastLanguage, relativeSpeechSequence
-        if not seq:
-            return
-        restoreLang = None
-        if languageHandling.shouldMakeLangChangeCommand() and lastLanguage is not None:
-            restoreLang = lastLanguage
-            relativeSpeechSequence.append(LangChangeCommand(None))
-            lastLanguage = None
-        relativeSpeechSequence.extend(seq)
-        if languageHandling.shouldMakeLangChangeCommand() and restoreLang is not None:
-            relativeSpeechSequence.append(LangChangeCommand(restoreLang))
-            lastLanguage = restoreLang
-
-    def _flushPending():
-        nonlocal inTextChunk
-        for pending in pendingStartFields:
-            if pending["flushed"]:
-                continue
-            seq = pending["sequence"]
-            hasMath = pending["hasMath"]
-            if not seq and not hasMath:
-                pending["flushed"] = True
-                continue
-            inTextChunk = False
-            _appendPendingSequence(seq)
-            if hasMath:
-                _extendSpeechSequence_addMathForTextInfo(relativeSpeechSequence, info, pending["field"])
-            pending["flushed"] = True
-
-    for command in textWithFields:
-        if isinstance(command, str):
+    if sample is not None:
+        sample.mark()
+    for index in range(bodyEnd):
+        op = ops[index]
+        if op == _OP_TEXT:
+            command = args[index]
             # Text should break a run of clickables
             inClickable = False
             if reportIndentation and not indentationDone:
-                indentation, command = splitTextIndentation(command)
+                indentation, command = context.splitTextIndentation(command)
                 # Combine all indentation into one string for later processing.
                 allIndentation += indentation
                 if command:
@@ -358,56 +2421,133 @@ def _patched_getTextInfoSpeech(
                     relativeSpeechSequence.append(command)
                     inTextChunk = True
                 if not isBlank(command):
-                    _flushPending()
-        elif isinstance(command, textInfos.FieldCommand):
+                    contentSeen = True
+                    unflushed = pendingStartFields.takeUnflushed()
+                    if unflushed:
+                        if streamLeadingContent and not streamed:
+                            # 冲刷会结束当前文本块，此刻的内容已经确定。
+                            if reportIndentation:
+                                _addIndentationSpeech(
+                                    context,
+                                    speechSequence,
+                                    stream,
+                                    formatConfig,
+                                    speakTextInfoState,
+                                    allIndentation,
+                                    makeLangChangeCommand,
+                                )
+                            leadingChunk = _splitLeadingChunk(
+                                speechSequence,
+                                relativeSpeechSequence,
+                                len(relativeSpeechSequence),
+                            )
+                            speechSequence = []
+                            streamed = True
+                            resumeLanguage = lastLanguage
+                            pausedAt = time.perf_counter()
+                            yield leadingChunk
+                            start += time.perf_counter() - pausedAt
+                        inTextChunk = False
+                        _flushPendingFields(
+                            context,
+                            docState,
+                            stream,
+                            info,
+                            relativeSpeechSequence,
+                            unflushed,
+                            lastLanguage,
+                            sample,
+                        )
+        elif op != _OP_OTHER:
+            if _inputGeneration != inputGeneration:
+                if sample is not None:
+                    sample.path = "superseded"
+                _updateCachesForSuperseded(
+                    context,
+                    docState,
+                    useCache,
+                    speakTextInfoState,
+                    stream,
+                    None,
+                    index,
+                    newControlFieldStack,
+                    None,
+                    getControlFieldSpeech,
+                    formatConfig,
+                    extraDetail,
+                    reason,
+                )
+                return streamed
+            field = args[index]
+            if streamLeadingContent and not streamed:
+                # 这个字段的朗读之前可能成为先送出的一段。
+                splitIndex = len(relativeSpeechSequence)
+                splitLanguage = lastLanguage
             newLanguage = None
             deferredControlStart = False
-            if command.command == "controlStart":
+            if op == _OP_CONTROL_START:
                 # Control fields always start a new chunk, even if they have no field text.
                 inTextChunk = False
                 fieldSequence = []
                 if not inClickable and formatConfig["reportClickable"]:
-                    states = command.field.get("states")
+                    states = field.get("states")
                     if states and controlTypes.State.CLICKABLE in states:
                         # We have entered an outer most clickable or entered a new clickable after exiting a previous one
                         # Announce it if there is nothing else interesting about the field, but not if the user turned it off.
-                        presCat = command.field.getPresentationCategory(
+                        presCat = field.getPresentationCategory(
                             newControlFieldStack[0:],
                             formatConfig,
                             reason,
                         )
-                        if not presCat or presCat is command.field.PRESCAT_LAYOUT:
+                        if not presCat or presCat is field.PRESCAT_LAYOUT:
                             fieldSequence.append(controlTypes.State.CLICKABLE.displayString)
                         inClickable = True
-                fieldSequence.extend(
-                    info.getControlFieldSpeech(
-                        command.field,
-                        newControlFieldStack,
-                        "start_relative",
-                        formatConfig,
-                        extraDetail,
-                        reason=reason,
+                if (
+                    docState is not None
+                    and field.get("table-id") is not None
+                    and field.get("role") in context.cellRoles
+                ):
+                    fieldSequence.extend(
+                        _getCellFieldSpeech(
+                            docState,
+                            (context.revision, unit, reason, "start_relative"),
+                            stream.fieldFingerprint(field),
+                            getControlFieldSpeech,
+                            field,
+                            newControlFieldStack,
+                            "start_relative",
+                            formatConfig,
+                            extraDetail,
+                            reason,
+                        ),
                     )
-                )
-                newControlFieldStack.append(command.field)
-                hasMath = command.field.get("role") == controlTypes.Role.MATH
-                if fieldSequence or hasMath:
-                    pendingStartFields.append(
-                        {
-                            "field": command.field,
-                            "sequence": fieldSequence,
-                            "flushed": False,
-                            "hasMath": hasMath,
-                        }
+                else:
+                    fieldSequence.extend(
+                        getControlFieldSpeech(
+                            field,
+                            newControlFieldStack,
+                            "start_relative",
+                            formatConfig,
+                            extraDetail,
+                            reason=reason,
+                        )
                     )
+                newControlFieldStack.append(field)
+                hasMath = field.get("role") == controlTypes.Role.MATH
+                policy = _fieldPolicy(rolePolicies, field) if rolePolicies else _POLICY_CONTENT_FIRST
+                if policy == _POLICY_SUPPRESSED:
+                    fieldSequence = []
+                # 先读角色的字段按 NVDA 原有顺序就地朗读。
+                if (fieldSequence or hasMath) and policy != _POLICY_ROLES_FIRST:
+                    pendingStartFields.append(field, fieldSequence, hasMath)
                     fieldSequence = []
                     deferredControlStart = True
-            elif command.command == "controlEnd":
+            elif op == _OP_CONTROL_END:
                 # Exiting a controlField should break a run of clickables
                 inClickable = False
                 # Control fields always start a new chunk, even if they have no field text.
                 inTextChunk = False
-                fieldSequence = info.getControlFieldSpeech(
+                fieldSequence = getControlFieldSpeech(
                     newControlFieldStack[-1],
                     newControlFieldStack[0:-1],
                     "end_relative",
@@ -415,24 +2555,28 @@ def _patched_getTextInfoSpeech(
                     extraDetail,
                     reason=reason,
                 )
-                pending = None
-                if pendingStartFields and pendingStartFields[-1]["field"] is newControlFieldStack[-1]:
-                    pending = pendingStartFields.pop()
-                if pending and not pending["flushed"]:
+                if (
+                    fieldSequence
+                    and suppressedRoles
+                    and newControlFieldStack[-1].get("role") in suppressedRoles
+                    and _fieldPolicy(rolePolicies, newControlFieldStack[-1]) == _POLICY_SUPPRESSED
+                ):
+                    fieldSequence = []
+                pending = pendingStartFields.popUnflushed(newControlFieldStack[-1])
+                if pending is not None:
                     combined = []
-                    if pending["sequence"]:
-                        combined.extend(pending["sequence"])
-                    if pending["hasMath"]:
-                        _extendSpeechSequence_addMathForTextInfo(combined, info, pending["field"])
+                    if pending.sequence:
+                        combined.extend(pending.sequence)
+                    if pending.hasMath:
+                        _addMathSpeech(context, docState, stream, combined, info, pending.field)
                     combined.extend(fieldSequence)
                     fieldSequence = combined
-                    pending["flushed"] = True
                 del newControlFieldStack[-1]
                 if commonFieldCount > len(newControlFieldStack):
                     commonFieldCount = len(newControlFieldStack)
-            elif command.command == "formatChange":
-                fieldSequence = info.getFormatFieldSpeech(
-                    command.field,
+            elif op == _OP_FORMAT_CHANGE:
+                fieldSequence = getFormatFieldSpeech(
+                    field,
                     formatFieldAttributesCache,
                     formatConfig,
                     reason=reason,
@@ -441,80 +2585,127 @@ def _patched_getTextInfoSpeech(
                 )
                 if fieldSequence:
                     inTextChunk = False
-                if languageHandling.shouldMakeLangChangeCommand():
-                    newLanguage = command.field.get("language")
+                if makeLangChangeCommand:
+                    newLanguage = field.get("language")
                     if lastLanguage != newLanguage:
                         # The language has changed, so this starts a new text chunk.
                         inTextChunk = False
             if not inTextChunk:
                 if fieldSequence:
-                    if languageHandling.shouldMakeLangChangeCommand() and lastLanguage is not None:
+                    if makeLangChangeCommand and lastLanguage is not None:
                         # Fields must be spoken in the default language.
                         relativeSpeechSequence.append(LangChangeCommand(None))
                         lastLanguage = None
                     relativeSpeechSequence.extend(fieldSequence)
                 if (
-                    command.command == "controlStart"
+                    op == _OP_CONTROL_START
                     and not deferredControlStart
-                    and command.field.get("role") == controlTypes.Role.MATH
+                    and field.get("role") == controlTypes.Role.MATH
                 ):
-                    _extendSpeechSequence_addMathForTextInfo(relativeSpeechSequence, info, command.field)
-                if languageHandling.shouldMakeLangChangeCommand() and newLanguage != lastLanguage:
+                    _addMathSpeech(context, docState, stream, relativeSpeechSequence, info, field)
+                if makeLangChangeCommand and newLanguage != lastLanguage:
                     relativeSpeechSequence.append(LangChangeCommand(newLanguage))
                     lastLanguage = newLanguage
+            if streamLeadingContent and contentSeen and not inTextChunk and not streamed:
+                if reportIndentation:
+                    _addIndentationSpeech(
+                        context,
+                        speechSequence,
+                        stream,
+                        formatConfig,
+                        speakTextInfoState,
+                        allIndentation,
+                        makeLangChangeCommand,
+                    )
+                leadingChunk = _splitLeadingChunk(speechSequence, relativeSpeechSequence, splitIndex)
+                speechSequence = []
+                streamed = True
+                resumeLanguage = splitLanguage
+                pausedAt = time.perf_counter()
+                yield leadingChunk
+                start += time.perf_counter() - pausedAt
 
-    # 冲刷所有尚未遇到文本的待处理 control start 序列。
-    _flushPending()
+    # 朗读全部时，末尾尚未遇到文本、且在下一段仍然打开的字段留到下一段的内容之后朗读；
+    # 已被段末 controlEnd 关闭的字段不会再有内容，和其他情况一样在这一段冲刷。
+    sayAllCarried = None
+    if reason == OutputReason.SAYALL and speakTextInfoState is not None:
+        sayAllCarried, unflushed = _splitSayAllCarry(
+            newControlFieldStack,
+            len(ops) - bodyEnd,
+            pendingStartFields.takeUnflushed(),
+        )
+    else:
+        # 冲刷所有尚未遇到文本的待处理 control start 序列。
+        unflushed = pendingStartFields.takeUnflushed()
+    if unflushed:
+        _flushPendingFields(context, docState, stream, info, relativeSpeechSequence, unflushed, lastLanguage, sample)
+    if sample is not None:
+        sample.lap("reorder")
 
-    if (
-        reportIndentation
-        and speakTextInfoState
-        and (
-            # either not ignoring blank lines
-            not formatConfig["ignoreBlankLinesForRLI"]
-            # or line isn't completely blank
-            or any(not (set(t) <= speechMod.LINE_END_CHARS) for t in textWithFields if isinstance(t, str))
+    if not streamed and reportIndentation:
+        _addIndentationSpeech(
+            context,
+            speechSequence,
+            stream,
+            formatConfig,
+            speakTextInfoState,
+            allIndentation,
+            makeLangChangeCommand,
         )
-        and allIndentation != speakTextInfoState.indentationCache
-    ):
-        indentationSpeech = getIndentationSpeech(allIndentation, formatConfig)
-        if languageHandling.shouldMakeLangChangeCommand() and speechSequence[-1].lang is not None:
-            # Indentation must be spoken in the default language,
-            # but the initial format field specified a different language.
-            # Insert the indentation before the LangChangeCommand.
-            langChange = speechSequence.pop()
-            speechSequence.extend(indentationSpeech)
-            speechSequence.append(langChange)
-        else:
-            speechSequence.extend(indentationSpeech)
-        if speakTextInfoState:
-            speakTextInfoState.indentationCache = allIndentation
     # Don't add this text if it is blank.
     relativeBlank = True
     for x in relativeSpeechSequence:
         if isinstance(x, str) and not isBlank(x):
             relativeBlank = False
             break
-    if not relativeBlank:
+    if streamed or not relativeBlank:
+        if (
+            resumeLanguage is not None
+            and relativeSpeechSequence
+            and not isinstance(relativeSpeechSequence[0], LangChangeCommand)
+        ):
+            # 每段朗读序列都从默认语言开始，需要重新切换到分段处的语言。
+            speechSequence.append(LangChangeCommand(resumeLanguage))
         speechSequence.extend(relativeSpeechSequence)
         shouldConsiderTextInfoBlank = False
 
     # Finally get speech text for any fields left in new controlFieldStack that are common with the old controlFieldStack (for closing), if extra detail is not requested
-    if languageHandling.shouldMakeLangChangeCommand() and lastLanguage is not None:
+    if makeLangChangeCommand and lastLanguage is not None:
         speechSequence.append(
             LangChangeCommand(None),
         )
         lastLanguage = None
     if not extraDetail:
+        # 这里的前 commonFieldCount 个字段仍是开头的那些字段对象，可沿用 stackChain。
         for count in reversed(range(min(len(newControlFieldStack), commonFieldCount))):
-            fieldSequence = info.getControlFieldSpeech(
-                newControlFieldStack[count],
-                newControlFieldStack[0:count],
-                "end_inControlFieldStack",
-                formatConfig,
-                extraDetail,
-                reason=reason,
-            )
+            if stackChain is not None:
+                fieldSequence = _getInStackFieldSpeech(
+                    docState,
+                    (context.revision, unit, reason, "end_inControlFieldStack", stackChain[0 : count + 1]),
+                    getControlFieldSpeech,
+                    newControlFieldStack[count],
+                    newControlFieldStack[0:count],
+                    "end_inControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason,
+                )
+            else:
+                fieldSequence = getControlFieldSpeech(
+                    newControlFieldStack[count],
+                    newControlFieldStack[0:count],
+                    "end_inControlFieldStack",
+                    formatConfig,
+                    extraDetail,
+                    reason=reason,
+                )
+            if (
+                fieldSequence
+                and suppressedRoles
+                and newControlFieldStack[count].get("role") in suppressedRoles
+                and _fieldPolicy(rolePolicies, newControlFieldStack[count]) == _POLICY_SUPPRESSED
+            ):
+                fieldSequence = []
             if fieldSequence:
                 speechSequence.extend(fieldSequence)
                 shouldConsiderTextInfoBlank = False
@@ -527,35 +2718,203 @@ def _patched_getTextInfoSpeech(
 
     # Cache a copy of the new controlFieldStack for future use
     if useCache:
+        if docState is not None:
+            # 缓存的是字段的精简快照；录制语料时保留完整字段，录下的旧栈才能原样重放。
+            newControlFieldStack = docState.rememberStack(
+                newControlFieldStack,
+                stream.controlFingerprints,
+                recorder is None,
+            )
         _getTextInfoSpeech_updateCache(
             useCache,
             speakTextInfoState,
-            newControlFieldStack,
+            list(newControlFieldStack),
             formatFieldAttributesCache,
         )
+    if sayAllCarried:
+        _keepSayAllCarry(info, speakTextInfoState, sayAllCarried)
 
+    if prefetch:
+        _schedulePrefetch(info, unit, docState)
+
+    if sample is not None:
+        sample.lap("assembly")
+    if latencyGuard is not None:
+        # 先送出的一段在调用方处理期间停表，只计这里自己的计算时间。
+        latencyGuard.addContentFirst(time.perf_counter() - start, info.obj, context.latencyBudget)
+        if probe is not None:
+            _scheduleLatencyProbe(*probe)
     if reason == OutputReason.ONLYCACHE or not speechSequence:
-        return False
+        return streamed
 
     yield speechSequence
     return True
 
 
 class GlobalPlugin(globalPluginHandler.GlobalPlugin):
+    # Translators: The name of the input gesture category for this add-on.
+    scriptCategory = _t("Browse mode content first")
+
     def __init__(self):
         super().__init__()
+        config.conf.spec[_CONFIG_SECTION] = _CONFIG_SPEC
         global _isPatched
         if not _isPatched:
             speechMod.getTextInfoSpeech = _patched_getTextInfoSpeech
             speech.getTextInfoSpeech = _patched_getTextInfoSpeech
+            browseMode.BrowseModeTreeInterceptor._quickNavScript = _patched_quickNavScript
+            config.post_configProfileSwitch.register(_bumpConfigRevision)
+            config.post_configReset.register(_bumpConfigRevision)
+            inputCore.decide_executeGesture.register(_noteGesture)
+            _getSpeechContext()
             _isPatched = True
             log.info("contentFirstBrowse: patched getTextInfoSpeech for browse mode caret")
 
+    # 文档内容变化时丢弃该文档受影响的朗读缓存。
+    def event_documentLoadComplete(self, obj, nextHandler):
+        _invalidateDocumentFor(obj, reloaded=True)
+        nextHandler()
+
+    def event_nameChange(self, obj, nextHandler):
+        _invalidateDocumentFor(obj)
+        nextHandler()
+
+    def event_valueChange(self, obj, nextHandler):
+        _invalidateDocumentFor(obj)
+        nextHandler()
+
+    def event_stateChange(self, obj, nextHandler):
+        _invalidateDocumentFor(obj)
+        nextHandler()
+
+    def event_descriptionChange(self, obj, nextHandler):
+        _invalidateDocumentFor(obj)
+        nextHandler()
+
+    @script(
+        # Translators: Describes the command that starts or stops recording caret moves to a replay corpus.
+        description=_t("Starts or stops recording browse mode caret moves to a replay corpus"),
+    )
+    def script_toggleCorpusRecording(self, gesture):
+        global _corpusRecorder
+        recorder = _corpusRecorder
+        if recorder is not None:
+            _corpusRecorder = None
+            recorder.stop()
+            # Translators: Reported when corpus recording stops.
+            ui.message(_t("Corpus recording stopped"))
+            return
+        path = os.path.join(
+            globalVars.appArgs.configPath,
+            "contentFirstBrowse",
+            "corpus",
+            time.strftime("%Y%m%d-%H%M%S") + ".jsonl.gz",
+        )
+        _corpusRecorder = _CorpusRecorder(path)
+        log.info("contentFirstBrowse: recording caret moves to %s" % path)
+        # Translators: Reported when corpus recording starts.
+        ui.message(_t("Corpus recording started"))
+
+    @script(
+        # Translators: Describes the command that toggles speaking line content before the remaining field speech.
+        description=_t("Toggles speaking content as soon as it is ready, before the remaining role and state information"),
+    )
+    def script_toggleStreamLeadingContent(self, gesture):
+        section = config.conf[_CONFIG_SECTION]
+        enabled = not section["streamLeadingContent"]
+        section["streamLeadingContent"] = enabled
+        _bumpConfigRevision()
+        if enabled:
+            # Translators: Reported when streaming of leading content is turned on.
+            ui.message(_t("Speak content as soon as ready on"))
+        else:
+            # Translators: Reported when streaming of leading content is turned off.
+            ui.message(_t("Speak content as soon as ready off"))
+
+    @script(
+        # Translators: Describes the command that toggles computing the speech of neighbouring lines while idle.
+        description=_t("Toggles preparing the speech of the next and previous line while idle"),
+    )
+    def script_togglePrefetchNeighbours(self, gesture):
+        section = config.conf[_CONFIG_SECTION]
+        enabled = not section["prefetchNeighbours"]
+        section["prefetchNeighbours"] = enabled
+        _bumpConfigRevision()
+        if enabled:
+            # Translators: Reported when preparing the speech of neighbouring lines is turned on.
+            ui.message(_t("Prepare neighbouring lines on"))
+        else:
+            _cancelPrefetch()
+            # Translators: Reported when preparing the speech of neighbouring lines is turned off.
+            ui.message(_t("Prepare neighbouring lines off"))
+
+    @script(
+        # Translators: Describes the command that toggles the content first order for say all.
+        description=_t("Toggles speaking content before role and state information during say all"),
+    )
+    def script_toggleContentFirstSayAll(self, gesture):
+        global _sayAllCarry
+        section = config.conf[_CONFIG_SECTION]
+        enabled = not section["contentFirstSayAll"]
+        section["contentFirstSayAll"] = enabled
+        _bumpConfigRevision()
+        if enabled:
+            # Translators: Reported when the content first order for say all is turned on.
+            ui.message(_t("Content first say all on"))
+        else:
+            _sayAllCarry = None
+            # Translators: Reported when the content first order for say all is turned off.
+            ui.message(_t("Content first say all off"))
+
+    @script(
+        # Translators: Describes the command that starts or stops sampling speech latency.
+        description=_t("Starts or stops sampling the latency of browse mode caret speech"),
+    )
+    def script_toggleLatencySampling(self, gesture):
+        global _latencySampler
+        if _latencySampler is not None:
+            _latencySampler = None
+            # Translators: Reported when latency sampling stops.
+            ui.message(_t("Latency sampling stopped"))
+            return
+        _latencySampler = _LatencySampler(_LATENCY_SAMPLE_COUNT)
+        # Translators: Reported when latency sampling starts.
+        ui.message(_t("Latency sampling started"))
+
+    @script(
+        # Translators: Describes the command that writes the latency report to the NVDA log.
+        description=_t("Writes a report of the sampled browse mode caret speech latency to the NVDA log"),
+    )
+    def script_reportLatency(self, gesture):
+        sampler = _latencySampler
+        if sampler is None or not sampler.samples:
+            # Translators: Reported when there are no latency samples to report.
+            ui.message(_t("No latency samples"))
+            return
+        log.info(sampler.report())
+        # Translators: Reported after the latency report has been written to the log.
+        ui.message(_t("Latency report written to the NVDA log"))
+
     def terminate(self):
-        global _isPatched
+        global _isPatched, _corpusRecorder, _speechContext, _latencySampler, _sayAllCarry
+        if _corpusRecorder is not None:
+            _corpusRecorder.stop()
+            _corpusRecorder = None
+        _latencySampler = None
         if _isPatched:
             if speechMod.getTextInfoSpeech is _patched_getTextInfoSpeech:
                 speechMod.getTextInfoSpeech = _original_getTextInfoSpeech
             if speech.getTextInfoSpeech is _patched_getTextInfoSpeech:
                 speech.getTextInfoSpeech = _original_getTextInfoSpeech
+            if browseMode.BrowseModeTreeInterceptor._quickNavScript is _patched_quickNavScript:
+                browseMode.BrowseModeTreeInterceptor._quickNavScript = _original_quickNavScript
+            config.post_configProfileSwitch.unregister(_bumpConfigRevision)
+            config.post_configReset.unregister(_bumpConfigRevision)
+            inputCore.decide_executeGesture.unregister(_noteGesture)
+            _cancelPrefetch()
+            _cancelQuickNavIndex()
+            _cancelLatencyProbe()
+            _sayAllCarry = None
+            _documentStates.clear()
+            _speechContext = None
             _isPatched = False